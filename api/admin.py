@@ -2,12 +2,39 @@
 
 from __future__ import annotations
 
+import logging
+import os
+import tempfile
+import threading
+import time
 from pathlib import Path
 from typing import Any
 
 import yaml
 
+from api.policy_store import PolicyStore
+from auth.device_trust import PostureRegistry
+
+logger = logging.getLogger(__name__)
+
 CONFIG_PATH = Path(__file__).resolve().parents[1] / "config" / "policies.yaml"
+STORE_PATH: Path | None = None
+POSTURE_FEED_PATH = CONFIG_PATH.with_name("device_posture.jsonl")
+# Registrations closer together than this are exported to policies.yaml as one write.
+EXPORT_INTERVAL = 1.0
+
+DEFAULT_USER_POLICY: dict[str, Any] = {
+    "allowed_categories": ["Business", "Productivity"],
+    "blocked_categories": ["Malware"],
+    "allowed_destinations": [],
+    "device_trust_required": True,
+    "allow_all_if_no_match": False,
+}
+
+_STORES: dict[Path, PolicyStore] = {}
+_STORES_LOCK = threading.Lock()
+_POSTURE_REGISTRIES: dict[Path, PostureRegistry] = {}
+_EXPORTERS: dict[tuple[Path, Path], PolicyExporter] = {}
 
 
 def load_policies(path: Path | None = None) -> dict[str, Any]:
@@ -21,9 +48,119 @@ def load_policies(path: Path | None = None) -> dict[str, Any]:
 
 
 def save_policies(payload: dict[str, Any], path: Path | None = None) -> None:
-    """Persist policies to disk."""
+    """Persist policies to disk atomically so readers never see a partial document."""
 
     policy_path = path or CONFIG_PATH
     policy_path.parent.mkdir(parents=True, exist_ok=True)
-    with policy_path.open("w", encoding="utf-8") as handle:
-        yaml.safe_dump(payload, handle, sort_keys=False)
+    fd, tmp_name = tempfile.mkstemp(dir=policy_path.parent, prefix=f".{policy_path.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            yaml.safe_dump(payload, handle, sort_keys=False)
+        os.replace(tmp_name, policy_path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def policy_store(path: Path | None = None) -> PolicyStore:
+    """Return the shared policy store, seeding it from policies.yaml on first use.
+
+    The store lives next to ``CONFIG_PATH`` as ``policies.db`` unless ``STORE_PATH`` or
+    ``path`` points elsewhere.
+    """
+
+    store_path = path or STORE_PATH or CONFIG_PATH.with_name("policies.db")
+    with _STORES_LOCK:
+        store = _STORES.get(store_path)
+        if store is None:
+            store = PolicyStore(store_path)
+            if store.is_empty() and CONFIG_PATH.exists():
+                store.import_yaml(CONFIG_PATH)
+            elif store.import_if_edited(CONFIG_PATH):
+                logger.warning(
+                    "Imported hand edits to policies.yaml", extra={"path": str(CONFIG_PATH)}
+                )
+            _STORES[store_path] = store
+    return store
+
+
+def export_policies(store: PolicyStore, path: Path | None = None) -> int:
+    """Write the store to policies.yaml, first importing any hand edits made to it."""
+
+    policy_path = path or CONFIG_PATH
+    if store.import_if_edited(policy_path):
+        logger.warning("Imported hand edits to policies.yaml", extra={"path": str(policy_path)})
+    return store.export_yaml(policy_path)
+
+
+class PolicyExporter:
+    """Exports the policy store to policies.yaml after writes, debounced.
+
+    The first write after a quiet ``interval`` is exported at once; later writes within
+    the interval are folded into a single export when it ends. Gateways follow the
+    file, so a registration reaches them within about ``interval`` seconds.
+    """
+
+    def __init__(self, store: PolicyStore, path: Path, interval: float = EXPORT_INTERVAL):
+        self.store = store
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._pending: threading.Timer | None = None
+        self._last_export = float("-inf")
+
+    def notify(self) -> None:
+        """Record that the store changed."""
+
+        with self._lock:
+            if self._pending is not None:
+                return
+            delay = self._last_export + self.interval - time.monotonic()
+            if delay > 0:
+                self._pending = threading.Timer(delay, self.flush)
+                self._pending.daemon = True
+                self._pending.start()
+                return
+        self.flush()
+
+    def flush(self) -> None:
+        """Export now, absorbing any scheduled export."""
+
+        with self._export_lock:
+            with self._lock:
+                if self._pending is not None:
+                    self._pending.cancel()
+                    self._pending = None
+                self._last_export = time.monotonic()
+            try:
+                export_policies(self.store, self.path)
+            except Exception as exc:
+                logger.error(
+                    "Policy export failed", extra={"error": str(exc), "path": str(self.path)}
+                )
+
+
+def policy_exporter(store: PolicyStore) -> PolicyExporter:
+    """Return the shared exporter writing ``store`` to ``CONFIG_PATH``."""
+
+    key = (store.path, CONFIG_PATH)
+    with _STORES_LOCK:
+        exporter = _EXPORTERS.get(key)
+        if exporter is None:
+            exporter = _EXPORTERS[key] = PolicyExporter(store, CONFIG_PATH)
+    return exporter
+
+
+def posture_registry(path: Path | None = None) -> PostureRegistry:
+    """Return the shared device posture registry, seeded from the posture feed file."""
+
+    feed_path = path or POSTURE_FEED_PATH
+    with _STORES_LOCK:
+        registry = _POSTURE_REGISTRIES.get(feed_path)
+        if registry is None:
+            registry = PostureRegistry()
+            if feed_path.exists():
+                registry.load_feed(feed_path)
+            _POSTURE_REGISTRIES[feed_path] = registry
+    return registry
@@ -2,18 +2,18 @@
 
 from __future__ import annotations
 
-import json
 import logging
 from pathlib import Path
 from typing import Dict, TypeAlias
 
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel, Field
 
 from api import admin
-from auth.ztna_token_validator import ZTNATokenValidator
+from auth.ztna_token_validator import ZTNATokenValidator, tokens_from_policy
 from logging_config import configure_logging
+from siem.codec import read_records, tail_records
 
 configure_logging()
 logger = logging.getLogger(__name__)
@@ -37,6 +37,27 @@ class RegisterUser(BaseModel):
     token: str
 
 
+class BulkRegister(BaseModel):
+    """Register many users in a single transaction."""
+
+    users: list[RegisterUser] = Field(..., description="Users and tokens to provision")
+
+
+class DevicePostureRecord(BaseModel):
+    """Posture reported by the MDM for a single device."""
+
+    device_id: str
+    healthy: bool
+    posture_score: int
+    observed_at: float | None = None
+
+
+class PostureUpdate(BaseModel):
+    """Batch of device posture records from the MDM feed."""
+
+    devices: list[DevicePostureRecord]
+
+
 class TokenVerify(BaseModel):
     """Token verification request model."""
 
@@ -44,12 +65,131 @@ class TokenVerify(BaseModel):
 
 
 @app.post("/policy/update")
-def update_policy(payload: PolicyUpdate) -> dict[str, str]:
-    """Replace the policy file with the posted document."""
+def update_policy(payload: PolicyUpdate) -> dict[str, object]:
+    """Replace the policy document in the store and export it for file-watching gateways."""
+
+    store = admin.policy_store()
+    version = store.replace_document(payload.policies)
+    store.export_yaml(admin.CONFIG_PATH)
+    logger.info("Policies updated via control plane", extra={"policy_version": version})
+    return {"status": "ok", "version": version}
+
+
+@app.get("/policy/version")
+def policy_version() -> dict[str, int]:
+    """Return the monotonic policy version so gateways can tell when to pull."""
+
+    return {"version": admin.policy_store().version}
+
+
+@app.get("/policy/changes")
+def policy_changes(since: int = 0) -> dict[str, object]:
+    """Return users, tokens, and sections changed after version ``since``."""
+
+    if since < 0:
+        raise HTTPException(status_code=400, detail="since must not be negative")
+    return admin.policy_store().changes_since(since)
+
+
+@app.post("/policy/what-if")
+def policy_what_if(
+    payload: PolicyUpdate, top: int = 10, since: float | None = None
+) -> dict[str, object]:
+    """Diff a candidate policy against the verdicts recorded in the gateway log."""
+
+    from gateway.what_if import load_events, what_if
+
+    if top <= 0:
+        raise HTTPException(status_code=400, detail="top must be positive")
+    records = read_records(LOG_PATH) if LOG_PATH.exists() else iter(LOG_STORE)
+    return what_if(load_events(records, since=since), payload.policies, top=top)
+
+
+@app.get("/stats")
+def traffic_stats(since: float | None = None, top: int = 10) -> dict[str, object]:
+    """Request totals extrapolated from sampled and aggregated log records."""
+
+    from siem.log_policy import weighted_stats
+
+    if top <= 0:
+        raise HTTPException(status_code=400, detail="top must be positive")
+    records = read_records(LOG_PATH) if LOG_PATH.exists() else iter(LOG_STORE)
+    return weighted_stats(records, since=since, top=top)
+
+
+@app.post("/debug/profiler/start")
+def start_profiler(hz: float = 100.0, duration: float = 60.0) -> dict[str, object]:
+    """Ask every gateway worker to start its sampling profiler for ``duration`` seconds."""
+
+    from gateway.profiling import debug_dir, request_profile
+
+    if not 0 < hz <= 1000:
+        raise HTTPException(status_code=400, detail="hz must be in (0, 1000]")
+    if not 0 < duration <= 3600:
+        raise HTTPException(status_code=400, detail="duration must be in (0, 3600]")
+    control = request_profile(debug_dir(), "start", hz=hz, duration=duration)
+    logger.info("Profiler requested", extra={"session": control["session"], "hz": hz})
+    return {"status": "started", **control}
+
+
+@app.post("/debug/profiler/stop")
+def stop_profiler() -> dict[str, object]:
+    """Ask every gateway worker to stop the current profiling session."""
 
-    admin.save_policies(payload.policies)
-    logger.info("Policies updated via control plane")
-    return {"status": "ok"}
+    from gateway.profiling import debug_dir, request_profile
+
+    control = request_profile(debug_dir(), "stop")
+    if not control:
+        raise HTTPException(status_code=404, detail="no profiling session")
+    return {"status": "stopped", "session": control["session"]}
+
+
+@app.get("/debug/profiler/output", response_class=PlainTextResponse)
+def profiler_output(session: str | None = None) -> PlainTextResponse:
+    """Merged collapsed stacks from all workers, ready for flamegraph tools."""
+
+    from gateway.profiling import debug_dir, profile_output
+
+    session, collapsed = profile_output(debug_dir(), session)
+    if not collapsed:
+        raise HTTPException(status_code=404, detail="no profile output yet")
+    return PlainTextResponse(
+        collapsed,
+        headers={"Content-Disposition": f'attachment; filename="profile-{session}.folded"'},
+    )
+
+
+@app.get("/debug/slow-requests")
+def get_slow_requests(limit: int = 50, min_ms: float = 0.0) -> list[dict[str, object]]:
+    """Slow requests recorded by gateway workers, newest first."""
+
+    from gateway.profiling import debug_dir, slow_requests
+
+    if limit <= 0:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    return slow_requests(debug_dir(), limit=limit, min_ms=min_ms)
+
+
+@app.get("/debug/memory")
+def get_memory() -> dict[str, object]:
+    """Per-component memory usage last reported by each gateway worker."""
+
+    from gateway.profiling import debug_dir, memory_reports
+
+    workers = memory_reports(debug_dir())
+    totals: dict[str, int] = {}
+    for report in workers:
+        for kind, size in report.get("totals", {}).items():
+            totals[kind] = totals.get(kind, 0) + size
+    return {"totals": totals, "workers": workers}
+
+
+@app.post("/policy/export")
+def export_policy() -> dict[str, object]:
+    """Write the current policy document to policies.yaml atomically."""
+
+    version = admin.export_policies(admin.policy_store())
+    return {"status": "exported", "version": version, "path": str(admin.CONFIG_PATH)}
 
 
 @app.get("/logs")
@@ -61,42 +201,64 @@ def get_logs(limit: int = 50) -> list[LogEntry]:
 
     entries: list[LogEntry] = []
     if LOG_PATH.exists():
-        with LOG_PATH.open("r", encoding="utf-8") as handle:
-            for line in handle:
-                try:
-                    entries.append(json.loads(line))
-                except json.JSONDecodeError:
-                    continue
+        entries = tail_records(LOG_PATH, limit)
     if not entries:
         entries = LOG_STORE
     return entries[-limit:]
 
 
 @app.post("/user/register")
-def register_user(user: RegisterUser) -> dict[str, str]:
+def register_user(user: RegisterUser) -> dict[str, object]:
     """Register a user with a token and baseline policy defaults."""
 
-    policies = admin.load_policies()
-    users = policies.setdefault("users", {})
-    users[user.username] = {
-        "allowed_categories": ["Business", "Productivity"],
-        "blocked_categories": ["Malware"],
-        "allowed_destinations": [],
-        "device_trust_required": True,
-        "allow_all_if_no_match": False,
-    }
-    tokens = policies.setdefault("tokens", {})
-    tokens[user.username] = user.token
-    admin.save_policies(policies)
-    logger.info("Registered user", extra={"user": user.username})
-    return {"status": "registered", "user": user.username}
+    store = admin.policy_store()
+    version = store.upsert_user(user.username, admin.DEFAULT_USER_POLICY, token=user.token)
+    admin.policy_exporter(store).notify()
+    logger.info("Registered user", extra={"user": user.username, "policy_version": version})
+    return {"status": "registered", "user": user.username, "version": version}
+
+
+@app.post("/user/register/bulk")
+def register_users(payload: BulkRegister) -> dict[str, object]:
+    """Register many users with baseline policy defaults in one transaction."""
+
+    store = admin.policy_store()
+    version = store.register_users(
+        ((user.username, user.token) for user in payload.users), admin.DEFAULT_USER_POLICY
+    )
+    admin.policy_exporter(store).notify()
+    logger.info("Registered users", extra={"count": len(payload.users), "policy_version": version})
+    return {"status": "registered", "count": len(payload.users), "version": version}
+
+
+@app.post("/device/posture")
+def update_device_posture(payload: PostureUpdate) -> dict[str, object]:
+    """Bulk-upsert device posture and republish the feed file gateways follow."""
+
+    registry = admin.posture_registry()
+    applied = registry.bulk_update(record.model_dump() for record in payload.devices)
+    registry.dump(admin.POSTURE_FEED_PATH)
+    logger.info("Device posture updated", extra={"applied": applied})
+    return {"status": "ok", "applied": applied, "devices": len(registry)}
+
+
+@app.get("/device/posture/{device_id}")
+def get_device_posture(device_id: str) -> dict[str, object]:
+    """Return the current posture for a device, or 404 if unknown or expired."""
+
+    posture = admin.posture_registry().get(device_id)
+    if posture is None:
+        raise HTTPException(status_code=404, detail="unknown device")
+    return dict(posture.__dict__)
 
 
 @app.post("/token/verify")
 def token_verify(payload: TokenVerify) -> dict[str, str]:
     """Validate a Zero Trust token."""
 
-    validator = ZTNATokenValidator()
+    validator = ZTNATokenValidator(
+        known_tokens=tokens_from_policy({"tokens": admin.policy_store().tokens()})
+    )
     result = validator.validate(payload.token)
     if not result.valid or result.user is None:
         raise HTTPException(status_code=401, detail=result.reason)
@@ -108,5 +270,10 @@ def status() -> JSONResponse:
     """Health and config status endpoint."""
 
     config_path = Path(__file__).resolve().parents[1] / "config" / "policies.yaml"
-    health = {"status": "healthy", "policies_path": str(config_path), "log_path": str(LOG_PATH)}
+    health = {
+        "status": "healthy",
+        "policies_path": str(config_path),
+        "log_path": str(LOG_PATH),
+        "policy_version": admin.policy_store().version,
+    }
     return JSONResponse(health)
@@ -0,0 +1,323 @@
+"""Transactional SQLite-backed policy store with YAML import and export."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    policy TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tokens (
+    username TEXT PRIMARY KEY,
+    token TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sections (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS changes (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_by_key ON changes (kind, key, version);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Tables holding each kind of document entry; the change log references these kinds.
+KIND_TABLES: dict[str, tuple[str, str, str]] = {
+    "user": ("users", "username", "policy"),
+    "token": ("tokens", "username", "token"),
+    "section": ("sections", "name", "value"),
+}
+
+
+class PolicyStore:
+    """Policy document stored as indexed rows rather than one YAML file.
+
+    Users, tokens, and top-level sections (``default_policy`` and friends) are separate
+    rows, so registering a user is a single-row transaction instead of a full document
+    rewrite. Every write appends to a change log whose autoincrement key is the policy
+    version; gateways can poll ``version`` and fetch only ``changes_since`` their last pull.
+    The database runs in WAL mode so readers never block the writer.
+
+    The document last imported from or exported to policies.yaml is kept alongside, so
+    ``import_if_edited`` can tell a hand edit from the store's own output and apply just
+    that edit.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _write(self, conn: sqlite3.Connection, kind: str, key: str, value: Any | None) -> None:
+        table, key_column, value_column = KIND_TABLES[kind]
+        if value is None:
+            conn.execute(f"DELETE FROM {table} WHERE {key_column} = ?", (key,))
+        else:
+            encoded = value if kind == "token" else json.dumps(value)
+            conn.execute(
+                f"INSERT INTO {table} ({key_column}, {value_column}) VALUES (?, ?) "
+                f"ON CONFLICT({key_column}) DO UPDATE SET {value_column} = excluded.{value_column}",
+                (key, encoded),
+            )
+        conn.execute("INSERT INTO changes (kind, key) VALUES (?, ?)", (kind, key))
+
+    def _read(self, kind: str, key: str) -> Any | None:
+        table, key_column, value_column = KIND_TABLES[kind]
+        row = self._conn.execute(
+            f"SELECT {value_column} FROM {table} WHERE {key_column} = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0] if kind == "token" else json.loads(row[0])
+
+    def _version(self) -> int:
+        return self._conn.execute("SELECT MAX(version) FROM changes").fetchone()[0] or 0
+
+    @property
+    def version(self) -> int:
+        """Monotonic policy version; increases with every committed write."""
+
+        with self._lock:
+            return self._version()
+
+    def is_empty(self) -> bool:
+        return self.version == 0
+
+    def get_user(self, username: str) -> dict[str, Any] | None:
+        with self._lock:
+            return self._read("user", username)
+
+    def tokens(self) -> dict[str, str]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT username, token FROM tokens ORDER BY username"))
+
+    def upsert_user(self, username: str, policy: dict[str, Any], token: str | None = None) -> int:
+        """Create or replace a single user's policy (and optionally token) atomically."""
+
+        return self.register_users([(username, token)], policy)
+
+    def register_users(
+        self, users: Iterable[tuple[str, str | None]], policy: dict[str, Any]
+    ) -> int:
+        """Register many users sharing ``policy`` in one transaction; returns the version."""
+
+        with self._transaction() as conn:
+            for username, token in users:
+                self._write(conn, "user", username, policy)
+                if token is not None:
+                    self._write(conn, "token", username, token)
+            return self._version()
+
+    def delete_user(self, username: str) -> int:
+        with self._transaction() as conn:
+            self._write(conn, "user", username, None)
+            self._write(conn, "token", username, None)
+            return self._version()
+
+    def replace_document(self, document: dict[str, Any]) -> int:
+        """Replace the full policy document, recording only entries that changed."""
+
+        with self._transaction() as conn:
+            current = self._document()
+            for kind, old, new in (
+                ("user", current.get("users") or {}, document.get("users") or {}),
+                ("token", current.get("tokens") or {}, document.get("tokens") or {}),
+                (
+                    "section",
+                    {k: v for k, v in current.items() if k not in ("users", "tokens")},
+                    {k: v for k, v in document.items() if k not in ("users", "tokens")},
+                ),
+            ):
+                for key in old.keys() - new.keys():
+                    self._write(conn, kind, key, None)
+                for key, value in new.items():
+                    if old.get(key) != value:
+                        self._write(conn, kind, key, value)
+            return self._version()
+
+    def document(self) -> dict[str, Any]:
+        """Assemble the full policy document in the layout of policies.yaml."""
+
+        with self._lock:
+            return self._document()
+
+    def _document(self) -> dict[str, Any]:
+        users = {
+            name: json.loads(policy)
+            for name, policy in self._conn.execute(
+                "SELECT username, policy FROM users ORDER BY username"
+            )
+        }
+        sections = {
+            name: json.loads(value)
+            for name, value in self._conn.execute("SELECT name, value FROM sections")
+        }
+        tokens = dict(self._conn.execute("SELECT username, token FROM tokens ORDER BY username"))
+        document: dict[str, Any] = {"users": users, **sections}
+        if tokens:
+            document["tokens"] = tokens
+        return document
+
+    def changes_since(self, version: int) -> dict[str, Any]:
+        """Return entries changed after ``version``; deleted entries map to ``None``."""
+
+        delta: dict[str, Any] = {"users": {}, "tokens": {}, "sections": {}}
+        with self._lock:
+            current = self._version()
+            changed = self._conn.execute(
+                "SELECT DISTINCT kind, key FROM changes WHERE version > ?", (version,)
+            ).fetchall()
+            for kind, key in changed:
+                delta[KIND_TABLES[kind][0]][key] = self._read(kind, key)
+        delta["since"] = version
+        delta["version"] = current
+        return delta
+
+    def import_yaml(self, path: Path) -> int:
+        """Load a policies.yaml document into the store."""
+
+        from api.admin import load_policies
+
+        document = load_policies(path)
+        version = self.replace_document(document)
+        self._record_synced(path, document)
+        return version
+
+    def export_yaml(self, path: Path) -> int:
+        """Atomically write the current document to ``path``; returns the exported version."""
+
+        from api.admin import save_policies
+
+        with self._lock:
+            version = self._version()
+            document = self._document()
+        save_policies(document, path)
+        self._record_synced(path, document)
+        return version
+
+    def import_if_edited(self, path: Path) -> bool:
+        """Apply edits made to ``path`` since the store last imported or exported it.
+
+        Only entries the edit added, changed, or removed are written, so writes to the
+        store since that sync are kept. A store that has never synced with ``path``
+        only starts tracking it.
+        """
+
+        from api.admin import load_policies
+
+        digest = _file_hash(path)
+        if digest is None:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (f"synced:{path}",)
+            ).fetchone()
+        if row is None:
+            self._record_synced(path, load_policies(path))
+            return False
+        synced = json.loads(row[0])
+        if synced["hash"] == digest:
+            return False
+        edited = load_policies(path)
+        with self._lock:
+            current = self._document()
+        self.replace_document(_merge_edits(current, synced["document"], edited))
+        self._record_synced(path, edited)
+        return True
+
+    def _record_synced(self, path: Path, document: dict[str, Any]) -> None:
+        digest = _file_hash(path)
+        if digest is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (f"synced:{path}", json.dumps({"hash": digest, "document": document})),
+            )
+
+
+def _file_hash(path: Path) -> str | None:
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def _merge_edits(
+    current: dict[str, Any], base: dict[str, Any], edited: dict[str, Any]
+) -> dict[str, Any]:
+    """Apply the difference between ``base`` and ``edited`` to ``current``."""
+
+    def entries(document: dict[str, Any], section: str | None) -> dict[str, Any]:
+        if section is None:
+            return {k: v for k, v in document.items() if k not in ("users", "tokens")}
+        return dict(document.get(section) or {})
+
+    merged: dict[str, Any] = {}
+    for section in ("users", "tokens", None):
+        result = entries(current, section)
+        before, after = entries(base, section), entries(edited, section)
+        for key in before.keys() - after.keys():
+            result.pop(key, None)
+        for key, value in after.items():
+            if before.get(key) != value:
+                result[key] = value
+        if section is None:
+            merged.update(result)
+        else:
+            merged[section] = result
+    return merged
+
+
+def apply_changes(document: dict[str, Any], delta: dict[str, Any]) -> dict[str, Any]:
+    """Apply a ``changes_since`` delta to a previously pulled policy document."""
+
+    updated = dict(document)
+    for section in ("users", "tokens"):
+        entries = dict(updated.get(section) or {})
+        for name, value in delta.get(section, {}).items():
+            if value is None:
+                entries.pop(name, None)
+            else:
+                entries[name] = value
+        updated[section] = entries
+    for name, value in delta.get("sections", {}).items():
+        if value is None:
+            updated.pop(name, None)
+        else:
+            updated[name] = value
+    return updated
@@ -2,7 +2,17 @@
 
 from __future__ import annotations
 
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
 from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Mapping
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass(frozen=True)
@@ -14,15 +24,213 @@ class DevicePosture:
     posture_score: int
 
 
+UNKNOWN_POSTURE_SCORE = 0
+
+
+class PostureRegistry:
+    """Bounded, TTL-expiring map of ``device_id`` to posture reported by an MDM feed.
+
+    Entries hold one shared ``DevicePosture`` plus the wall-clock time it was observed, so
+    a lookup is a single dict access with no allocation. When ``max_entries`` is reached
+    the least recently updated device is evicted.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 900.0,
+        max_entries: int = 100_000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: dict[str, tuple[DevicePosture, float]] = {}
+        self._lock = threading.Lock()
+        self._follow_stop = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, device_id: str) -> DevicePosture | None:
+        """Return the device's posture, or ``None`` if it is unknown or expired."""
+
+        entry = self._entries.get(device_id)
+        if entry is None or self.clock() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def update(
+        self,
+        device_id: str,
+        healthy: bool,
+        posture_score: int,
+        observed_at: float | None = None,
+    ) -> None:
+        self.bulk_update(
+            [
+                {
+                    "device_id": device_id,
+                    "healthy": healthy,
+                    "posture_score": posture_score,
+                    "observed_at": observed_at,
+                }
+            ]
+        )
+
+    def bulk_update(self, records: Iterable[Mapping[str, Any]]) -> int:
+        """Upsert feed records; returns how many were applied.
+
+        Records need ``device_id``, ``healthy`` (a boolean), and ``posture_score``;
+        ``observed_at`` (epoch seconds) defaults to now. Malformed records, including a
+        ``healthy`` given as a string or number, are skipped with a warning.
+        """
+
+        now = self.clock()
+        applied = 0
+        with self._lock:
+            for record in records:
+                try:
+                    device_id = str(record["device_id"])
+                    healthy = record["healthy"]
+                    # bool("false") is True; anything but a real boolean must not pass.
+                    if not isinstance(healthy, bool):
+                        raise TypeError(f"healthy must be a boolean, not {healthy!r}")
+                    posture = DevicePosture(
+                        device_id=device_id,
+                        healthy=healthy,
+                        posture_score=int(record["posture_score"]),
+                    )
+                    observed_at = float(record.get("observed_at") or now)
+                except (KeyError, TypeError, ValueError) as exc:
+                    logger.warning("Skipping malformed posture record", extra={"error": str(exc)})
+                    continue
+                self._entries.pop(device_id, None)
+                self._entries[device_id] = (posture, observed_at)
+                applied += 1
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+        return applied
+
+    def purge_expired(self) -> int:
+        """Drop expired entries; returns how many were removed."""
+
+        cutoff = self.clock() - self.ttl
+        with self._lock:
+            expired = [key for key, (_, seen) in self._entries.items() if seen < cutoff]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+    def records(self) -> Iterator[dict[str, Any]]:
+        """Yield live entries in the feed format accepted by ``bulk_update``."""
+
+        cutoff = self.clock() - self.ttl
+        for posture, observed_at in list(self._entries.values()):
+            if observed_at >= cutoff:
+                yield {**posture.__dict__, "observed_at": observed_at}
+
+    def load_feed(self, source: str | Path) -> int:
+        """Bulk-load a JSON array or JSON-lines feed from a file path or http(s) URL."""
+
+        if str(source).startswith(("http://", "https://")):
+            from urllib.request import urlopen
+
+            with urlopen(str(source), timeout=30) as response:
+                return self.bulk_update(_parse_feed(response.read().decode("utf-8")))
+        path = Path(source)
+        with path.open("r", encoding="utf-8") as handle:
+            first = handle.read(1)
+            while first.isspace():
+                first = handle.read(1)
+            handle.seek(0)
+            if first == "[":
+                return self.bulk_update(json.load(handle))
+            return self.bulk_update(json.loads(line) for line in handle if line.strip())
+
+    def dump(self, path: Path) -> int:
+        """Atomically write live entries to ``path`` as JSON lines; returns the count."""
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        count = 0
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                for record in self.records():
+                    handle.write(json.dumps(record) + "\n")
+                    count += 1
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return count
+
+    def follow(self, path: Path, interval: float = 60.0) -> threading.Thread:
+        """Load ``path`` now, then reload it in the background whenever it changes."""
+
+        last_mtime = -1
+
+        def poll() -> None:
+            nonlocal last_mtime
+            try:
+                mtime = path.stat().st_mtime_ns
+                if mtime != last_mtime:
+                    last_mtime = mtime
+                    self.load_feed(path)
+                    self.purge_expired()
+            except (OSError, ValueError) as exc:
+                logger.error(
+                    "Posture feed reload failed", extra={"error": str(exc), "path": str(path)}
+                )
+
+        def run() -> None:
+            while not self._follow_stop.wait(interval):
+                poll()
+
+        poll()
+        self._follow_stop.clear()
+        thread = threading.Thread(target=run, name="posture-feed", daemon=True)
+        thread.start()
+        return thread
+
+    def stop_following(self) -> None:
+        self._follow_stop.set()
+
+
+def _parse_feed(text: str) -> Iterable[Mapping[str, Any]]:
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        return json.loads(stripped)
+    return (json.loads(line) for line in text.splitlines() if line.strip())
+
+
 class DeviceTrust:
-    """Evaluates device context for Zero Trust decisions."""
+    """Evaluates device context for Zero Trust decisions.
 
-    def __init__(self, minimum_score: int = 70):
+    Without a registry the posture is taken from the request's device context. With a
+    ``PostureRegistry`` only the ``device_id`` is read from the request and the posture
+    comes from the MDM feed, so a client cannot claim to be healthy; unknown or expired
+    devices are treated as untrusted.
+    """
+
+    def __init__(self, minimum_score: int = 70, registry: PostureRegistry | None = None):
         self.minimum_score = minimum_score
+        self.registry = registry
 
     def evaluate(self, device: dict[str, str | int | bool]) -> DevicePosture:
+        device_id = str(device.get("device_id", "unknown"))
+        if self.registry is not None:
+            posture = self.registry.get(device_id)
+            if posture is None:
+                return DevicePosture(
+                    device_id=device_id, healthy=False, posture_score=UNKNOWN_POSTURE_SCORE
+                )
+            if posture.healthy and posture.posture_score < self.minimum_score:
+                return DevicePosture(
+                    device_id=device_id, healthy=False, posture_score=posture.posture_score
+                )
+            return posture
+
         healthy_flag = bool(device.get("healthy", True))
         score = int(device.get("posture_score", 80))
-        device_id = str(device.get("device_id", "unknown"))
         healthy = healthy_flag and score >= self.minimum_score
         return DevicePosture(device_id=device_id, healthy=healthy, posture_score=score)
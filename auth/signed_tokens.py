@@ -0,0 +1,398 @@
+"""Stateless signed Zero Trust tokens verified against a local key ring.
+
+Tokens are compact JWTs (``header.payload.signature``, base64url) whose payload
+carries the user (``sub``), ``groups``, and an expiry (``exp``). They are signed with
+HMAC-SHA256 (``HS256``) or Ed25519 (``EdDSA``, needs the optional ``cryptography``
+package). The header ``kid`` names the key. Every gateway can verify tokens locally
+without a shared token table.
+
+Rotation: add a new key and make it active, so new tokens are signed with it. Keep the
+old key until the tokens it signed have expired, then remove it. Ed25519 rings that only
+verify need only the public keys.
+
+Verified tokens are kept in a bounded LRU, so repeat requests skip the signature check;
+expiry is still checked on every hit. Key ring file (``$SWG_TOKEN_KEYS``)::
+
+    {"active": "2026-10", "keys": [{"kid": "2026-10", "alg": "HS256", "secret": "<b64url>"}]}
+
+Manage it with ``python -m auth.signed_tokens add-key|remove-key|issue``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+ALGORITHMS = ("HS256", "EdDSA")
+TOKEN_KEYS_ENV_VAR = "SWG_TOKEN_KEYS"
+
+
+def key_ring_stamp() -> tuple[str, int, int, int] | None:
+    """``(path, inode, mtime_ns, size)`` of ``$SWG_TOKEN_KEYS``; changes when it is saved.
+
+    A missing file stamps as ``-1``; ``None`` means no key ring is configured.
+    """
+
+    path = os.environ.get(TOKEN_KEYS_ENV_VAR)
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return (path, -1, -1, -1)
+    return (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class TokenError(ValueError):
+    """Raised when a signed token is malformed, forged, or outside its validity window."""
+
+
+@dataclass(frozen=True)
+class TokenKey:
+    """One key in a ``KeyRing``.
+
+    ``secret`` is the HMAC key for ``HS256``. For ``EdDSA``, ``public_key`` and the
+    optional ``private_key`` are raw 32-byte Ed25519 keys.
+    """
+
+    kid: str
+    algorithm: str
+    secret: bytes | None = None
+    public_key: bytes | None = None
+    private_key: bytes | None = None
+
+    def __post_init__(self) -> None:
+        if self.algorithm not in ALGORITHMS:
+            raise ValueError(f"Unsupported token algorithm: {self.algorithm}")
+        if self.algorithm == "HS256" and not self.secret:
+            raise ValueError(f"HS256 key {self.kid!r} needs a secret")
+        if self.algorithm == "EdDSA" and not (self.public_key or self.private_key):
+            raise ValueError(f"EdDSA key {self.kid!r} needs a public or private key")
+
+    @classmethod
+    def generate(cls, kid: str, algorithm: str = "HS256") -> TokenKey:
+        if algorithm == "HS256":
+            return cls(kid, algorithm, secret=secrets.token_bytes(32))
+        private = _ed25519().Ed25519PrivateKey.generate()
+        return cls(
+            kid, algorithm, public_key=_raw_public(private), private_key=_raw_private(private)
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> TokenKey:
+        def raw(name: str) -> bytes | None:
+            return _b64decode(data[name]) if data.get(name) else None
+
+        return cls(
+            data["kid"],
+            data.get("alg", "HS256"),
+            secret=raw("secret"),
+            public_key=raw("public_key"),
+            private_key=raw("private_key"),
+        )
+
+    def to_dict(self) -> dict[str, str]:
+        data = {"kid": self.kid, "alg": self.algorithm}
+        for name in ("secret", "public_key", "private_key"):
+            value = getattr(self, name)
+            if value:
+                data[name] = _b64encode(value)
+        return data
+
+
+@dataclass(frozen=True)
+class TokenClaims:
+    """Verified contents of a signed token."""
+
+    user: str
+    groups: tuple[str, ...]
+    expires_at: float
+    not_before: float | None
+    kid: str
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _ed25519() -> Any:
+    try:
+        from cryptography.hazmat.primitives.asymmetric import ed25519
+    except ImportError as exc:  # pragma: no cover - depends on optional dependency
+        raise RuntimeError("EdDSA tokens require the 'cryptography' package") from exc
+    return ed25519
+
+
+def _raw_public(private: Any) -> bytes:
+    from cryptography.hazmat.primitives import serialization
+
+    return private.public_key().public_bytes(
+        serialization.Encoding.Raw, serialization.PublicFormat.Raw
+    )
+
+
+def _raw_private(private: Any) -> bytes:
+    from cryptography.hazmat.primitives import serialization
+
+    return private.private_bytes(
+        serialization.Encoding.Raw, serialization.PrivateFormat.Raw, serialization.NoEncryption()
+    )
+
+
+def looks_signed(token: str) -> bool:
+    """Cheap shape check used to skip signed-token parsing for pre-shared tokens."""
+
+    return token.count(".") == 2
+
+
+class KeyRing:
+    """Verification (and optionally signing) keys plus a cache of verified tokens.
+
+    Args:
+        keys: Keys tokens may be signed with, looked up by ``kid``.
+        active: ``kid`` used by ``issue``; defaults to the last key given.
+        cache_size: Verified tokens to remember; ``0`` disables the cache.
+        leeway: Seconds of clock skew tolerated on ``exp`` and ``nbf``.
+        clock: Wall-clock time source, injectable for tests.
+    """
+
+    def __init__(
+        self,
+        keys: Iterable[TokenKey],
+        active: str | None = None,
+        *,
+        cache_size: int = 10_000,
+        leeway: float = 30.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.keys = {key.kid: key for key in keys}
+        self.active = active or (next(reversed(self.keys)) if self.keys else None)
+        if self.active is not None and self.active not in self.keys:
+            raise ValueError(f"Active key {self.active!r} is not in the key ring")
+        self.cache_size = cache_size
+        self.leeway = leeway
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._verifiers = {kid: self._verifier(key) for kid, key in self.keys.items()}
+        self._cache: OrderedDict[str, TokenClaims] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str | Path, **options: Any) -> KeyRing:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        keys = [TokenKey.from_dict(entry) for entry in data.get("keys", [])]
+        return cls(keys, data.get("active"), **options)
+
+    @classmethod
+    def from_env(cls) -> KeyRing | None:
+        """Key ring named by ``$SWG_TOKEN_KEYS``, shared until the file changes.
+
+        Raises:
+            ValueError: If the variable names a key file that cannot be read.
+        """
+
+        stamp = key_ring_stamp()
+        if stamp is None:
+            return None
+        path = stamp[0]
+        try:
+            if stamp[1] < 0:
+                Path(path).stat()  # raises the error explaining why the file is unreadable
+            with _ENV_LOCK:
+                if _ENV_RING.get("stamp") != stamp:
+                    _ENV_RING.update(stamp=stamp, ring=cls.from_file(path))
+                return _ENV_RING["ring"]
+        except OSError as exc:
+            raise ValueError(
+                f"${TOKEN_KEYS_ENV_VAR} names a key ring that cannot be read: {path} "
+                f"({exc.strerror or exc})"
+            ) from exc
+
+    def save(self, path: str | Path) -> None:
+        """Atomically write the ring, secrets included, to ``path`` with mode 0600."""
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        document = {"active": self.active, "keys": [key.to_dict() for key in self.keys.values()]}
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump(document, handle, indent=2)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def issue(self, user: str, groups: Iterable[str] = (), ttl: float = 3600.0) -> str:
+        """Sign a token for ``user`` with the active key, valid for ``ttl`` seconds."""
+
+        if self.active is None:
+            raise TokenError("key ring has no signing key")
+        key = self.keys[self.active]
+        now = int(self.clock())
+        header = {"alg": key.algorithm, "typ": "JWT", "kid": key.kid}
+        payload = {"sub": user, "groups": list(groups), "iat": now, "exp": now + int(ttl)}
+        signing_input = ".".join(
+            _b64encode(json.dumps(part, separators=(",", ":")).encode())
+            for part in (header, payload)
+        )
+        return f"{signing_input}.{_b64encode(self._sign(key, signing_input.encode()))}"
+
+    def verify(self, token: str) -> TokenClaims:
+        """Return the token's claims, or raise ``TokenError``.
+
+        A cached token is trusted without repeating the signature check, but its
+        validity window is checked on every call.
+        """
+
+        with self._lock:
+            claims = self._cache.get(token)
+            if claims is not None:
+                self._cache.move_to_end(token)
+                self.hits += 1
+        if claims is None:
+            claims = self._verify_signature(token)
+            self._check_window(claims)
+            with self._lock:
+                self.misses += 1
+                if self.cache_size:
+                    self._cache[token] = claims
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+            return claims
+        self._check_window(claims)
+        return claims
+
+    def _check_window(self, claims: TokenClaims) -> None:
+        now = self.clock()
+        if now > claims.expires_at + self.leeway:
+            raise TokenError("token expired")
+        if claims.not_before is not None and now < claims.not_before - self.leeway:
+            raise TokenError("token not yet valid")
+
+    def _verify_signature(self, token: str) -> TokenClaims:
+        # Tokens are base64url and dots; anything else is malformed before it is split.
+        if not isinstance(token, str) or not token.isascii():
+            raise TokenError("malformed token")
+        try:
+            header_b64, payload_b64, signature_b64 = token.split(".")
+            header = json.loads(_b64decode(header_b64))
+            signature = _b64decode(signature_b64)
+        except (ValueError, TypeError, UnicodeError) as exc:
+            raise TokenError("malformed token") from exc
+        if not isinstance(header, dict):
+            raise TokenError("malformed token")
+        kid = header.get("kid")
+        verifier = self._verifiers.get(kid) if isinstance(kid, str) else None
+        if verifier is None:
+            raise TokenError("unknown signing key")
+        # The algorithm is fixed per key, so a token cannot pick a weaker one.
+        if header.get("alg") != self.keys[kid].algorithm:
+            raise TokenError("algorithm mismatch")
+        if not verifier(f"{header_b64}.{payload_b64}".encode("ascii"), signature):
+            raise TokenError("bad signature")
+        try:
+            payload = json.loads(_b64decode(payload_b64))
+            user, expires_at = payload["sub"], float(payload["exp"])
+            groups = tuple(payload.get("groups") or ())
+            not_before = float(payload["nbf"]) if "nbf" in payload else None
+        except (ValueError, TypeError, KeyError) as exc:
+            raise TokenError("malformed claims") from exc
+        if not isinstance(user, str) or not user or not all(isinstance(g, str) for g in groups):
+            raise TokenError("malformed claims")
+        return TokenClaims(user, groups, expires_at, not_before, kid)
+
+    @staticmethod
+    def _verifier(key: TokenKey) -> Callable[[bytes, bytes], bool]:
+        if key.algorithm == "HS256":
+            secret = key.secret
+
+            def verify_hmac(message: bytes, signature: bytes) -> bool:
+                expected = hmac.new(secret, message, hashlib.sha256).digest()  # type: ignore[arg-type]
+                return hmac.compare_digest(expected, signature)
+
+            return verify_hmac
+
+        ed25519 = _ed25519()
+        if key.public_key:
+            public = ed25519.Ed25519PublicKey.from_public_bytes(key.public_key)
+        else:
+            public = ed25519.Ed25519PrivateKey.from_private_bytes(key.private_key).public_key()
+
+        def verify_ed25519(message: bytes, signature: bytes) -> bool:
+            from cryptography.exceptions import InvalidSignature
+
+            try:
+                public.verify(signature, message)
+            except InvalidSignature:
+                return False
+            return True
+
+        return verify_ed25519
+
+    @staticmethod
+    def _sign(key: TokenKey, message: bytes) -> bytes:
+        if key.algorithm == "HS256":
+            return hmac.new(key.secret, message, hashlib.sha256).digest()  # type: ignore[arg-type]
+        if not key.private_key:
+            raise TokenError(f"key {key.kid!r} has no private key")
+        return _ed25519().Ed25519PrivateKey.from_private_bytes(key.private_key).sign(message)
+
+
+_ENV_LOCK = threading.Lock()
+_ENV_RING: dict[str, Any] = {}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage signed-token keys and issue tokens")
+    parser.add_argument("--ring", default=os.environ.get(TOKEN_KEYS_ENV_VAR))
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add-key", help="generate a key and make it active")
+    add.add_argument("kid")
+    add.add_argument("--alg", choices=ALGORITHMS, default="HS256")
+    remove = commands.add_parser("remove-key", help="retire a key; its tokens stop verifying")
+    remove.add_argument("kid")
+    issue = commands.add_parser("issue", help="print a token signed with the active key")
+    issue.add_argument("user")
+    issue.add_argument("--groups", nargs="*", default=[])
+    issue.add_argument("--ttl", type=float, default=3600.0)
+    args = parser.parse_args(argv)
+    if not args.ring:
+        parser.error(f"--ring or ${TOKEN_KEYS_ENV_VAR} is required")
+
+    path = Path(args.ring)
+    ring = KeyRing.from_file(path) if path.exists() else KeyRing([])
+    if args.command == "issue":
+        print(ring.issue(args.user, args.groups, args.ttl))
+        return
+    keys = dict(ring.keys)
+    active = ring.active
+    if args.command == "add-key":
+        keys[args.kid] = TokenKey.generate(args.kid, args.alg)
+        active = args.kid
+    else:
+        keys.pop(args.kid, None)
+        if active == args.kid:
+            active = None
+    KeyRing(keys.values(), active).save(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,20 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-import yaml
+if TYPE_CHECKING:
+    from auth.signed_tokens import KeyRing
 
 DEFAULT_TOKENS = {"alice": "token-alice", "bob": "token-bob"}
 
 
+def tokens_from_policy(policy: dict[str, Any]) -> dict[str, str]:
+    """Return the token map from a parsed policy document, or the demo defaults."""
+
+    return policy.get("tokens") or DEFAULT_TOKENS
+
+
 @dataclass(frozen=True)
 class TokenValidationResult:
     """Outcome of validating a presented token."""
@@ -17,32 +25,59 @@ class TokenValidationResult:
     user: str | None
     valid: bool
     reason: str
+    groups: tuple[str, ...] = ()
 
 
 class ZTNATokenValidator:
-    """Mock token validator that maps pre-shared tokens to users."""
+    """Validates signed tokens against a key ring, falling back to pre-shared tokens.
+
+    ``key_ring`` defaults to the ring named by ``$SWG_TOKEN_KEYS`` (see
+    ``auth.signed_tokens``); without one only pre-shared tokens are accepted.
+    """
 
     def __init__(
-        self, known_tokens: dict[str, str] | None = None, token_store_path: Path | None = None
+        self,
+        known_tokens: dict[str, str] | None = None,
+        token_store_path: Path | None = None,
+        key_ring: KeyRing | None = None,
     ):
+        from auth.signed_tokens import KeyRing
+
         self.token_store_path = (
             token_store_path or Path(__file__).resolve().parents[1] / "config" / "policies.yaml"
         )
         self.known_tokens = known_tokens or self._load_tokens_from_policy()
+        # Reversed so that, as with a linear scan, the first user listed for a token wins.
+        self._users_by_token = {
+            token: user for user, token in reversed(list(self.known_tokens.items()))
+        }
+        self.key_ring = key_ring if key_ring is not None else KeyRing.from_env()
 
     def _load_tokens_from_policy(self) -> dict[str, str]:
         if self.token_store_path.exists():
+            import yaml
+
             with self.token_store_path.open("r", encoding="utf-8") as handle:
-                data = yaml.safe_load(handle) or {}
-                tokens = data.get("tokens") or {}
-                if tokens:
-                    return tokens
+                return tokens_from_policy(yaml.safe_load(handle) or {})
         return DEFAULT_TOKENS
 
     def validate(self, token: str | None) -> TokenValidationResult:
         if not token:
             return TokenValidationResult(user=None, valid=False, reason="missing token")
-        for user, expected in self.known_tokens.items():
-            if token == expected:
-                return TokenValidationResult(user=user, valid=True, reason="validated")
+        user = self._users_by_token.get(token)
+        if user is not None:
+            return TokenValidationResult(user=user, valid=True, reason="validated")
+        if self.key_ring is not None:
+            from auth.signed_tokens import TokenError, looks_signed
+
+            if looks_signed(token):
+                try:
+                    claims = self.key_ring.verify(token)
+                except TokenError as exc:
+                    return TokenValidationResult(
+                        user=None, valid=False, reason=f"invalid token: {exc}"
+                    )
+                return TokenValidationResult(
+                    user=claims.user, valid=True, reason="validated", groups=claims.groups
+                )
         return TokenValidationResult(user=None, valid=False, reason="invalid token")
@@ -0,0 +1,110 @@
+"""Queries per second through the DNS sinkhole over UDP.
+
+Starts a stand-in upstream resolver and the sinkhole on loopback, then drives it with a
+client that keeps ``--window`` queries outstanding. Three workloads are measured:
+answers served from the cache, sinkholed names, and unique names that all go upstream.
+Client, server, and upstream share one event loop, so the numbers are a lower bound
+for the server alone::
+
+    python -m benchmarks.bench_dns_server --queries 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import struct
+import time
+from typing import Any
+
+from gateway.dns_filter import DNSFilter
+from gateway.dns_server import FLAG_QR, DNSSinkholeServer, build_query, parse_query
+
+
+class StandInUpstream(asyncio.DatagramProtocol):
+    """Answers every A query with 192.0.2.1 and a one-hour TTL."""
+
+    def connection_made(self, transport: Any) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        question = parse_query(data)
+        answer = b"\xc0\x0c" + struct.pack("!HHIH", 1, 1, 3600, 4) + bytes([192, 0, 2, 1])
+        header = data[:2] + struct.pack("!5H", FLAG_QR | 0x0180, 1, 1, 0, 0)
+        self.transport.sendto(header + data[12 : question.question_end] + answer, addr)
+
+
+class Client(asyncio.DatagramProtocol):
+    def __init__(self, queries: list[bytes], window: int):
+        self.queries = queries
+        self.window = window
+        self.sent = 0
+        self.received = 0
+        self.done = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport: Any) -> None:
+        self.transport = transport
+        for _ in range(min(self.window, len(self.queries))):
+            self._send()
+
+    def _send(self) -> None:
+        self.transport.sendto(self.queries[self.sent])
+        self.sent += 1
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        self.received += 1
+        if self.sent < len(self.queries):
+            self._send()
+        elif self.received == len(self.queries) and not self.done.done():
+            self.done.set_result(None)
+
+
+async def drive(address: tuple[str, int], queries: list[bytes], window: int) -> float:
+    loop = asyncio.get_running_loop()
+    client = Client(queries, window)
+    start = time.perf_counter()
+    transport, _ = await loop.create_datagram_endpoint(lambda: client, remote_addr=address)
+    await asyncio.wait_for(client.done, 60)
+    elapsed = time.perf_counter() - start
+    transport.close()
+    return len(queries) / elapsed
+
+
+async def run(count: int, window: int) -> None:
+    loop = asyncio.get_running_loop()
+    upstream, _ = await loop.create_datagram_endpoint(StandInUpstream, local_addr=("127.0.0.1", 0))
+    server = DNSSinkholeServer(
+        DNSFilter(domains=["malware.test"]),
+        upstream.get_extra_info("sockname")[:2],
+        sinkhole_ipv4="0.0.0.0",
+    )
+    address = await server.start("127.0.0.1", 0)
+
+    hot = [
+        build_query(f"site{index % 100}.example.com", txid=index % 65536) for index in range(count)
+    ]
+    for query in hot[:100]:
+        await server.handle(query)
+    workloads = {
+        "cache hit": hot,
+        "sinkholed": [build_query(f"h{index}.malware.test") for index in range(count)],
+        "upstream": [build_query(f"cold{index}.example.net") for index in range(count)],
+    }
+    for label, queries in workloads.items():
+        qps = await drive(address, queries, window)
+        print(f"{label:>9}: {qps:>10,.0f} queries/s")
+    print(server.metrics())
+    await server.close()
+    upstream.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=50_000)
+    parser.add_argument("--window", type=int, default=64, help="outstanding queries")
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.queries, args.window))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Build time, file size, and lookup latency of the domain category database.
+
+Builds a synthetic feed of ``--entries`` domains (5M by default), then times lookups
+of subdomains of listed domains, unlisted hostnames, and repeats served by the LRU::
+
+    python -m benchmarks.bench_domain_db --entries 5000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator
+
+from gateway.domain_db import DomainCategoryDB, build_domain_db
+from gateway.latency import LatencyHistogram
+
+CATEGORIES = [
+    ["Business"],
+    ["News"],
+    ["Shopping"],
+    ["Social Media"],
+    ["Malware"],
+    ["Cloud Storage", "Productivity"],
+    ["Gambling"],
+    ["Streaming Media"],
+]
+TLDS = ["com", "net", "org", "io", "co.uk", "de", "com.au"]
+
+
+def feed(count: int) -> Iterator[tuple[str, list[str]]]:
+    rng = random.Random(7)
+    for index in range(count):
+        yield f"site{index:x}.{TLDS[index % len(TLDS)]}", rng.choice(CATEGORIES)
+
+
+def measure(db: DomainCategoryDB, hostnames: list[str]) -> tuple[LatencyHistogram, float]:
+    histogram = LatencyHistogram()
+    clock = time.perf_counter
+    began = clock()
+    for hostname in hostnames:
+        start = clock()
+        db.lookup(hostname)
+        histogram.add(clock() - start)
+    return histogram, clock() - began
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=5_000_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--cache-size", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "domains.db"
+        start = time.perf_counter()
+        build_domain_db(feed(args.entries), path)
+        elapsed = time.perf_counter() - start
+        size = path.stat().st_size
+        print(
+            f"built {args.entries:,} entries in {elapsed:.1f}s "
+            f"({size / 2**20:,.0f} MiB, {size / args.entries:.1f} B/entry)"
+        )
+
+        rng = random.Random(11)
+        db = DomainCategoryDB(path, cache_size=args.cache_size)
+        listed = [
+            f"www.site{(i := rng.randrange(args.entries)):x}.{TLDS[i % len(TLDS)]}"
+            for _ in range(args.lookups)
+        ]
+        unlisted = [f"host{rng.randrange(10**9)}.example.invalid" for _ in range(args.lookups)]
+        workloads = {
+            "subdomain hit (SQLite)": listed,
+            "unlisted (SQLite)": unlisted,
+            "repeat (LRU)": listed[: args.cache_size // 2] * 2,
+        }
+        for label, hostnames in workloads.items():
+            db._cache.clear()
+            if label.startswith("repeat"):
+                measure(db, hostnames[: len(hostnames) // 2])
+                hostnames = hostnames[len(hostnames) // 2 :]
+            histogram, elapsed = measure(db, hostnames)
+            print(
+                f"{label:>23}: p50={histogram.percentile(0.50) * 1e6:6.1f}us "
+                f"p99={histogram.percentile(0.99) * 1e6:6.1f}us "
+                f"{len(hostnames) / elapsed:>10,.0f} lookups/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Size and encode/decode speed of the binary event format versus JSON lines.
+
+Generates normalized events with realistic cardinalities (users, domains, devices) and
+compares both encodings::
+
+    python -m benchmarks.bench_event_codec --events 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import random
+import time
+from typing import Any
+
+from siem.codec import EventEncoder, decode
+
+CATEGORIES = [["Business"], ["Productivity"], ["Social Media"], ["Malware"], ["News", "Media"]]
+
+
+def synthetic_events(count: int, users: int, domains: int) -> list[dict[str, Any]]:
+    rng = random.Random(1)
+    events = []
+    for index in range(count):
+        domain = f"site{rng.randrange(domains)}.example.com"
+        blocked = index % 10 == 0
+        events.append(
+            {
+                "timestamp": 1_700_000_000 + index * 0.01,
+                "user": f"user{rng.randrange(users)}",
+                "domain": domain,
+                "url": f"https://{domain}/path/{rng.randrange(10**6)}",
+                "method": "GET",
+                "categories": rng.choice(CATEGORIES),
+                "allowed": not blocked,
+                "reasons": ["category blocked: Malware"] if blocked else [],
+                "dlp": "",
+                "casb": {"app": None, "violations": [], "action": "allow"},
+                "device": {
+                    "device_id": f"dev{rng.randrange(users)}",
+                    "healthy": True,
+                    "posture_score": 90,
+                },
+                "tls": {
+                    "server_name": domain,
+                    "tls_version": "TLSv1.3",
+                    "cipher_suite": "TLS_AES_256_GCM_SHA384",
+                },
+                "config_version": 1,
+            }
+        )
+    return events
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--domains", type=int, default=5_000)
+    args = parser.parse_args(argv)
+    events = synthetic_events(args.events, args.users, args.domains)
+
+    start = time.perf_counter()
+    json_data = "".join(json.dumps(event) + "\n" for event in events).encode()
+    json_encode = time.perf_counter() - start
+    start = time.perf_counter()
+    decoded_json = [json.loads(line) for line in json_data.splitlines()]
+    json_decode = time.perf_counter() - start
+
+    buffer = io.BytesIO()
+    start = time.perf_counter()
+    EventEncoder(buffer).write_many(events)
+    binary_encode = time.perf_counter() - start
+    binary_data = buffer.getvalue()
+    start = time.perf_counter()
+    decoded_binary = decode(binary_data)
+    binary_decode = time.perf_counter() - start
+    assert decoded_binary == decoded_json
+
+    for label, size, encode_s, decode_s in (
+        ("json", len(json_data), json_encode, json_decode),
+        ("binary", len(binary_data), binary_encode, binary_decode),
+    ):
+        print(
+            f"{label:>6}: {size / args.events:7.1f} B/event, "
+            f"encode {args.events / encode_s:>10,.0f} ev/s, "
+            f"decode {args.events / decode_s:>10,.0f} ev/s"
+        )
+    print(f" ratio: {len(binary_data) / len(json_data):.3f} of JSON bytes")
+
+
+if __name__ == "__main__":
+    main()
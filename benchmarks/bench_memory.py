@@ -0,0 +1,135 @@
+"""Bytes per blocklist entry, per user policy, and per cached verdict.
+
+Each structure is built the way a gateway builds it and measured twice: by
+``tracemalloc`` (allocations that stay live, the ground truth) and by
+``gateway.memory.measure`` with its default sampling (what the memory report and
+budgets use). The gap between the two is the estimator's error::
+
+    python -m benchmarks.bench_memory --domains 1000000 --users 10000 --verdicts 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from auth.signed_tokens import KeyRing, TokenKey
+from auth.ztna_token_validator import ZTNATokenValidator, tokens_from_policy
+from benchmarks.bench_tls_parse import synthetic_hello
+from gateway.dns_filter import DNSFilter
+from gateway.domain_db import DomainCategoryDB, build_domain_db
+from gateway.memory import Component, measure
+from gateway.tls_metadata_inspector import TLSMetadataInspector, parse_client_hello
+
+CATEGORIES = ["Business", "News", "Social Media", "Malware", "Gambling", "Productivity"]
+
+
+def traced(build: Callable[[], Any]) -> tuple[Any, int]:
+    """Run ``build`` and return its result with the bytes it left allocated."""
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def fill(lookup: Callable[[Any], Any], keys: Iterable[Any]) -> None:
+    """Call ``lookup`` on every key, keeping only what the cache itself retains."""
+
+    for key in keys:
+        lookup(key)
+
+
+def report(label: str, traced_bytes: int, components: dict[str, Component]) -> None:
+    """Print traced and estimated bytes per entry of the last of ``components``.
+
+    Earlier components own objects the last one shares, as in the gateway's report.
+    """
+
+    started = time.perf_counter()
+    usage = measure(components)[-1]
+    elapsed = (time.perf_counter() - started) * 1000
+    error = (usage.bytes - traced_bytes) / traced_bytes * 100 if traced_bytes else 0.0
+    print(
+        f"{label:<28} {usage.entries:>10,} {traced_bytes / usage.entries:>10,.1f} B "
+        f"{usage.bytes / usage.entries:>10,.1f} B {error:>+6.1f}% {elapsed:>8.1f} ms"
+    )
+
+
+def policy_document(users: int, rng: random.Random) -> dict[str, Any]:
+    document: dict[str, Any] = {"users": {}, "tokens": {}}
+    for index in range(users):
+        name = f"user{index:06d}"
+        document["users"][name] = {
+            "allowed_categories": rng.sample(CATEGORIES, 3),
+            "blocked_categories": rng.sample(CATEGORIES, 2),
+            "allowed_destinations": [f"app{rng.randrange(1000)}.example.com", "docs.internal"],
+            "device_trust_required": rng.random() < 0.5,
+            "allow_all_if_no_match": False,
+        }
+        document["tokens"][name] = f"token-{rng.getrandbits(64):016x}"
+    # Round-trip so every string is a separate object, as after parsing policies.yaml.
+    return json.loads(json.dumps(document))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--domains", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--verdicts", type=int, default=50_000)
+    args = parser.parse_args(argv)
+    rng = random.Random(7)
+
+    print(
+        f"{'structure':<28} {'entries':>10} {'traced':>12} {'estimated':>12} "
+        f"{'error':>7} {'measure':>11}"
+    )
+    domains = (f"h{rng.getrandbits(40):010x}.example-{i % 997}.com" for i in range(args.domains))
+    dns_filter, size = traced(lambda: DNSFilter(domains=domains))
+    blocklist = dns_filter.blocked_domains
+    report("blocklist domain", size, {"dns_blocklist": Component([blocklist], len(blocklist))})
+    del dns_filter
+
+    document, size = traced(lambda: policy_document(args.users, rng))
+    policies = Component([document], args.users)
+    report("user policy + token", size, {"policies": policies})
+    validator, size = traced(lambda: ZTNATokenValidator(tokens_from_policy(document)))
+    tables = Component([validator.known_tokens, validator._users_by_token], args.users, deep=False)
+    report("token lookup tables", size, {"policies": policies, "tokens": tables})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        hosts = [f"site{index}.example.org" for index in range(args.verdicts)]
+        db_path = Path(tmp) / "domains.db"
+        build_domain_db(((host, [rng.choice(CATEGORIES)]) for host in hosts), db_path)
+        db = DomainCategoryDB(db_path, cache_size=args.verdicts)
+        _, size = traced(lambda: fill(db.lookup, (f"www.{host}" for host in hosts)))
+        cache = Component([db._cache], len(db._cache))
+        report("category verdict (LRU)", size, {"category_cache": cache})
+
+    ring = KeyRing([TokenKey.generate("bench")])
+    ring.cache_size = args.verdicts
+    users = (f"user{index:06d}" for index in range(args.verdicts))
+    _, size = traced(lambda: fill(ring.verify, (ring.issue(user, ["eng"]) for user in users)))
+    report("verified token (LRU)", size, {"token_cache": Component([ring._cache], args.verdicts)})
+
+    hellos = [synthetic_hello(rng, profiles=10**9) for _ in range(5000)]
+    inspector = TLSMetadataInspector(fingerprint_cache_size=len(hellos))
+    parsed = (parse_client_hello(hello) for hello in hellos)
+    _, size = traced(lambda: fill(inspector.fingerprint, parsed))
+    fingerprints = Component([inspector._fingerprints], len(inspector._fingerprints))
+    report("TLS fingerprint (LRU)", size, {"tls_fingerprints": fingerprints})
+
+
+if __name__ == "__main__":
+    main()
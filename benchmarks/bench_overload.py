@@ -0,0 +1,121 @@
+"""Latency under overload with and without admission control.
+
+Measures closed-loop capacity, then offers ``--overload`` times that rate open-loop
+(arrivals on a fixed schedule, each handled by its own worker thread) for
+``--seconds``. Latency is measured from the scheduled arrival time, so time spent
+waiting for a worker counts::
+
+    python -m benchmarks.bench_overload --overload 5 --seconds 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from gateway.admission import AdmissionController, AdmissionPolicy
+from gateway.latency import LatencyHistogram
+from gateway.proxy import SecureWebGateway
+from siem.log_forwarder import LogForwarder
+
+REQUESTS: list[dict[str, str]] = []
+
+
+def build_requests(body_bytes: int) -> None:
+    """A mix of browsing and uploads; the DLP scan of upload bodies dominates the cost."""
+
+    body = ("quarterly numbers attached " * (body_bytes // 27 + 1))[:body_bytes]
+    REQUESTS[:] = [
+        {"url": "http://example.com/docs", "token": "token-alice"},
+        {"url": "http://example.com/upload", "method": "POST", "token": "token-bob", "body": body},
+        {"url": "http://malware.test/x", "token": "token-alice"},
+        {
+            "url": "http://example.com/upload",
+            "method": "POST",
+            "token": "token-alice",
+            "body": body,
+        },
+    ]
+
+
+def _gateway(admission: AdmissionController | None) -> SecureWebGateway:
+    gateway = SecureWebGateway(
+        log_forwarder=LogForwarder(destination=Path(os.devnull)), admission=admission
+    )
+    gateway.process_request(REQUESTS[0])
+    return gateway
+
+
+def capacity(seconds: float) -> float:
+    gateway = _gateway(None)
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        gateway.process_request(REQUESTS[count % len(REQUESTS)])
+        count += 1
+    return count / seconds
+
+
+def offered_load(gateway: SecureWebGateway, rate: float, seconds: float) -> dict[str, float]:
+    latencies = LatencyHistogram()
+    outcomes = {"completed": 0, "shed": 0, "blocked": 0}
+    lock = threading.Lock()
+
+    def handle(index: int, scheduled: float) -> None:
+        result = gateway.process_request(REQUESTS[index % len(REQUESTS)])
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            latencies.add(elapsed)
+            refused = any("admission control" in reason for reason in result.decision.reasons)
+            key = "shed" if result.shed else "blocked" if refused else "completed"
+            outcomes[key] += 1
+
+    total = int(rate * seconds)
+    with ThreadPoolExecutor(max_workers=256) as pool:
+        start = time.perf_counter()
+        for index in range(total):
+            scheduled = start + index / rate
+            if (delay := scheduled - time.perf_counter()) > 0:
+                time.sleep(delay)
+            pool.submit(handle, index, scheduled)
+    return {
+        **outcomes,
+        "p50_ms": latencies.percentile(0.50) * 1000,
+        "p99_ms": latencies.percentile(0.99) * 1000,
+        "max_ms": latencies.maximum * 1000,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--overload", type=float, default=5.0)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--max-in-flight", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--body-bytes", type=int, default=65536)
+    args = parser.parse_args(argv)
+    build_requests(args.body_bytes)
+
+    base = capacity(2.0)
+    rate = base * args.overload
+    print(f"capacity ~{base:,.0f} req/s; offering {rate:,.0f} req/s for {args.seconds}s")
+    for label, admission in (
+        ("no admission", None),
+        (
+            "admission",
+            AdmissionController(AdmissionPolicy(max_in_flight=args.max_in_flight, user_rate=None)),
+        ),
+    ):
+        stats = offered_load(_gateway(admission), rate, args.seconds)
+        print(
+            f"{label:>13}: p50={stats['p50_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms "
+            f"max={stats['max_ms']:8.2f}ms completed={stats['completed']:,.0f} "
+            f"shed={stats['shed']:,.0f} blocked={stats['blocked']:,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
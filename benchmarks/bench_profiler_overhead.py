@@ -0,0 +1,65 @@
+"""Gateway throughput with the sampling profiler off and at several sampling rates.
+
+Each rate runs ``process_request`` in a closed loop for ``--seconds``, ``--repeat``
+times in rotation with the baseline; the best run of each is reported to damp noise::
+
+    python -m benchmarks.bench_profiler_overhead --seconds 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+from gateway.profiling import SamplingProfiler
+from gateway.proxy import SecureWebGateway
+from siem.log_forwarder import LogForwarder
+
+REQUESTS = [
+    {"url": "http://example.com/docs", "token": "token-alice"},
+    {"url": "http://malware.test/x", "token": "token-bob"},
+    {
+        "url": "https://drive.google.com/upload/doc",
+        "method": "POST",
+        "token": "token-alice",
+        "body": "quarterly numbers " * 50,
+    },
+]
+
+
+def throughput(gateway: SecureWebGateway, seconds: float) -> float:
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        gateway.process_request(REQUESTS[count % len(REQUESTS)])
+        count += 1
+    return count / seconds
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--rates", type=float, nargs="*", default=[100.0, 1000.0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    gateway = SecureWebGateway(log_forwarder=LogForwarder(destination=Path(os.devnull)))
+    throughput(gateway, 0.5)
+
+    best = dict.fromkeys([0.0, *args.rates], 0.0)
+    for _ in range(args.repeat):
+        for hz in best:
+            profiler = SamplingProfiler(hz=hz).start() if hz else None
+            best[hz] = max(best[hz], throughput(gateway, args.seconds))
+            if profiler is not None:
+                profiler.stop()
+    baseline = best.pop(0.0)
+    print(f"profiler off: {baseline:>10,.0f} req/s")
+    for hz, rate in best.items():
+        overhead = (1 - rate / baseline) * 100
+        print(f"{hz:>7,.0f} Hz: {rate:>10,.0f} req/s ({overhead:.1f}% overhead)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""SIEM shipping throughput against local stand-in collectors.
+
+Starts an HTTP bulk collector and a syslog TCP collector on loopback, forwards
+``--events`` normalized records through ``LogForwarder`` with batching, and reports
+events/s per batch size::
+
+    python -m benchmarks.bench_siem_sinks --events 50000 --batch-sizes 1 100 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from siem.log_forwarder import LogForwarder
+from siem.sinks import HTTPBulkSink, SyslogTCPSink
+
+
+class _DiscardHTTP(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+class _DiscardTCP(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        while self.rfile.read(65536):
+            pass
+
+
+def _record(index: int) -> dict[str, object]:
+    return {
+        "timestamp": time.time(),
+        "user": f"user{index % 500}",
+        "domain": f"site{index % 5000}.example.com",
+        "url": f"https://site{index % 5000}.example.com/path/{index}",
+        "method": "GET",
+        "categories": ["Business"],
+        "allowed": index % 10 != 0,
+        "reasons": [] if index % 10 else ["category blocked: Gambling"],
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=50_000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--compression", choices=["gzip", "zstd", "none"], default="gzip")
+    args = parser.parse_args(argv)
+
+    http_server = ThreadingHTTPServer(("127.0.0.1", 0), _DiscardHTTP)
+    tcp_server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _DiscardTCP)
+    tcp_server.daemon_threads = True
+    for server in (http_server, tcp_server):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    records = [_record(index) for index in range(args.events)]
+    compression = None if args.compression == "none" else args.compression
+
+    for batch_size in args.batch_sizes:
+        forwarder = LogForwarder(
+            sinks=[
+                HTTPBulkSink(
+                    f"http://127.0.0.1:{http_server.server_port}/bulk", compression=compression
+                ),
+                SyslogTCPSink("127.0.0.1", tcp_server.server_address[1]),
+            ],
+            batch_size=batch_size,
+            flush_interval=0.05,
+            max_queue=args.events,
+        )
+        start = time.perf_counter()
+        peak_depth = 0
+        for index, record in enumerate(records):
+            forwarder.forward(record)
+            if index % 1000 == 0:
+                peak_depth = max(peak_depth, forwarder.metrics()["queue_depth"])
+        forwarder.flush()
+        elapsed = time.perf_counter() - start
+        metrics = forwarder.metrics()
+        forwarder.close()
+        print(
+            f"batch={batch_size:>5}: {args.events / elapsed:>10,.0f} events/s "
+            f"(peak queue {peak_depth:,}, dropped {metrics['dropped_events']}, "
+            f"http {metrics['sinks']['http']['sent_events']:,}, "
+            f"syslog {metrics['sinks']['syslog']['sent_events']:,})"
+        )
+
+    http_server.shutdown()
+    tcp_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
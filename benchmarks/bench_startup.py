@@ -0,0 +1,74 @@
+"""Cold-start benchmark: import, construction, and first-request latency.
+
+Each scenario runs in a fresh interpreter so module caches do not hide import cost::
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from gateway.proxy import SecureWebGateway
+imported = time.perf_counter()
+gateway = SecureWebGateway(snapshot_path=sys.argv[1] or None)
+constructed = time.perf_counter()
+from siem.log_forwarder import LogForwarder
+gateway._log_forwarder = LogForwarder(destination=__import__("pathlib").Path(sys.argv[2]))
+gateway.process_request({
+    "url": "https://example.com/docs",
+    "token": "token-alice",
+    "device": {"device_id": "bench", "healthy": True, "posture_score": 90},
+})
+first = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "construct_ms": (constructed - imported) * 1000,
+    "first_request_ms": (first - constructed) * 1000,
+}))
+"""
+
+
+def _probe(snapshot: str, log_path: str) -> dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, snapshot, log_path],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    from gateway.config_snapshot import compile_snapshot, write_snapshot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = Path(tmp) / "snapshot.json"
+        write_snapshot(compile_snapshot(), snapshot_path)
+        log_path = str(Path(tmp) / "gateway.log")
+        for label, snapshot in (("sources", ""), ("snapshot", str(snapshot_path))):
+            samples = [_probe(snapshot, log_path) for _ in range(args.runs)]
+            summary = {
+                key: statistics.median(sample[key] for sample in samples) for key in samples[0]
+            }
+            print(f"{label:>8}: " + "  ".join(f"{k}={v:.2f}" for k, v in summary.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""ClientHello parse and fingerprint throughput.
+
+Feed a corpus extracted from a packet capture, one hex-encoded ClientHello record per
+line, for example::
+
+    tshark -r capture.pcap -Y "tls.handshake.type == 1" -T fields -e tcp.payload > hellos.hex
+    python -m benchmarks.bench_tls_parse --corpus hellos.hex
+
+Without ``--corpus`` a synthetic corpus of browser-like hellos with varied SNI, cipher,
+and extension lists is generated.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import struct
+import time
+from pathlib import Path
+
+from gateway.tls_metadata_inspector import TLSMetadataInspector, parse_client_hello
+
+BROWSER_CIPHERS = [0x1301, 0x1302, 0x1303, 0xC02B, 0xC02F, 0xC02C, 0xC030, 0xCCA9, 0xCCA8]
+BROWSER_EXTENSIONS = [0x0005, 0x0012, 0x0017, 0x0023, 0x002D, 0x0033, 0xFF01]
+
+
+def _ext(ext_type: int, body: bytes = b"") -> bytes:
+    return struct.pack("!HH", ext_type, len(body)) + body
+
+
+def synthetic_hello(rng: random.Random, profiles: int = 50) -> bytes:
+    """Build a hello from one of ``profiles`` client stacks with a random SNI and nonce."""
+
+    sni = f"host{rng.randrange(10_000)}.example.com".encode()
+    stack = random.Random(rng.randrange(profiles))
+    ciphers = stack.sample(BROWSER_CIPHERS, stack.randint(4, len(BROWSER_CIPHERS)))
+    alpn = b"\x02h2\x08http/1.1"
+    extensions = b"".join(
+        [
+            _ext(0x0000, struct.pack("!HBH", len(sni) + 3, 0, len(sni)) + sni),
+            _ext(0x000A, b"\x00\x04\x00\x1d\x00\x17"),
+            _ext(0x000B, b"\x01\x00"),
+            _ext(0x000D, b"\x00\x06\x04\x03\x08\x04\x04\x01"),
+            _ext(0x0010, struct.pack("!H", len(alpn)) + alpn),
+            _ext(0x002B, b"\x04\x03\x04\x03\x03"),
+            *(_ext(t) for t in stack.sample(BROWSER_EXTENSIONS, stack.randint(2, 7))),
+        ]
+    )
+    body = (
+        b"\x03\x03"
+        + rng.randbytes(32)
+        + b"\x20"
+        + rng.randbytes(32)
+        + struct.pack("!H", 2 * len(ciphers))
+        + struct.pack(f"!{len(ciphers)}H", *ciphers)
+        + b"\x01\x00"
+        + struct.pack("!H", len(extensions))
+        + extensions
+    )
+    handshake = b"\x01" + len(body).to_bytes(3, "big") + body
+    return b"\x16\x03\x01" + struct.pack("!H", len(handshake)) + handshake
+
+
+def load_corpus(path: Path | None, size: int) -> list[bytes]:
+    if path is None:
+        rng = random.Random(7)
+        return [synthetic_hello(rng) for _ in range(size)]
+    with path.open("r", encoding="ascii") as handle:
+        return [bytes.fromhex(line.strip().replace(":", "")) for line in handle if line.strip()]
+
+
+def _rate(label: str, func, corpus: list[bytes], rounds: int) -> None:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for hello in corpus:
+            func(hello)
+    elapsed = time.perf_counter() - start
+    total = rounds * len(corpus)
+    print(f"{label:>22}: {total / elapsed:>12,.0f} hellos/s ({elapsed * 1e6 / total:.2f} us each)")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", type=Path)
+    parser.add_argument("--size", type=int, default=10_000, help="synthetic corpus size")
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus, args.size)
+    inspector = TLSMetadataInspector()
+    _rate("parse", parse_client_hello, corpus, args.rounds)
+    _rate(
+        "parse + fingerprint",
+        lambda data: inspector.inspect(client_hello=data),
+        corpus,
+        args.rounds,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Token validation cost: pre-shared table versus signed tokens, cold and cached.
+
+Cold runs use ``cache_size=0``, so every call checks the signature. Cached runs
+repeat a working set of ``--distinct`` tokens, the way repeat requests from the same
+clients do::
+
+    python -m benchmarks.bench_token_verify --users 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import time
+from typing import Callable
+
+from auth.signed_tokens import KeyRing, TokenKey
+from auth.ztna_token_validator import ZTNATokenValidator
+
+
+def rate(label: str, validate: Callable[[str], object], tokens: list[str], rounds: int) -> None:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for token in tokens:
+            validate(token)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>28}: {rounds * len(tokens) / elapsed:>12,.0f} validations/s")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--distinct", type=int, default=1_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    table = {f"user{index}": f"token-user{index}" for index in range(args.users)}
+    preshared = [
+        f"token-user{index * (args.users // args.distinct)}" for index in range(args.distinct)
+    ]
+    rate(
+        "pre-shared table",
+        ZTNATokenValidator(known_tokens=table, key_ring=KeyRing([])).validate,
+        preshared,
+        args.rounds,
+    )
+
+    algorithms = ["HS256"]
+    if importlib.util.find_spec("cryptography"):
+        algorithms.append("EdDSA")
+    for algorithm in algorithms:
+        key = TokenKey.generate("bench", algorithm)
+        signer = KeyRing([key])
+        tokens = [signer.issue(f"user{index}", ["eng"]) for index in range(args.distinct)]
+        for cache_size, label in ((0, "cold"), (10_000, "cached")):
+            validator = ZTNATokenValidator(
+                known_tokens=table, key_ring=KeyRing([key], cache_size=cache_size)
+            )
+            rate(f"{algorithm} signed, {label}", validator.validate, tokens, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
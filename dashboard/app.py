@@ -2,12 +2,13 @@
 
 from __future__ import annotations
 
-import json
 from pathlib import Path
 
 import pandas as pd
 import streamlit as st
 
+from siem.codec import read_records
+
 LOG_PATH = Path("streamlit_logs/gateway.log")
 
 
@@ -18,8 +19,7 @@ st.title("SASE / Secure Web Gateway Dashboard")
 def load_logs() -> list[dict]:
     if not LOG_PATH.exists():
         return []
-    with LOG_PATH.open("r", encoding="utf-8") as handle:
-        return [json.loads(line) for line in handle if line.strip()]
+    return list(read_records(LOG_PATH))
 
 
 def render_summary(logs: list[dict]) -> None:
@@ -28,22 +28,29 @@ def render_summary(logs: list[dict]) -> None:
         st.info("No traffic recorded yet.")
         return
     df = pd.DataFrame(logs)
+    # Sampled and aggregated records stand for several requests (see siem/log_policy.py).
+    weight = (
+        df["sample_weight"].fillna(1.0) if "sample_weight" in df else pd.Series(1.0, index=df.index)
+    )
+    df = df.assign(weight=weight)
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Events", len(df))
+    col1.metric("Total Events", round(df["weight"].sum()))
     blocked = df[~df["allowed"]]
-    col2.metric("Blocked", len(blocked))
+    col2.metric("Blocked", round(blocked["weight"].sum()))
     col3.metric("Unique Users", df["user"].nunique())
+    if (df["weight"] != 1.0).any():
+        st.caption(f"Totals extrapolated from {len(df)} sampled or aggregated records.")
 
     st.markdown("### Top Domains")
-    st.bar_chart(df["domain"].value_counts().head(10))
+    st.bar_chart(df.groupby("domain")["weight"].sum().nlargest(10))
 
     st.markdown("### Category Distribution")
     exploded = df.explode("categories")
-    st.bar_chart(exploded["categories"].value_counts().head(10))
+    st.bar_chart(exploded.groupby("categories")["weight"].sum().nlargest(10))
 
     st.markdown("### DLP / CASB Insights")
-    findings = df["dlp_findings"].replace("", float("nan")).dropna()
-    casb_apps = df["casb"].apply(lambda item: item.get("app"))
+    findings = df["dlp"].replace("", float("nan")).dropna()
+    casb_apps = df["casb"].apply(lambda item: (item or {}).get("app"))
     col4, col5 = st.columns(2)
     col4.metric("DLP Findings", len(findings))
     col5.metric("CASB App Matches", casb_apps.notna().sum())
@@ -0,0 +1,198 @@
+"""Admission control and load shedding in front of ``SecureWebGateway.process_request``.
+
+Requests pass three gates before they reach the pipeline:
+
+1. A per-user token bucket (``user_rate`` requests/s, ``user_burst`` deep).
+2. A cap on body bytes held by admitted and waiting requests (``max_queued_bytes``).
+3. A cap on requests in flight (``max_in_flight``). Callers beyond it wait for a slot
+   in arrival order, and the wait is bounded CoDel-style. While the minimum queueing
+   delay over the last ``codel_interval`` stayed above ``codel_target`` the queue is
+   standing, so waiters give up after ``codel_target``; otherwise they may wait up to
+   ``codel_interval``. A request whose expected wait (waiters ahead of it times the
+   mean service time, divided by ``max_in_flight``) already exceeds that bound is
+   refused at once rather than after timing out.
+
+What happens to a request that fails a gate is set per traffic class:
+``"shed"`` refuses it as retryable (HTTP 503 semantics) and ``"block"`` denies it like a
+policy block. Unauthenticated traffic defaults to ``"block"`` (fail closed) and is never
+queued while the gateway is saturated, so it cannot consume capacity.
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from gateway.latency import LatencyHistogram
+
+OVERLOAD_ACTIONS = ("shed", "block")
+
+
+@dataclass(frozen=True)
+class AdmissionPolicy:
+    """Limits and overload behavior for an ``AdmissionController``.
+
+    ``user_rate=None`` disables per-user rate limiting.
+    """
+
+    max_in_flight: int = 32
+    max_queued_bytes: int = 64 * 1024 * 1024
+    codel_target: float = 0.005
+    codel_interval: float = 0.1
+    user_rate: float | None = 100.0
+    user_burst: float = 200.0
+    max_tracked_users: int = 100_000
+    authenticated_action: str = "shed"
+    unauthenticated_action: str = "block"
+
+    def __post_init__(self) -> None:
+        for action in (self.authenticated_action, self.unauthenticated_action):
+            if action not in OVERLOAD_ACTIONS:
+                raise ValueError(f"Unknown overload action: {action}")
+        if self.max_in_flight <= 0 or self.max_queued_bytes <= 0:
+            raise ValueError("max_in_flight and max_queued_bytes must be positive")
+
+
+@dataclass(frozen=True)
+class AdmissionTicket:
+    """Outcome of ``AdmissionController.acquire``; admitted tickets must be released."""
+
+    admitted: bool
+    action: str = "admit"
+    reason: str = ""
+    queue_delay: float = 0.0
+    body_bytes: int = 0
+    admitted_at: float = 0.0
+
+
+class AdmissionController:
+    """Thread-safe gate that bounds concurrency, buffered bytes, and per-user rate."""
+
+    def __init__(
+        self,
+        policy: AdmissionPolicy | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.policy = policy or AdmissionPolicy()
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        # Tickets of waiting requests in arrival order; only the head may take a slot.
+        self._waiters: deque[int] = deque()
+        self._tickets = itertools.count()
+        self._queued_bytes = 0
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._interval_start = clock()
+        self._interval_min_delay = float("inf")
+        self._dropping = False
+        self._service_time = 0.0
+        self._admitted = 0
+        self._rejected: Counter[str] = Counter()
+        self._queue_delay = LatencyHistogram()
+
+    def acquire(self, user: str | None, body_bytes: int = 0) -> AdmissionTicket:
+        """Admit a request, waiting for a slot if necessary, or refuse it.
+
+        ``user`` is the authenticated user, or ``None`` for unauthenticated traffic.
+        """
+
+        policy = self.policy
+        action = policy.authenticated_action if user else policy.unauthenticated_action
+        arrived = self.clock()
+        with self._cond:
+            if policy.user_rate is not None and not self._take_token(user or "", arrived):
+                return self._reject(action, "rate limited")
+            if body_bytes > policy.max_queued_bytes:
+                return self._reject(action, "request body too large")
+            if self._queued_bytes + body_bytes > policy.max_queued_bytes:
+                return self._reject(action, "queued body bytes over limit")
+            # Arrivals queue behind existing waiters rather than barging into a freed slot;
+            # otherwise their zero delay would hide a standing queue from CoDel.
+            if self._in_flight >= policy.max_in_flight or self._waiters:
+                if user is None and self._in_flight >= policy.max_in_flight:
+                    return self._reject(action, "gateway saturated")
+                timeout = policy.codel_target if self._dropping else policy.codel_interval
+                expected = (len(self._waiters) + 1) * self._service_time / policy.max_in_flight
+                if expected > timeout:
+                    return self._reject(action, "queue delay over target")
+                deadline = arrived + timeout
+                ticket = next(self._tickets)
+                self._waiters.append(ticket)
+                self._queued_bytes += body_bytes
+                try:
+                    while self._in_flight >= policy.max_in_flight or self._waiters[0] != ticket:
+                        remaining = deadline - self.clock()
+                        if remaining <= 0:
+                            self._observe_delay(self.clock() - arrived)
+                            self._queued_bytes -= body_bytes
+                            return self._reject(action, "queue delay over target")
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiters.remove(ticket)
+                    # The next ticket may now be at the head with a slot free.
+                    self._cond.notify_all()
+                self._queued_bytes -= body_bytes
+            now = self.clock()
+            delay = now - arrived
+            self._observe_delay(delay)
+            self._in_flight += 1
+            self._queued_bytes += body_bytes
+            self._admitted += 1
+            self._queue_delay.add(delay)
+        return AdmissionTicket(
+            admitted=True, queue_delay=delay, body_bytes=body_bytes, admitted_at=now
+        )
+
+    def release(self, ticket: AdmissionTicket) -> None:
+        if not ticket.admitted:
+            return
+        with self._cond:
+            self._in_flight -= 1
+            self._queued_bytes -= ticket.body_bytes
+            # Exponentially weighted mean service time for the expected-wait estimate.
+            service = self.clock() - ticket.admitted_at
+            self._service_time += 0.1 * (service - self._service_time)
+            self._cond.notify_all()
+
+    def metrics(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiters),
+                "queued_bytes": self._queued_bytes,
+                "overloaded": self._dropping,
+                "admitted": self._admitted,
+                "rejected": dict(self._rejected),
+                "queue_delay_ms": {
+                    "p50": round(self._queue_delay.percentile(0.50) * 1000, 3),
+                    "p99": round(self._queue_delay.percentile(0.99) * 1000, 3),
+                    "max": round(self._queue_delay.maximum * 1000, 3),
+                },
+            }
+
+    def _reject(self, action: str, reason: str) -> AdmissionTicket:
+        self._rejected[reason] += 1
+        return AdmissionTicket(admitted=False, action=action, reason=reason)
+
+    def _take_token(self, key: str, now: float) -> bool:
+        policy = self.policy
+        assert policy.user_rate is not None
+        tokens, updated = self._buckets.pop(key, (policy.user_burst, now))
+        tokens = min(policy.user_burst, tokens + (now - updated) * policy.user_rate)
+        allowed = tokens >= 1.0
+        self._buckets[key] = (tokens - 1.0 if allowed else tokens, now)
+        while len(self._buckets) > policy.max_tracked_users:
+            self._buckets.popitem(last=False)
+        return allowed
+
+    def _observe_delay(self, delay: float) -> None:
+        now = self.clock()
+        self._interval_min_delay = min(self._interval_min_delay, delay)
+        if now - self._interval_start >= self.policy.codel_interval:
+            self._dropping = self._interval_min_delay > self.policy.codel_target
+            self._interval_start = now
+            self._interval_min_delay = float("inf")
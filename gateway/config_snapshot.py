@@ -0,0 +1,164 @@
+"""Precompiled configuration snapshots for fast gateway cold starts."""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+CONFIG_DIR = Path(__file__).resolve().parents[1] / "config"
+DEFAULT_SNAPSHOT_PATH = CONFIG_DIR / "snapshot.json"
+DEFAULT_BLOCKLISTS: tuple[str, ...] = (
+    "blocklists/malware_domains.txt",
+    "blocklists/adult_sites.txt",
+    "blocklists/social_media.txt",
+)
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Every parsed configuration artifact the gateway needs, bundled together."""
+
+    policy: dict[str, Any]
+    categories: dict[str, list[str]]
+    blocked_domains: frozenset[str]
+    content_hash: str
+
+
+def source_paths(config_dir: Path = CONFIG_DIR) -> list[Path]:
+    """Return the configuration files that feed a snapshot, in hashing order."""
+
+    names = ["policies.yaml", "categories.json", *DEFAULT_BLOCKLISTS]
+    return [config_dir / name for name in names]
+
+
+def content_hash(config_dir: Path = CONFIG_DIR) -> str:
+    """Hash the raw bytes of every source file so stale snapshots can be detected."""
+
+    digest = hashlib.sha256()
+    for path in source_paths(config_dir):
+        digest.update(path.relative_to(config_dir).as_posix().encode("utf-8"))
+        digest.update(b"\0")
+        if path.exists():
+            digest.update(path.read_bytes())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _compile_categories(raw: dict[str, list[str]]) -> dict[str, list[str]]:
+    compiled: dict[str, list[str]] = {}
+    for category, patterns in raw.items():
+        valid: list[str] = []
+        for pattern in patterns:
+            lowered = pattern.lower()
+            try:
+                re.compile(lowered)
+            except re.error as exc:
+                logger.warning(
+                    "Dropping invalid category pattern",
+                    extra={"pattern": pattern, "error": str(exc)},
+                )
+                continue
+            valid.append(lowered)
+        compiled[category] = valid
+    return compiled
+
+
+def compile_snapshot(config_dir: Path = CONFIG_DIR) -> ConfigSnapshot:
+    """Parse policies, categories, and blocklists from ``config_dir`` into a snapshot."""
+
+    from gateway.dns_filter import DNSFilter
+    from gateway.policy_engine import load_policy_document
+
+    policy = load_policy_document(config_dir / "policies.yaml")
+
+    categories_path = config_dir / "categories.json"
+    if not categories_path.exists():
+        raise FileNotFoundError(f"Categories file not found at {categories_path}")
+    with categories_path.open("r", encoding="utf-8") as handle:
+        categories = _compile_categories(json.load(handle))
+
+    dns_filter = DNSFilter(config_dir / name for name in DEFAULT_BLOCKLISTS)
+
+    return ConfigSnapshot(
+        policy=policy,
+        categories=categories,
+        blocked_domains=frozenset(dns_filter.blocked_domains),
+        content_hash=content_hash(config_dir),
+    )
+
+
+def write_snapshot(snapshot: ConfigSnapshot, path: Path = DEFAULT_SNAPSHOT_PATH) -> None:
+    """Atomically persist a snapshot so readers never observe a partial file."""
+
+    document = {
+        "format": SNAPSHOT_FORMAT,
+        "content_hash": snapshot.content_hash,
+        "policy": snapshot.policy,
+        "categories": snapshot.categories,
+        "blocked_domains": sorted(snapshot.blocked_domains),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(document, handle, separators=(",", ":"))
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def load_snapshot(
+    path: Path = DEFAULT_SNAPSHOT_PATH, *, verify_sources: Path | None = None
+) -> ConfigSnapshot:
+    """Load a snapshot with a single read.
+
+    Args:
+        path: Snapshot file produced by ``write_snapshot``.
+        verify_sources: Optional config directory; when given, the snapshot is rejected if
+            its content hash no longer matches the source files.
+
+    Raises:
+        ValueError: If the snapshot format is unknown or it is stale.
+    """
+
+    document = json.loads(path.read_bytes())
+    if document.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format in {path}: {document.get('format')!r}")
+    snapshot = ConfigSnapshot(
+        policy=document["policy"],
+        categories=document["categories"],
+        blocked_domains=frozenset(document["blocked_domains"]),
+        content_hash=document["content_hash"],
+    )
+    if verify_sources is not None and content_hash(verify_sources) != snapshot.content_hash:
+        raise ValueError(f"Snapshot {path} is stale relative to {verify_sources}")
+    return snapshot
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Build a snapshot from the config directory: ``python -m gateway.config_snapshot``."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--config-dir", type=Path, default=CONFIG_DIR)
+    parser.add_argument("--output", type=Path, default=DEFAULT_SNAPSHOT_PATH)
+    args = parser.parse_args(argv)
+
+    snapshot = compile_snapshot(args.config_dir)
+    write_snapshot(snapshot, args.output)
+    print(f"Wrote {args.output} ({snapshot.content_hash[:12]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Versioned gateway configuration generations and the watcher that publishes them."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Mapping
+
+from gateway.config_snapshot import (
+    CONFIG_DIR,
+    DEFAULT_BLOCKLISTS,
+    ConfigSnapshot,
+    compile_snapshot,
+    source_paths,
+)
+
+if TYPE_CHECKING:
+    from auth.device_trust import DeviceTrust
+    from auth.ztna_token_validator import ZTNATokenValidator
+    from gateway.dns_filter import DNSFilter
+    from gateway.policy_engine import PolicyEngine
+    from gateway.url_categorizer import URLCategorizer
+
+logger = logging.getLogger(__name__)
+
+RELOADABLE_ENGINES: tuple[str, ...] = (
+    "categorizer",
+    "dns_filter",
+    "token_validator",
+    "policy_engine",
+)
+
+
+@dataclass(frozen=True, eq=False)
+class GatewayConfig:
+    """One immutable generation of the configuration-derived gateway engines.
+
+    Requests read a single ``GatewayConfig`` reference at the start of processing and use
+    it throughout, so publishing a new generation is a plain reference swap and in-flight
+    requests finish on the version they started with. Engines are built on first access;
+    ``warm()`` forces them so a reload can pay that cost before the swap.
+
+    Attributes:
+        version: Monotonic generation number, recorded in every log record.
+        device_trust: Shared device trust evaluator handed to the policy engine.
+        snapshot: Parsed configuration; when ``None`` engines load from ``config_dir``.
+        config_dir: Source directory used when there is no snapshot.
+        overrides: Injected engines that take precedence over configuration.
+        source_hash: Content hash of ``config_dir`` taken when a generation without a
+            snapshot was created, so reloading unchanged sources is recognised.
+        domain_db_stamp: ``domain_db_stamp()`` when the generation was created; a
+            rebuilt ``$SWG_DOMAIN_DB`` makes an otherwise unchanged snapshot publishable.
+        key_ring_stamp: ``key_ring_stamp()`` when the generation was created, so adding or
+            removing a ``$SWG_TOKEN_KEYS`` key publishes a new token validator.
+    """
+
+    version: int
+    device_trust: DeviceTrust
+    snapshot: ConfigSnapshot | None = None
+    config_dir: Path = CONFIG_DIR
+    overrides: Mapping[str, Any] = field(default_factory=dict)
+    source_hash: str | None = None
+    domain_db_stamp: tuple[str, int, int, int] | None = None
+    key_ring_stamp: tuple[str, int, int, int] | None = None
+
+    @property
+    def content_hash(self) -> str | None:
+        return self.snapshot.content_hash if self.snapshot is not None else self.source_hash
+
+    @cached_property
+    def policy_document(self) -> dict[str, Any]:
+        """Parsed policies.yaml, shared between the policy engine and token validator."""
+
+        if self.snapshot is not None:
+            return self.snapshot.policy
+        from gateway.policy_engine import load_policy_document
+
+        return load_policy_document(self.config_dir / "policies.yaml")
+
+    @cached_property
+    def categorizer(self) -> URLCategorizer:
+        if "categorizer" in self.overrides:
+            return self.overrides["categorizer"]
+        from gateway.domain_db import default_domain_db
+        from gateway.url_categorizer import URLCategorizer
+
+        domain_db = default_domain_db()
+        if self.snapshot is not None:
+            return URLCategorizer(categories=self.snapshot.categories, domain_db=domain_db)
+        return URLCategorizer(self.config_dir / "categories.json", domain_db=domain_db)
+
+    @cached_property
+    def dns_filter(self) -> DNSFilter:
+        if "dns_filter" in self.overrides:
+            return self.overrides["dns_filter"]
+        from gateway.dns_filter import DNSFilter
+
+        if self.snapshot is not None:
+            return DNSFilter(domains=self.snapshot.blocked_domains)
+        return DNSFilter(self.config_dir / name for name in DEFAULT_BLOCKLISTS)
+
+    @cached_property
+    def token_validator(self) -> ZTNATokenValidator:
+        if "token_validator" in self.overrides:
+            return self.overrides["token_validator"]
+        from auth.ztna_token_validator import ZTNATokenValidator, tokens_from_policy
+
+        return ZTNATokenValidator(known_tokens=tokens_from_policy(self.policy_document))
+
+    @cached_property
+    def policy_engine(self) -> PolicyEngine:
+        if "policy_engine" in self.overrides:
+            return self.overrides["policy_engine"]
+        from gateway.policy_engine import PolicyEngine
+
+        return PolicyEngine(
+            policy_path=self.config_dir / "policies.yaml",
+            token_validator=self.token_validator,
+            device_trust=self.device_trust,
+            policy=self.policy_document,
+        )
+
+    def warm(self) -> GatewayConfig:
+        """Build every engine now rather than on the first request that needs it."""
+
+        for name in RELOADABLE_ENGINES:
+            getattr(self, name)
+        return self
+
+    def successor(self, snapshot: ConfigSnapshot) -> GatewayConfig:
+        """Return the next generation built from ``snapshot`` with the same overrides."""
+
+        from auth.signed_tokens import key_ring_stamp
+        from gateway.domain_db import domain_db_stamp
+
+        return GatewayConfig(
+            version=self.version + 1,
+            device_trust=self.device_trust,
+            snapshot=snapshot,
+            config_dir=self.config_dir,
+            overrides=self.overrides,
+            domain_db_stamp=domain_db_stamp(),
+            key_ring_stamp=key_ring_stamp(),
+        )
+
+
+class ConfigWatcher:
+    """Polls configuration sources and rebuilds a snapshot when any of them change.
+
+    Change detection compares ``(mtime_ns, size)`` for every source file, plus the
+    ``$SWG_DOMAIN_DB`` and ``$SWG_TOKEN_KEYS`` files when they are configured. This
+    works on every platform and on bind-mounted volumes where inotify events are
+    unreliable. The snapshot is compiled on the watcher thread and handed to
+    ``on_change``; a source that fails to parse, or a snapshot ``on_change`` rejects
+    (for example over a memory budget), is logged and the previous configuration stays
+    in service until a later poll succeeds.
+    """
+
+    def __init__(
+        self,
+        on_change: Callable[[ConfigSnapshot], None],
+        config_dir: Path = CONFIG_DIR,
+        interval: float = 2.0,
+    ):
+        self.on_change = on_change
+        self.config_dir = config_dir
+        self.interval = interval
+        self._fingerprint = self._stat_sources()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _stat_sources(self) -> tuple[tuple[Any, ...], ...]:
+        from auth.signed_tokens import key_ring_stamp
+        from gateway.domain_db import domain_db_stamp
+
+        stats: list[tuple[Any, ...]] = []
+        for path in source_paths(self.config_dir):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                stats.append((str(path), -1, -1))
+                continue
+            stats.append((str(path), stat.st_mtime_ns, stat.st_size))
+        stats.append(("domain_db", domain_db_stamp()))
+        stats.append(("key_ring", key_ring_stamp()))
+        return tuple(stats)
+
+    def poll(self) -> bool:
+        """Check sources once; compile and publish a snapshot if they changed."""
+
+        fingerprint = self._stat_sources()
+        if fingerprint == self._fingerprint:
+            return False
+        try:
+            snapshot = compile_snapshot(self.config_dir)
+            self.on_change(snapshot)
+        except Exception as exc:  # keep serving the last good configuration
+            logger.error(
+                "Config reload failed", extra={"error": str(exc), "path": str(self.config_dir)}
+            )
+            return False
+        # Recorded only on success, so a half-written file is retried on the next poll.
+        self._fingerprint = fingerprint
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self) -> ConfigWatcher:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
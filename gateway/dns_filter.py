@@ -12,8 +12,8 @@ logger = logging.getLogger(__name__)
 class DNSFilter:
     """Simple in-memory DNS filter used by the proxy pipeline."""
 
-    def __init__(self, blocklist_paths: Iterable[str | Path]):
-        self.blocked_domains: set[str] = set()
+    def __init__(self, blocklist_paths: Iterable[str | Path] = (), *, domains: Iterable[str] = ()):
+        self.blocked_domains: set[str] = {domain.lower() for domain in domains}
         for path in blocklist_paths:
             self._load_blocklist(Path(path))
 
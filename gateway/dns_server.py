@@ -0,0 +1,671 @@
+"""Asyncio DNS sinkhole that enforces ``DNSFilter`` at the resolver layer.
+
+Clients that bypass the proxy still resolve names through this server. Queries for a
+blocked name (or any subdomain of one) are answered locally with NXDOMAIN, or with a
+sinkhole address when one is configured. All other queries are forwarded to an
+upstream resolver over UDP (TCP when the answer is truncated). Answers are cached until
+their TTL expires, and negative answers until their SOA minimum expires. The cache is
+bounded in bytes. Concurrent identical queries share a single upstream request.
+
+Only the parts of the wire format needed for that are parsed (RFC 1035 header,
+question, resource record TTLs, and the EDNS(0) OPT payload size)::
+
+    python -m gateway.dns_server --listen 127.0.0.1:5353 --upstream 1.1.1.1:53
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import ipaddress
+import logging
+import secrets
+import struct
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from gateway.dns_filter import DNSFilter
+
+logger = logging.getLogger(__name__)
+
+TYPE_A = 1
+TYPE_SOA = 6
+TYPE_AAAA = 28
+TYPE_OPT = 41
+CLASS_IN = 1
+
+RCODE_NOERROR = 0
+RCODE_FORMERR = 1
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+RCODE_NOTIMP = 4
+
+FLAG_QR = 0x8000
+FLAG_AA = 0x0400
+FLAG_TC = 0x0200
+FLAG_RD = 0x0100
+FLAG_RA = 0x0080
+
+DEFAULT_UDP_PAYLOAD = 512
+MAX_UDP_PAYLOAD = 4096
+# Rough per-entry cost of the key, bookkeeping tuple, and OrderedDict slot.
+CACHE_ENTRY_OVERHEAD = 200
+
+_HEADER = struct.Struct("!6H")
+_QUESTION_TAIL = struct.Struct("!HH")
+_RR_TAIL = struct.Struct("!HHIH")
+_TTL = struct.Struct("!I")
+_U16 = struct.Struct("!H")
+
+
+class DNSFormatError(ValueError):
+    """Raised when bytes are not a well-formed DNS message."""
+
+
+@dataclass(frozen=True)
+class DNSQuestion:
+    """The parts of a query the server acts on."""
+
+    txid: int
+    flags: int
+    name: str
+    qtype: int
+    qclass: int
+    # Offset just past the question section; ``query[12:question_end]`` is the question.
+    question_end: int
+    # Largest UDP response the client accepts (EDNS(0) payload size, or 512).
+    udp_payload: int
+
+    @property
+    def key(self) -> tuple[str, int, int]:
+        return (self.name, self.qtype, self.qclass)
+
+    @property
+    def opcode(self) -> int:
+        return (self.flags >> 11) & 0xF
+
+
+def _read_name(buf: bytes, pos: int) -> tuple[str, int]:
+    """Decode a (possibly compressed) name; return it lowercased and the offset after it."""
+
+    labels: list[str] = []
+    end = None
+    jumps = 0
+    while True:
+        if pos >= len(buf):
+            raise DNSFormatError("truncated name")
+        length = buf[pos]
+        if length & 0xC0 == 0xC0:
+            if pos + 2 > len(buf):
+                raise DNSFormatError("truncated name pointer")
+            jumps += 1
+            if jumps > 64:
+                raise DNSFormatError("name pointer loop")
+            if end is None:
+                end = pos + 2
+            pos = _U16.unpack_from(buf, pos)[0] & 0x3FFF
+            continue
+        if length & 0xC0:
+            raise DNSFormatError("unsupported label type")
+        pos += 1
+        if length == 0:
+            break
+        if pos + length > len(buf):
+            raise DNSFormatError("truncated label")
+        labels.append(buf[pos : pos + length].decode("latin-1").lower())
+        pos += length
+    return ".".join(labels), end if end is not None else pos
+
+
+def _skip_rr(buf: bytes, pos: int) -> tuple[int, int, int, int, int]:
+    """Return ``(type, ttl_offset, rdata_offset, rdata_end, class)`` for the RR at ``pos``."""
+
+    _, pos = _read_name(buf, pos)
+    if pos + _RR_TAIL.size > len(buf):
+        raise DNSFormatError("truncated resource record")
+    rtype, rclass, _, rdlength = _RR_TAIL.unpack_from(buf, pos)
+    rdata = pos + _RR_TAIL.size
+    if rdata + rdlength > len(buf):
+        raise DNSFormatError("truncated rdata")
+    return rtype, pos + 4, rdata, rdata + rdlength, rclass
+
+
+def parse_query(data: bytes) -> DNSQuestion:
+    """Parse a single-question query.
+
+    Raises:
+        DNSFormatError: If the message is malformed or does not carry one question.
+    """
+
+    if len(data) < _HEADER.size:
+        raise DNSFormatError("truncated header")
+    txid, flags, qdcount, ancount, nscount, arcount = _HEADER.unpack_from(data)
+    if flags & FLAG_QR or qdcount != 1:
+        raise DNSFormatError("expected a query with exactly one question")
+    name, pos = _read_name(data, _HEADER.size)
+    if pos + _QUESTION_TAIL.size > len(data):
+        raise DNSFormatError("truncated question")
+    qtype, qclass = _QUESTION_TAIL.unpack_from(data, pos)
+    question_end = pos + _QUESTION_TAIL.size
+    udp_payload = DEFAULT_UDP_PAYLOAD
+    pos = question_end
+    for index in range(ancount + nscount + arcount):
+        rtype, _, _, end, rclass = _skip_rr(data, pos)
+        if rtype == TYPE_OPT and index >= ancount + nscount:
+            udp_payload = min(max(rclass, DEFAULT_UDP_PAYLOAD), MAX_UDP_PAYLOAD)
+        pos = end
+    return DNSQuestion(txid, flags, name, qtype, qclass, question_end, udp_payload)
+
+
+def build_query(name: str, qtype: int = TYPE_A, txid: int = 0, *, recursion: bool = True) -> bytes:
+    """Encode a standard query for ``name`` (used by tests, benchmarks, and health checks)."""
+
+    flags = FLAG_RD if recursion else 0
+    labels = b"".join(
+        bytes([len(label)]) + label.encode("latin-1") for label in name.strip(".").split(".")
+    )
+    return (
+        _HEADER.pack(txid, flags, 1, 0, 0, 0)
+        + labels
+        + b"\x00"
+        + _QUESTION_TAIL.pack(qtype, CLASS_IN)
+    )
+
+
+def response_ttls(response: bytes) -> tuple[list[int], int | None]:
+    """Return the TTL field offsets in ``response`` and how long it may be cached.
+
+    The cache lifetime is the smallest answer/authority TTL, or for negative answers
+    the SOA ``MINIMUM`` if lower (RFC 2308). It is ``None`` when the response must not
+    be cached: truncated, an error other than NXDOMAIN, or no TTL to go by.
+
+    Raises:
+        DNSFormatError: If the response is truncated or malformed.
+    """
+
+    try:
+        return _response_ttls(response)
+    except struct.error as exc:
+        raise DNSFormatError(f"malformed response: {exc}") from exc
+
+
+def _response_ttls(response: bytes) -> tuple[list[int], int | None]:
+    if len(response) < _HEADER.size:
+        raise DNSFormatError("truncated header")
+    _, flags, qdcount, ancount, nscount, arcount = _HEADER.unpack_from(response)
+    pos = _HEADER.size
+    for _ in range(qdcount):
+        _, pos = _read_name(response, pos)
+        pos += _QUESTION_TAIL.size
+        if pos > len(response):
+            raise DNSFormatError("truncated question")
+    offsets: list[int] = []
+    lifetime: int | None = None
+    for index in range(ancount + nscount + arcount):
+        rtype, ttl_offset, rdata, end, _ = _skip_rr(response, pos)
+        pos = end
+        if rtype == TYPE_OPT:
+            continue
+        offsets.append(ttl_offset)
+        if index >= ancount + nscount:
+            continue
+        ttl = _TTL.unpack_from(response, ttl_offset)[0]
+        if rtype == TYPE_SOA and index >= ancount and end - rdata >= 20:
+            ttl = min(ttl, _TTL.unpack_from(response, end - 4)[0])
+        lifetime = ttl if lifetime is None else min(lifetime, ttl)
+    rcode = flags & 0xF
+    if flags & FLAG_TC or rcode not in (RCODE_NOERROR, RCODE_NXDOMAIN):
+        return offsets, None
+    return offsets, lifetime
+
+
+class DNSCache:
+    """LRU cache of upstream responses, bounded by ``max_bytes``.
+
+    Stored responses keep their original TTLs; ``get`` rewrites them to the remaining
+    lifetime so clients never cache an answer longer than the upstream allowed.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        *,
+        max_ttl: int = 86_400,
+        min_ttl: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        self.min_ttl = min_ttl
+        self.clock = clock
+        self.size = 0
+        self.evictions = 0
+        self._entries: OrderedDict[
+            tuple[str, int, int], tuple[bytes, tuple[int, ...], float, float]
+        ]
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple[str, int, int]) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        response, offsets, stored_at, expires_at = entry
+        now = self.clock()
+        if now >= expires_at:
+            self._discard(key)
+            return None
+        self._entries.move_to_end(key)
+        age = int(now - stored_at)
+        if not age:
+            return response
+        aged = bytearray(response)
+        for offset in offsets:
+            ttl = _TTL.unpack_from(aged, offset)[0]
+            _TTL.pack_into(aged, offset, max(ttl - age, 0))
+        return bytes(aged)
+
+    def put(self, key: tuple[str, int, int], response: bytes) -> bool:
+        """Cache ``response`` if it is cacheable; return whether it was stored."""
+
+        try:
+            offsets, lifetime = response_ttls(response)
+        except DNSFormatError:
+            return False
+        if lifetime is None:
+            return False
+        lifetime = min(max(lifetime, self.min_ttl), self.max_ttl)
+        cost = self._cost(key, response)
+        if lifetime <= 0 or cost > self.max_bytes:
+            return False
+        self._discard(key)
+        now = self.clock()
+        self._entries[key] = (response, tuple(offsets), now, now + lifetime)
+        self.size += cost
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+        return True
+
+    def _discard(self, key: tuple[str, int, int]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= self._cost(key, entry[0])
+
+    @staticmethod
+    def _cost(key: tuple[str, int, int], response: bytes) -> int:
+        return len(response) + len(key[0]) + CACHE_ENTRY_OVERHEAD
+
+
+class _UpstreamProtocol(asyncio.DatagramProtocol):
+    def __init__(self, pending: dict[int, tuple[asyncio.Future[bytes], bytes]]):
+        self.pending = pending
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        if len(data) < _HEADER.size:
+            return
+        waiter = self.pending.get(_U16.unpack_from(data)[0])
+        if waiter is None:
+            return
+        future, question = waiter
+        # Accept only a response echoing our question, so stray or spoofed datagrams
+        # with a guessed ID cannot answer it.
+        if data[12 : 12 + len(question)].lower() == question and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc: Exception) -> None:
+        logger.warning("Upstream DNS socket error", extra={"error": str(exc)})
+
+
+class UpstreamResolver:
+    """Forwards queries to one upstream server over a shared UDP socket, TCP on truncation."""
+
+    def __init__(self, host: str, port: int = 53, *, timeout: float = 2.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._pending: dict[int, tuple[asyncio.Future[bytes], bytes]] = {}
+        self._transport: asyncio.DatagramTransport | None = None
+
+    async def query(self, query: bytes, question_end: int) -> bytes:
+        """Send ``query`` upstream under a fresh random ID and return the raw response."""
+
+        if self._transport is None:
+            loop = asyncio.get_running_loop()
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: _UpstreamProtocol(self._pending), remote_addr=(self.host, self.port)
+            )
+        txid = secrets.randbits(16)
+        while txid in self._pending:
+            txid = secrets.randbits(16)
+        outgoing = _U16.pack(txid) + query[2:]
+        future: asyncio.Future[bytes] = asyncio.get_running_loop().create_future()
+        self._pending[txid] = (future, outgoing[12:question_end].lower())
+        try:
+            self._transport.sendto(outgoing)
+            response = await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(txid, None)
+        if _U16.unpack_from(response, 2)[0] & FLAG_TC:
+            response = await asyncio.wait_for(self._query_tcp(outgoing), self.timeout)
+        return response
+
+    async def _query_tcp(self, query: bytes) -> bytes:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(_U16.pack(len(query)) + query)
+            await writer.drain()
+            length = _U16.unpack(await reader.readexactly(2))[0]
+            if length < _HEADER.size:
+                raise DNSFormatError(f"upstream TCP reply of {length} bytes has no header")
+            return await reader.readexactly(length)
+        finally:
+            writer.close()
+
+    def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+
+class _UDPServerProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server: DNSSinkholeServer):
+        self.server = server
+        self.transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport  # type: ignore[assignment]
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        local = self.server._answer_locally(data, udp=True)
+        if isinstance(local, DNSQuestion):
+            self.server._spawn(self._answer(data, local, addr))
+        elif local is not None and self.transport is not None:
+            self.transport.sendto(local, addr)
+
+    async def _answer(self, data: bytes, question: DNSQuestion, addr: Any) -> None:
+        response = await self.server._forward(data, question, udp=True)
+        if self.transport is not None:
+            self.transport.sendto(response, addr)
+
+
+class DNSSinkholeServer:
+    """DNS server that sinkholes names blocked by ``dns_filter`` and forwards the rest.
+
+    Args:
+        dns_filter: Blocklist; a name is blocked if it or any parent domain is listed.
+        upstream: Resolver for allowed names, as ``UpstreamResolver`` or ``(host, port)``.
+        sinkhole_ipv4: Address returned for blocked ``A`` queries. When neither sinkhole
+            address is set, blocked names get NXDOMAIN.
+        sinkhole_ipv6: Address returned for blocked ``AAAA`` queries.
+        block_ttl: TTL of sinkhole answers.
+        cache: Response cache; pass ``DNSCache(max_bytes=0)`` to disable caching.
+    """
+
+    def __init__(
+        self,
+        dns_filter: DNSFilter,
+        upstream: UpstreamResolver | tuple[str, int],
+        *,
+        sinkhole_ipv4: str | None = None,
+        sinkhole_ipv6: str | None = None,
+        block_ttl: int = 60,
+        cache: DNSCache | None = None,
+    ):
+        self.dns_filter = dns_filter
+        self.upstream = (
+            upstream if isinstance(upstream, UpstreamResolver) else UpstreamResolver(*upstream)
+        )
+        self.sinkhole = {
+            TYPE_A: ipaddress.IPv4Address(sinkhole_ipv4).packed if sinkhole_ipv4 else None,
+            TYPE_AAAA: ipaddress.IPv6Address(sinkhole_ipv6).packed if sinkhole_ipv6 else None,
+        }
+        self.block_ttl = block_ttl
+        self.cache = cache if cache is not None else DNSCache()
+        self._inflight: dict[tuple[str, int, int], asyncio.Future[bytes]] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._udp: asyncio.DatagramTransport | None = None
+        self._tcp: asyncio.AbstractServer | None = None
+        self.stats = {
+            "queries": 0,
+            "blocked": 0,
+            "cache_hits": 0,
+            "forwarded": 0,
+            "coalesced": 0,
+            "upstream_errors": 0,
+            "malformed": 0,
+        }
+
+    def is_blocked(self, name: str) -> bool:
+        labels = name.split(".")
+        return any(
+            self.dns_filter.is_blocked(".".join(labels[index:])) for index in range(len(labels))
+        )
+
+    async def handle(self, data: bytes, *, udp: bool = False) -> bytes | None:
+        """Answer one wire-format query; ``None`` means drop it (unparseable header)."""
+
+        local = self._answer_locally(data, udp=udp)
+        if isinstance(local, DNSQuestion):
+            return await self._forward(data, local, udp=udp)
+        return local
+
+    def _answer_locally(self, data: bytes, *, udp: bool) -> bytes | DNSQuestion | None:
+        """Answer from the blocklist or cache without awaiting anything.
+
+        Returns the parsed question instead when the query has to go upstream, so the
+        common cases are answered inline rather than in a task per datagram.
+        """
+
+        self.stats["queries"] += 1
+        try:
+            question = parse_query(data)
+        except DNSFormatError:
+            self.stats["malformed"] += 1
+            if len(data) < _HEADER.size:
+                return None
+            return _HEADER.pack(_U16.unpack_from(data)[0], FLAG_QR | RCODE_FORMERR, 0, 0, 0, 0)
+        if question.opcode != 0:
+            return self._reply(data, question, RCODE_NOTIMP)
+        if self.is_blocked(question.name):
+            self.stats["blocked"] += 1
+            logger.info(
+                "DNS query sinkholed",
+                extra={"domain": question.name, "qtype": question.qtype},
+            )
+            return self._blocked(data, question)
+        response = self.cache.get(question.key)
+        if response is None:
+            return question
+        self.stats["cache_hits"] += 1
+        return self._finish(data, question, response, udp)
+
+    async def _forward(self, data: bytes, question: DNSQuestion, *, udp: bool) -> bytes:
+        try:
+            response = await self._resolve(data, question)
+        except (TimeoutError, OSError, asyncio.IncompleteReadError, DNSFormatError) as exc:
+            self.stats["upstream_errors"] += 1
+            logger.warning(
+                "Upstream DNS query failed",
+                extra={"domain": question.name, "error": repr(exc)},
+            )
+            return self._reply(data, question, RCODE_SERVFAIL)
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            if task is None or task.cancelling():
+                raise
+            # The query this one was coalesced onto was cancelled, but this one was not.
+            self.stats["upstream_errors"] += 1
+            logger.warning(
+                "Coalesced upstream DNS query was cancelled", extra={"domain": question.name}
+            )
+            return self._reply(data, question, RCODE_SERVFAIL)
+        return self._finish(data, question, response, udp)
+
+    def _finish(self, data: bytes, question: DNSQuestion, response: bytes, udp: bool) -> bytes:
+        # Echo the client's ID and question bytes (case may differ under 0x20 encoding).
+        response = (
+            data[:2]
+            + response[2:12]
+            + data[12 : question.question_end]
+            + response[question.question_end :]
+        )
+        if udp and len(response) > question.udp_payload:
+            return self._reply(data, question, RCODE_NOERROR, truncated=True)
+        return response
+
+    async def _resolve(self, data: bytes, question: DNSQuestion) -> bytes:
+        key = question.key
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(pending)
+        future: asyncio.Future[bytes] = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            self.stats["forwarded"] += 1
+            response = await self.upstream.query(data, question.question_end)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Followers re-raise it; mark it retrieved in case there were none.
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+        # Answer the followers first: nothing after this point may leave them waiting.
+        future.set_result(response)
+        try:
+            self.cache.put(key, response)
+        except Exception as exc:
+            logger.warning(
+                "Upstream DNS response not cached",
+                extra={"domain": question.name, "error": repr(exc)},
+            )
+        return response
+
+    def _blocked(self, data: bytes, question: DNSQuestion) -> bytes:
+        if not any(self.sinkhole.values()):
+            return self._reply(data, question, RCODE_NXDOMAIN, authoritative=True)
+        address = self.sinkhole.get(question.qtype) if question.qclass == CLASS_IN else None
+        if address is None:
+            return self._reply(data, question, RCODE_NOERROR, authoritative=True)
+        answer = (
+            b"\xc0\x0c"
+            + _RR_TAIL.pack(question.qtype, CLASS_IN, self.block_ttl, len(address))
+            + address
+        )
+        return self._reply(data, question, RCODE_NOERROR, authoritative=True, answer=answer)
+
+    @staticmethod
+    def _reply(
+        data: bytes,
+        question: DNSQuestion,
+        rcode: int,
+        *,
+        authoritative: bool = False,
+        truncated: bool = False,
+        answer: bytes = b"",
+    ) -> bytes:
+        flags = FLAG_QR | FLAG_RA | (question.flags & (0x7800 | FLAG_RD)) | rcode
+        flags |= (FLAG_AA if authoritative else 0) | (FLAG_TC if truncated else 0)
+        header = _HEADER.pack(question.txid, flags, 1, 1 if answer else 0, 0, 0)
+        return header + data[12 : question.question_end] + answer
+
+    async def start(self, host: str = "127.0.0.1", port: int = 53) -> tuple[str, int]:
+        """Listen on UDP and TCP; return the bound address (useful with ``port=0``)."""
+
+        loop = asyncio.get_running_loop()
+        self._udp, _ = await loop.create_datagram_endpoint(
+            lambda: _UDPServerProtocol(self), local_addr=(host, port)
+        )
+        bound_host, bound_port = self._udp.get_extra_info("sockname")[:2]
+        self._tcp = await asyncio.start_server(self._serve_tcp, host, bound_port)
+        logger.info("DNS sinkhole listening", extra={"host": bound_host, "port": bound_port})
+        return bound_host, bound_port
+
+    async def _serve_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                length = _U16.unpack(await reader.readexactly(2))[0]
+                response = await self.handle(await reader.readexactly(length))
+                if response is None:
+                    break
+                writer.write(_U16.pack(len(response)) + response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _spawn(self, coro: Any) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        if self._udp is not None:
+            self._udp.close()
+        if self._tcp is not None:
+            self._tcp.close()
+            await self._tcp.wait_closed()
+        for task in list(self._tasks):
+            task.cancel()
+        self.upstream.close()
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            **self.stats,
+            "cache_entries": len(self.cache),
+            "cache_bytes": self.cache.size,
+            "cache_evictions": self.cache.evictions,
+            "inflight": len(self._inflight),
+        }
+
+
+def _address(value: str, default_port: int) -> tuple[str, int]:
+    host, _, port = value.rpartition(":")
+    if not host or not port.isdigit():
+        return value, default_port
+    return host.strip("[]"), int(port)
+
+
+def main(argv: list[str] | None = None) -> None:
+    from gateway.dns_filter import load_default_dns_filter
+    from logging_config import configure_logging
+
+    parser = argparse.ArgumentParser(description="DNS sinkhole backed by the gateway blocklists")
+    parser.add_argument("--listen", default="127.0.0.1:5353", help="host:port to serve on")
+    parser.add_argument("--upstream", default="1.1.1.1:53", help="host:port of the resolver")
+    parser.add_argument("--sinkhole", help="IPv4 address for blocked names (default NXDOMAIN)")
+    parser.add_argument("--sinkhole6", help="IPv6 address for blocked names")
+    parser.add_argument("--cache-mb", type=float, default=32.0)
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    async def serve() -> None:
+        server = DNSSinkholeServer(
+            load_default_dns_filter(),
+            _address(args.upstream, 53),
+            sinkhole_ipv4=args.sinkhole,
+            sinkhole_ipv6=args.sinkhole6,
+            cache=DNSCache(int(args.cache_mb * 1024 * 1024)),
+        )
+        await server.start(*_address(args.listen, 53))
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.close()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
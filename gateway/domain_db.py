@@ -0,0 +1,293 @@
+"""Exact-domain category database for feeds with millions of domains.
+
+A feed (``domain,Category[|Category...]`` CSV lines) is compiled into an SQLite file.
+Domains sit in a ``WITHOUT ROWID`` table keyed by the domain itself, so the B-tree
+holds the data and a lookup is one index probe with no separate rowid table. Each row
+stores a small integer naming a distinct category set; the sets are loaded into memory
+when the database is opened. Reads go through SQLite's memory-mapped I/O, so hot pages
+are served from the page cache without copying.
+
+``DomainCategoryDB.lookup`` checks the hostname and every parent domain in a single
+query, and the most specific match wins. Results are kept in an in-memory LRU, misses
+included, so repeat lookups never reach SQLite::
+
+    python -m gateway.domain_db build feed.csv config/domain_categories.db
+    python -m gateway.domain_db lookup config/domain_categories.db mail.example.com
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+DOMAIN_DB_ENV_VAR = "SWG_DOMAIN_DB"
+MMAP_SIZE = 1 << 30
+BATCH_SIZE = 50_000
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE category_sets (id INTEGER PRIMARY KEY, categories TEXT NOT NULL UNIQUE);
+CREATE TABLE domains (domain TEXT PRIMARY KEY, category_set INTEGER NOT NULL) WITHOUT ROWID;
+"""
+
+# Cached for hostnames with no match, so misses also skip SQLite.
+_MISS: frozenset[str] = frozenset()
+
+
+def normalize_domain(domain: str) -> str:
+    return domain.strip().strip(".").lower()
+
+
+def parent_domains(hostname: str) -> list[str]:
+    """``a.b.example.com`` -> ``[a.b.example.com, b.example.com, example.com, com]``."""
+
+    labels = hostname.split(".")
+    return [".".join(labels[index:]) for index in range(len(labels))]
+
+
+def read_feed(path: str | Path) -> Iterator[tuple[str, list[str]]]:
+    """Yield ``(domain, categories)`` from a CSV feed; ``#`` comments and a header are skipped.
+
+    Categories may be split across columns or joined with ``|`` in one column.
+    """
+
+    with Path(path).open("r", encoding="utf-8", newline="") as handle:
+        for row in csv.reader(handle):
+            if not row or row[0].startswith("#") or row[0].strip().lower() == "domain":
+                continue
+            categories = [c.strip() for cell in row[1:] for c in cell.split("|") if c.strip()]
+            yield row[0], categories
+
+
+def build_domain_db(entries: Iterable[tuple[str, Iterable[str]]], path: str | Path) -> int:
+    """Compile ``(domain, categories)`` pairs into a database at ``path``; return the count.
+
+    Rows are staged unsorted and then copied into the domain table in key order, so the
+    B-tree is built by appends and its pages end up full. The file is built next to
+    ``path`` and swapped in atomically, so gateways holding the old file keep working.
+    A domain listed twice keeps its last categories.
+    """
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    os.close(fd)
+    started = time.perf_counter()
+    try:
+        conn = sqlite3.connect(tmp_name, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("PRAGMA temp_store=FILE")
+            conn.executescript(SCHEMA)
+            conn.execute(
+                "CREATE TEMP TABLE staging (domain TEXT NOT NULL, category_set INTEGER NOT NULL)"
+            )
+            set_ids: dict[str, int] = {}
+
+            def rows() -> Iterator[tuple[str, int]]:
+                for domain, categories in entries:
+                    domain = normalize_domain(domain)
+                    names = sorted({c.strip() for c in categories if c.strip()})
+                    if not domain or not names:
+                        continue
+                    key = json.dumps(names)
+                    set_id = set_ids.get(key)
+                    if set_id is None:
+                        set_id = set_ids[key] = len(set_ids) + 1
+                    yield domain, set_id
+
+            conn.execute("BEGIN")
+            source = rows()
+            while batch := list(islice(source, BATCH_SIZE)):
+                conn.executemany("INSERT INTO staging VALUES (?, ?)", batch)
+            conn.execute(
+                "INSERT OR REPLACE INTO domains "
+                "SELECT domain, category_set FROM staging ORDER BY domain, rowid"
+            )
+            conn.execute("DROP TABLE staging")
+            conn.executemany(
+                "INSERT INTO category_sets VALUES (?, ?)",
+                ((set_id, key) for key, set_id in set_ids.items()),
+            )
+            count = conn.execute("SELECT count(*) FROM domains").fetchone()[0]
+            conn.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [("entries", str(count)), ("built_at", str(time.time()))],
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    logger.info(
+        "Domain category database built",
+        extra={"path": str(path), "entries": count, "seconds": time.perf_counter() - started},
+    )
+    return count
+
+
+class DomainCategoryDB:
+    """Read-only lookups of domain categories with parent-domain fallback and an LRU.
+
+    Each thread gets its own SQLite connection, so lookups from request threads do not
+    contend on a lock.
+    """
+
+    def __init__(self, path: str | Path, *, cache_size: int = 100_000):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"Domain category database not found at {self.path}")
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._cache: OrderedDict[str, frozenset[str]] = OrderedDict()
+        conn = self._connection()
+        self.category_sets = {
+            set_id: frozenset(json.loads(categories))
+            for set_id, categories in conn.execute("SELECT id, categories FROM category_sets")
+        }
+        self.entries = int(
+            conn.execute("SELECT value FROM meta WHERE key = 'entries'").fetchone()[0]
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                f"{self.path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+            )
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, hostname: str) -> frozenset[str] | None:
+        """Categories of ``hostname`` or its closest listed parent, or ``None``."""
+
+        hostname = normalize_domain(hostname)
+        cached = self._cache.get(hostname)
+        if cached is not None:
+            try:
+                self._cache.move_to_end(hostname)
+            except KeyError:  # evicted by a concurrent lookup; the value is still valid
+                pass
+            self.hits += 1
+            return cached or None
+        self.misses += 1
+        result = self._query(hostname) if hostname else None
+        if self.cache_size:
+            self._cache[hostname] = result or _MISS
+            while len(self._cache) > self.cache_size:
+                try:
+                    self._cache.popitem(last=False)
+                except KeyError:
+                    break
+        return result
+
+    def _query(self, hostname: str) -> frozenset[str] | None:
+        candidates = parent_domains(hostname)
+        placeholders = ",".join("?" * len(candidates))
+        rows = (
+            self._connection()
+            .execute(
+                f"SELECT domain, category_set FROM domains WHERE domain IN ({placeholders})",
+                candidates,
+            )
+            .fetchall()
+        )
+        if not rows:
+            return None
+        _, set_id = max(rows, key=lambda row: len(row[0]))
+        return self.category_sets.get(set_id)
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "entries": self.entries,
+            "file_bytes": self.path.stat().st_size,
+            "cached": len(self._cache),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+        }
+
+
+_SHARED_LOCK = threading.Lock()
+_SHARED: dict[str, Any] = {}
+
+
+def domain_db_stamp() -> tuple[str, int, int, int] | None:
+    """``(path, inode, mtime_ns, size)`` of ``$SWG_DOMAIN_DB``; changes when it is rebuilt.
+
+    A missing file stamps as ``-1`` so its reappearance is noticed too; ``None`` means no
+    database is configured.
+    """
+
+    path = os.environ.get(DOMAIN_DB_ENV_VAR)
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return (path, -1, -1, -1)
+    return (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def default_domain_db() -> DomainCategoryDB | None:
+    """The database named by ``$SWG_DOMAIN_DB``, shared until the file is replaced.
+
+    Configuration reloads build new categorizers; sharing the database keeps its
+    connections and warm LRU across them. A running gateway picks up a rebuilt file
+    because ``ConfigWatcher`` includes ``domain_db_stamp()`` in its fingerprint.
+    """
+
+    stamp = domain_db_stamp()
+    if stamp is None:
+        return None
+    path = stamp[0]
+    if stamp[1] < 0:
+        logger.warning("Domain category database missing", extra={"path": path})
+        return None
+    with _SHARED_LOCK:
+        if _SHARED.get("stamp") != stamp:
+            _SHARED.update(stamp=stamp, db=DomainCategoryDB(path))
+        return _SHARED["db"]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Build or query a domain category database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="compile a CSV feed into a database")
+    build.add_argument("feed")
+    build.add_argument("database")
+    lookup = commands.add_parser("lookup", help="print the categories of hostnames")
+    lookup.add_argument("database")
+    lookup.add_argument("hostnames", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = build_domain_db(read_feed(args.feed), args.database)
+        print(f"{count:,} domains written to {args.database}")
+        return
+    db = DomainCategoryDB(args.database)
+    for hostname in args.hostnames:
+        categories = db.lookup(hostname)
+        print(f"{hostname}\t{', '.join(sorted(categories)) if categories else '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Constant-memory latency histogram shared by replay, admission control, and benchmarks."""
+
+from __future__ import annotations
+
+import math
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (about 2% relative error) with constant memory."""
+
+    GROWTH = 1.02
+    FLOOR = 1e-7
+
+    def __init__(self) -> None:
+        self.counts: dict[int, int] = {}
+        self.total = 0
+        self.maximum = 0.0
+
+    def add(self, seconds: float) -> None:
+        bucket = (
+            0 if seconds <= self.FLOOR else 1 + int(math.log(seconds / self.FLOOR, self.GROWTH))
+        )
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        self.maximum = max(self.maximum, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = fraction * self.total
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.FLOOR * self.GROWTH**bucket, self.maximum)
+        return self.maximum
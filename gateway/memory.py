@@ -0,0 +1,503 @@
+"""Memory accounting and budgets for the state a gateway worker holds.
+
+``deep_sizeof`` estimates the bytes reachable from an object, counting shared objects
+once. Containers larger than ``sample`` items are measured from their first ``sample``
+items and scaled up, so measuring a multi-million-entry blocklist takes milliseconds
+instead of seconds.
+
+``MemoryAccountant`` measures a gateway component by component:
+
+- configuration state (``dns_blocklist``, ``url_categories``, ``policies``, ``tokens``),
+  rebuilt on every config load;
+- caches (``category_cache``, ``token_cache``, ``tls_fingerprints``,
+  ``admission_buckets``), bounded by an entry count;
+- buffers (``slow_requests``, ``log_aggregates``).
+
+A ``MemoryBudget`` (``$SWG_MEMORY_BUDGET``, e.g.
+``config=512MiB,dns_blocklist=256MiB,category_cache=32MiB,action=refuse``) limits any
+component or kind (``config``, ``caches``, ``buffers``). A cache budget is enforced by
+lowering the cache's entry limit to ``budget / measured bytes per entry``. A config
+budget is checked when a new generation is published; over budget it is logged, or with
+``action=refuse`` the load is rejected and the current generation stays in service.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+from itertools import islice
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Mapping
+
+if TYPE_CHECKING:
+    from gateway.config_watcher import GatewayConfig
+    from gateway.proxy import SecureWebGateway
+
+logger = logging.getLogger(__name__)
+
+MEMORY_BUDGET_ENV_VAR = "SWG_MEMORY_BUDGET"
+DEFAULT_SAMPLE = 1000
+ACTIONS = ("warn", "refuse")
+
+# Shared or runtime objects that are not part of any component's footprint.
+_OPAQUE = (
+    type,
+    ModuleType,
+    FunctionType,
+    BuiltinFunctionType,
+    MethodType,
+    logging.Logger,
+    type(threading.Lock()),
+    type(threading.RLock()),
+    threading.Thread,
+)
+_LEAVES = (str, bytes, bytearray, int, float, complex, bool, type(None), re.Pattern)
+
+COMPONENT_KINDS: dict[str, str] = {
+    "dns_blocklist": "config",
+    "url_categories": "config",
+    "policies": "config",
+    "tokens": "config",
+    "category_cache": "caches",
+    "token_cache": "caches",
+    "tls_fingerprints": "caches",
+    "admission_buckets": "caches",
+    "slow_requests": "buffers",
+    "log_aggregates": "buffers",
+}
+
+_UNITS = {"": 1, "b": 1, "k": 1 << 10, "kb": 1 << 10, "kib": 1 << 10}
+_UNITS.update(m=1 << 20, mb=1 << 20, mib=1 << 20, g=1 << 30, gb=1 << 30, gib=1 << 30)
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    """A configuration load was refused because it would exceed its memory budget."""
+
+    def __init__(self, message: str, usage: list[ComponentUsage]):
+        super().__init__(message)
+        self.usage = usage
+
+
+def parse_size(text: str) -> int:
+    """``"64MiB"`` -> ``67108864``; plain numbers are bytes."""
+
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*", text)
+    if match is None or match.group(2).lower() not in _UNITS:
+        raise ValueError(f"Invalid size: {text!r}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+
+
+def _children(obj: Any, sample: int) -> tuple[list[Any], float]:
+    """Objects referenced by ``obj`` (or a prefix sample of them) and the scale factor."""
+
+    if isinstance(obj, dict):
+        count = len(obj)
+        items: Iterable[Any] = obj.items()
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        count = len(obj)
+        items = obj
+    else:
+        children = []
+        if hasattr(obj, "__dict__"):
+            children.append(vars(obj))
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if name not in ("__dict__", "__weakref__") and hasattr(obj, name):
+                    children.append(getattr(obj, name))
+        return children, 1.0
+    if not count:
+        return [], 1.0
+    # Request threads may resize a cache while it is measured; retry on a fresh iterator.
+    for _ in range(3):
+        try:
+            taken = list(islice(items, sample))
+            break
+        except RuntimeError:
+            continue
+    else:
+        return [], 1.0
+    if isinstance(obj, dict):
+        flat = [part for pair in taken for part in pair]
+    else:
+        flat = taken
+    return flat, count / max(len(taken), 1)
+
+
+def deep_sizeof(obj: Any, *, seen: set[int] | None = None, sample: int = DEFAULT_SAMPLE) -> int:
+    """Estimated bytes reachable from ``obj``, skipping objects already in ``seen``.
+
+    Pass the same ``seen`` set to several calls to attribute shared objects only to the
+    first component measured.
+    """
+
+    seen = set() if seen is None else seen
+    total = 0.0
+    stack: list[tuple[Any, float]] = [(obj, 1.0)]
+    while stack:
+        item, weight = stack.pop()
+        if id(item) in seen or isinstance(item, _OPAQUE):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item) * weight
+        if isinstance(item, _LEAVES):
+            continue
+        children, scale = _children(item, sample)
+        stack.extend((child, weight * scale) for child in children)
+    return int(total)
+
+
+@dataclass(frozen=True)
+class ComponentUsage:
+    """Measured footprint of one component.
+
+    Attributes:
+        name: Component name, e.g. ``dns_blocklist``.
+        kind: ``config``, ``caches``, or ``buffers``.
+        bytes: Estimated bytes held, not counting objects owned by earlier components.
+        entries: Items held (domains, users, cached verdicts, ...).
+        limit: Entry limit of a cache after budgets are applied, else ``None``.
+        budget: Byte budget from the ``MemoryBudget``, or ``None``.
+    """
+
+    name: str
+    kind: str
+    bytes: int
+    entries: int
+    limit: int | None = None
+    budget: int | None = None
+
+    @property
+    def bytes_per_entry(self) -> float | None:
+        return self.bytes / self.entries if self.entries else None
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.bytes > self.budget
+
+    def to_dict(self) -> dict[str, Any]:
+        per_entry = self.bytes_per_entry
+        return {
+            "kind": self.kind,
+            "bytes": self.bytes,
+            "entries": self.entries,
+            "bytes_per_entry": round(per_entry, 1) if per_entry is not None else None,
+            "limit": self.limit,
+            "budget": self.budget,
+            "over_budget": self.over_budget,
+        }
+
+
+@dataclass(frozen=True)
+class MemoryBudget:
+    """Byte limits per component or kind, and what to do when config exceeds them.
+
+    Attributes:
+        limits: Bytes allowed per component name or per kind (``config``, ``caches``,
+            ``buffers``).
+        action: ``warn`` logs an over-budget config load; ``refuse`` rejects it.
+    """
+
+    limits: Mapping[str, int] = field(default_factory=dict)
+    action: str = "warn"
+
+    def __post_init__(self) -> None:
+        if self.action not in ACTIONS:
+            raise ValueError(f"Unknown memory budget action: {self.action!r}")
+        unknown = set(self.limits) - set(COMPONENT_KINDS) - set(COMPONENT_KINDS.values())
+        if unknown:
+            raise ValueError(f"Unknown memory budget components: {sorted(unknown)}")
+
+    @classmethod
+    def from_spec(cls, spec: str) -> MemoryBudget:
+        """Parse ``name=size,...`` with an optional ``action=warn|refuse``."""
+
+        limits: dict[str, int] = {}
+        action = "warn"
+        for part in filter(None, (p.strip() for p in spec.split(","))):
+            name, sep, value = part.partition("=")
+            if not sep:
+                raise ValueError(f"Invalid memory budget spec: {spec!r}")
+            name = name.strip()
+            if name == "action":
+                action = value.strip()
+            else:
+                limits[name] = parse_size(value)
+        return cls(limits, action)
+
+    @classmethod
+    def from_env(cls) -> MemoryBudget | None:
+        """The budget in ``$SWG_MEMORY_BUDGET``, or ``None`` when unset."""
+
+        spec = os.environ.get(MEMORY_BUDGET_ENV_VAR)
+        return cls.from_spec(spec) if spec else None
+
+    def violations(self, usage: Iterable[ComponentUsage]) -> list[str]:
+        """Human-readable ``name: used > budget`` lines for every limit exceeded."""
+
+        usage = list(usage)
+        totals = {kind: 0 for kind in dict.fromkeys(COMPONENT_KINDS.values())}
+        for component in usage:
+            totals[component.kind] += component.bytes
+        measured = [(c.name, c.bytes) for c in usage] + list(totals.items())
+        return [
+            f"{name}: {used:,} bytes > budget {self.limits[name]:,}"
+            for name, used in measured
+            if name in self.limits and used > self.limits[name]
+        ]
+
+
+def _built(config: GatewayConfig, name: str) -> Any:
+    # Engines are cached_properties; measuring must not build ones nobody has used yet.
+    return vars(config).get(name)
+
+
+@dataclass
+class Component:
+    """Objects that make up one component, and how to measure and bound them.
+
+    Attributes:
+        objects: Roots of the component's memory.
+        entries: Items held, for bytes-per-entry figures.
+        deep: ``False`` counts only the roots themselves, for indexes whose contents
+            belong to another component. Sampling cannot reliably skip objects shared
+            with a large container measured earlier, so such indexes must say so.
+        get_limit: Current entry limit of a cache.
+        set_limit: Changes that limit.
+        owner: Object whose limit ``get_limit`` and ``set_limit`` act on.
+    """
+
+    objects: list[Any]
+    entries: int
+    deep: bool = True
+    get_limit: Callable[[], int] | None = None
+    set_limit: Callable[[int], None] | None = None
+    owner: Any = None
+
+
+def config_components(config: GatewayConfig) -> dict[str, Component]:
+    """The components of the engines ``config`` has built."""
+
+    components: dict[str, Component] = {}
+    dns_filter = _built(config, "dns_filter")
+    if dns_filter is not None:
+        domains = dns_filter.blocked_domains
+        components["dns_blocklist"] = Component([domains], len(domains))
+    categorizer = _built(config, "categorizer")
+    if categorizer is not None:
+        objects = [categorizer.categories, categorizer._compiled]
+        components["url_categories"] = Component(objects, len(categorizer.categories))
+    policy = _built(config, "policy_document")
+    engine = _built(config, "policy_engine")
+    if policy is None and engine is not None:
+        policy = engine.policy
+    if policy is not None:
+        components["policies"] = Component([policy], len(policy.get("users") or {}))
+    validator = _built(config, "token_validator")
+    if validator is not None:
+        # Both maps hold the users and tokens strings of the policy document.
+        objects = [validator.known_tokens, validator._users_by_token]
+        components["tokens"] = Component(objects, len(validator.known_tokens), deep=policy is None)
+    return components
+
+
+def measure(
+    components: Mapping[str, Component],
+    budget: MemoryBudget | None = None,
+    sample: int = DEFAULT_SAMPLE,
+) -> list[ComponentUsage]:
+    """Measure each component in order; shared objects count toward the first only."""
+
+    seen: set[int] = set()
+    usage = []
+    for name, component in components.items():
+        size = 0
+        for obj in component.objects:
+            if component.deep:
+                size += deep_sizeof(obj, seen=seen, sample=sample)
+            elif id(obj) not in seen:
+                seen.add(id(obj))
+                size += sys.getsizeof(obj)
+        usage.append(
+            ComponentUsage(
+                name=name,
+                kind=COMPONENT_KINDS[name],
+                bytes=size,
+                entries=component.entries,
+                limit=component.get_limit() if component.get_limit is not None else None,
+                budget=budget.limits.get(name) if budget is not None else None,
+            )
+        )
+    return usage
+
+
+def check_config(config: GatewayConfig, budget: MemoryBudget) -> list[ComponentUsage]:
+    """Measure a built generation against ``budget``, warning or raising when over it."""
+
+    usage = measure(config_components(config), budget)
+    violations = budget.violations(usage)
+    if violations:
+        message = "Configuration exceeds memory budget: " + "; ".join(violations)
+        if budget.action == "refuse":
+            raise MemoryBudgetExceeded(message, usage)
+        logger.warning(message, extra={"config_version": config.version})
+    return usage
+
+
+def _set_admission_limit(admission: Any, limit: int) -> None:
+    admission.policy = replace(admission.policy, max_tracked_users=limit)
+
+
+class MemoryAccountant:
+    """Measures a gateway's components and holds its caches within their budgets.
+
+    Each ``report()`` re-measures everything and, for every cache with a byte budget,
+    sets its entry limit to ``min(configured limit, budget / bytes per entry)``. Caches
+    evict down to a lowered limit as new entries arrive.
+
+    A budget can only lower a limit: when entries get cheaper the limit rises back, but
+    never above the size the cache was built with.
+    """
+
+    def __init__(
+        self,
+        gateway: SecureWebGateway,
+        budget: MemoryBudget | None = None,
+        sample: int = DEFAULT_SAMPLE,
+    ):
+        self.gateway = gateway
+        self.budget = budget
+        self.sample = sample
+        # Cache name -> (owner, limit it was built with). A new owner, such as the
+        # database of a new configuration generation, replaces the entry.
+        self._configured: dict[str, tuple[Any, int]] = {}
+        self._lock = threading.Lock()
+
+    def _caches(self) -> dict[str, Component]:
+        gateway = self.gateway
+        caches: dict[str, Component] = {}
+        categorizer = _built(gateway.config, "categorizer")
+        domain_db = getattr(categorizer, "domain_db", None)
+        if domain_db is not None:
+            caches["category_cache"] = Component(
+                [domain_db._cache],
+                len(domain_db._cache),
+                get_limit=lambda: domain_db.cache_size,
+                set_limit=lambda limit: setattr(domain_db, "cache_size", limit),
+                owner=domain_db,
+            )
+        validator = _built(gateway.config, "token_validator")
+        key_ring = getattr(validator, "key_ring", None)
+        if key_ring is not None:
+            caches["token_cache"] = Component(
+                [key_ring._cache],
+                len(key_ring._cache),
+                get_limit=lambda: key_ring.cache_size,
+                set_limit=lambda limit: setattr(key_ring, "cache_size", limit),
+                owner=key_ring,
+            )
+        tls = gateway._tls_inspector
+        if tls is not None:
+            caches["tls_fingerprints"] = Component(
+                [tls._fingerprints],
+                len(tls._fingerprints),
+                get_limit=lambda: tls.fingerprint_cache_size,
+                set_limit=lambda limit: setattr(tls, "fingerprint_cache_size", limit),
+                owner=tls,
+            )
+        admission = gateway.admission
+        if admission is not None:
+            caches["admission_buckets"] = Component(
+                [admission._buckets],
+                len(admission._buckets),
+                get_limit=lambda: admission.policy.max_tracked_users,
+                set_limit=lambda limit: _set_admission_limit(admission, limit),
+                owner=admission,
+            )
+        return caches
+
+    def _buffers(self) -> dict[str, Component]:
+        buffers: dict[str, Component] = {}
+        slow = self.gateway.slow_requests
+        if slow is not None:
+            buffers["slow_requests"] = Component([slow._entries], len(slow._entries))
+        log_policy = self.gateway._log_policy
+        if log_policy is not None:
+            buffers["log_aggregates"] = Component([log_policy._counts], len(log_policy._counts))
+        return buffers
+
+    def _apply_limits(
+        self, caches: Mapping[str, Component], usage: list[ComponentUsage]
+    ) -> list[ComponentUsage]:
+        budget = self.budget
+        applied = []
+        for component in usage:
+            cache = caches.get(component.name)
+            if cache is None or cache.get_limit is None or cache.set_limit is None:
+                applied.append(component)
+                continue
+            entry = self._configured.get(component.name)
+            if entry is None or entry[0] is not cache.owner:
+                entry = self._configured[component.name] = (cache.owner, cache.get_limit())
+            configured = limit = entry[1]
+            allowed = budget.limits.get(component.name) if budget is not None else None
+            if allowed is not None and component.entries:
+                # A dict's table does not shrink on eviction, so price entries by their
+                # contents alone; otherwise every refresh would lower the limit again.
+                table = sum(sys.getsizeof(obj) for obj in cache.objects)
+                per_entry = max(component.bytes - table, 1) / component.entries
+                limit = min(configured, max(1, int(allowed / per_entry)))
+            if limit != cache.get_limit():
+                cache.set_limit(limit)
+                logger.info(
+                    "Cache limit adjusted for memory budget",
+                    extra={"cache": component.name, "limit": limit, "budget": allowed},
+                )
+            applied.append(replace(component, limit=limit))
+        for name in self._configured.keys() - caches.keys():
+            del self._configured[name]
+        return applied
+
+    def measure(self) -> list[ComponentUsage]:
+        with self._lock:
+            caches = self._caches()
+            components = {**config_components(self.gateway.config), **caches, **self._buffers()}
+            usage = measure(components, self.budget, sample=self.sample)
+            return self._apply_limits(caches, usage)
+
+    def report(self) -> dict[str, Any]:
+        """JSON-ready usage per component and per kind, with the process RSS."""
+
+        started = time.perf_counter()
+        usage = self.measure()
+        totals = {kind: 0 for kind in dict.fromkeys(COMPONENT_KINDS.values())}
+        for component in usage:
+            totals[component.kind] += component.bytes
+        violations = self.budget.violations(usage) if self.budget is not None else []
+        if violations:
+            logger.warning("Memory budget exceeded", extra={"violations": violations})
+        return {
+            "pid": os.getpid(),
+            "measured_at": time.time(),
+            "measure_seconds": round(time.perf_counter() - started, 4),
+            "config_version": self.gateway.config.version,
+            "rss_bytes": process_rss(),
+            "totals": totals,
+            "components": {c.name: c.to_dict() for c in usage},
+            "violations": violations,
+        }
+
+
+def process_rss() -> int | None:
+    """Resident set size of this process, where the platform reports it."""
+
+    try:
+        with open("/proc/self/statm", encoding="ascii") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
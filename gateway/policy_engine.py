@@ -7,8 +7,6 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Iterable
 
-import yaml
-
 from auth.device_trust import DevicePosture, DeviceTrust
 from auth.ztna_token_validator import TokenValidationResult, ZTNATokenValidator
 
@@ -26,6 +24,22 @@ class PolicyDecision:
     device: DevicePosture
 
 
+def load_policy_document(policy_path: Path) -> dict:
+    """Parse a policy YAML file, falling back to allow-all when it is missing."""
+
+    if not policy_path.exists():
+        logger.warning(
+            "Policy file not found; falling back to default allow-all policy",
+            extra={"path": str(policy_path)},
+        )
+        return {"default_policy": {"allow_all_if_no_match": True}}
+
+    import yaml
+
+    with policy_path.open("r", encoding="utf-8") as handle:
+        return yaml.safe_load(handle) or {"default_policy": {}}
+
+
 class PolicyEngine:
     """Evaluates access policies using identity, device, and destination context."""
 
@@ -34,22 +48,15 @@ class PolicyEngine:
         policy_path: str | Path,
         token_validator: ZTNATokenValidator | None = None,
         device_trust: DeviceTrust | None = None,
+        policy: dict | None = None,
     ):
         self.policy_path = Path(policy_path)
         self.token_validator = token_validator or ZTNATokenValidator()
         self.device_trust = device_trust or DeviceTrust()
-        self.policy = self._load_policy()
+        self.policy = policy if policy is not None else self._load_policy()
 
     def _load_policy(self) -> dict:
-        if not self.policy_path.exists():
-            logger.warning(
-                "Policy file not found; falling back to default allow-all policy",
-                extra={"path": str(self.policy_path)},
-            )
-            return {"default_policy": {"allow_all_if_no_match": True}}
-
-        with self.policy_path.open("r", encoding="utf-8") as handle:
-            return yaml.safe_load(handle) or {"default_policy": {}}
+        return load_policy_document(self.policy_path)
 
     def reload(self) -> None:
         """Reload policy configuration from disk."""
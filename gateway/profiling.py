@@ -0,0 +1,383 @@
+"""On-demand sampling profiler and slow-request trace for gateway workers.
+
+``SamplingProfiler`` samples every thread's Python stack ``hz`` times a second with
+``sys._current_frames`` and counts identical stacks. Its output is in the collapsed
+format (``thread;outer;...;inner count`` per line) that ``flamegraph.pl``, speedscope,
+and similar tools read. It needs no tracing hooks, so code between samples runs at full
+speed.
+
+``SlowRequestLog`` keeps the newest requests whose total time exceeded a threshold in a
+bounded ring buffer. It stores metadata and the per-stage timings, never bodies or
+query strings.
+
+Workers and the control plane are separate processes, so they coordinate through a
+directory (``$SWG_DEBUG_DIR``), the same way posture and policies travel as files.
+``DiagnosticsAgent`` runs in each worker: it follows ``profiler.json`` written by the
+control plane, starting and stopping the profiler, and it publishes
+``profile-<session>-<pid>.folded`` and ``slow-<pid>.json`` for the control plane to
+merge. Given a memory report callable, it also refreshes ``memory-<pid>.json`` every
+``memory_interval`` seconds (see ``gateway.memory``).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterable
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from types import CodeType, FrameType
+
+    from gateway.proxy import ProxyRequest, ProxyResult
+
+logger = logging.getLogger(__name__)
+
+DEBUG_DIR_ENV_VAR = "SWG_DEBUG_DIR"
+SLOW_REQUEST_ENV_VAR = "SWG_SLOW_REQUEST_MS"
+CONTROL_FILE = "profiler.json"
+DEFAULT_DEBUG_DIR = Path(__file__).resolve().parents[1] / "streamlit_logs" / "debug"
+MAX_STACK_DEPTH = 128
+
+
+class SamplingProfiler:
+    """Statistical profiler that samples all threads' stacks at ``hz`` samples/s.
+
+    ``duration`` stops sampling automatically so a forgotten session cannot run forever.
+    """
+
+    def __init__(self, hz: float = 100.0, duration: float | None = None):
+        if not 0 < hz <= 1000:
+            raise ValueError("hz must be in (0, 1000]")
+        self.hz = hz
+        self.duration = duration
+        self.samples = 0
+        self.started_at: float | None = None
+        self._stacks: Counter[str] = Counter()
+        self._labels: dict[CodeType, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> SamplingProfiler:
+        if not self.running:
+            self._stop.clear()
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> str:
+        """Stop sampling and return the collapsed stacks gathered so far."""
+
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        with self._lock:
+            stacks = sorted(self._stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def _run(self) -> None:
+        interval = 1.0 / self.hz
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + self.duration if self.duration else None
+        next_sample = time.monotonic()
+        while not self._stop.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id != own_id:
+                        self._stacks[self._collapse(names.get(thread_id, thread_id), frame)] += 1
+                self.samples += 1
+            del frames
+            next_sample += interval
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+            # Skip missed ticks instead of bursting to catch up after a stall.
+            if next_sample < now:
+                next_sample = now + interval
+            self._stop.wait(next_sample - now)
+
+    def _collapse(self, thread: Any, frame: FrameType | None) -> str:
+        labels = self._labels
+        parts: list[str] = []
+        while frame is not None and len(parts) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+                label = labels[code] = label.replace(";", ":")
+            parts.append(label)
+            frame = frame.f_back
+        parts.append(str(thread).replace(";", ":"))
+        return ";".join(reversed(parts))
+
+
+class SlowRequestLog:
+    """Ring buffer of the ``capacity`` most recent requests slower than ``threshold`` s."""
+
+    def __init__(self, threshold: float = 0.5, capacity: int = 256):
+        self.threshold = threshold
+        self._entries: deque[dict[str, Any]] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    @classmethod
+    def from_env(cls) -> SlowRequestLog | None:
+        """A log with the ``$SWG_SLOW_REQUEST_MS`` threshold, or ``None`` when unset."""
+
+        threshold = os.environ.get(SLOW_REQUEST_ENV_VAR)
+        return cls(float(threshold) / 1000) if threshold else None
+
+    def observe(self, request: ProxyRequest, result: ProxyResult) -> None:
+        total = result.timings.get("total", 0.0)
+        if total < self.threshold:
+            return
+        record = result.log_record
+        url = urlsplit(request.url)
+        entry = {
+            "timestamp": record.get("timestamp", time.time()),
+            "pid": os.getpid(),
+            "user": record.get("user"),
+            "domain": record.get("domain") or url.hostname,
+            "url": f"{url.scheme}://{url.netloc}{url.path}" if url.scheme else url.path,
+            "method": request.method,
+            "body_bytes": len(request.body or ""),
+            "allowed": result.allowed,
+            "reasons": list(result.decision.reasons),
+            "config_version": record.get("config_version"),
+            "timings_ms": {
+                stage: round(value * 1000, 3) for stage, value in result.timings.items()
+            },
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self.recorded += 1
+
+    def entries(self, limit: int | None = None, min_ms: float = 0.0) -> list[dict[str, Any]]:
+        """Newest first, optionally only those at least ``min_ms`` in total."""
+
+        with self._lock:
+            entries = list(self._entries)
+        matching = [e for e in reversed(entries) if e["timings_ms"].get("total", 0.0) >= min_ms]
+        return matching[:limit] if limit else matching
+
+
+def debug_dir() -> Path:
+    """Directory shared by workers and the control plane (``$SWG_DEBUG_DIR``)."""
+
+    return Path(os.environ.get(DEBUG_DIR_ENV_VAR) or DEFAULT_DEBUG_DIR)
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(text)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def request_profile(
+    directory: str | Path, command: str, *, hz: float = 100.0, duration: float = 60.0
+) -> dict[str, Any]:
+    """Write the control file that tells every worker to ``start`` or ``stop`` profiling."""
+
+    if command not in ("start", "stop"):
+        raise ValueError(f"Unknown profiler command: {command}")
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    control = read_control(directory)
+    if command == "start":
+        control = {"command": "start", "session": f"{int(time.time() * 1000):x}"}
+        control.update(hz=hz, duration=duration, requested_at=time.time())
+    elif control:
+        control = {**control, "command": "stop"}
+    else:
+        return {}
+    _write_atomic(directory / CONTROL_FILE, json.dumps(control))
+    return control
+
+
+def read_control(directory: str | Path) -> dict[str, Any]:
+    try:
+        return json.loads((Path(directory) / CONTROL_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def merge_profiles(paths: Iterable[Path]) -> str:
+    """Sum collapsed stacks from several workers into one collapsed profile."""
+
+    totals: Counter[str] = Counter()
+    for path in paths:
+        for line in path.read_text(encoding="utf-8").splitlines():
+            stack, _, count = line.rpartition(" ")
+            if stack and count.isdigit():
+                totals[stack] += int(count)
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(totals.items()))
+
+
+def profile_output(directory: str | Path, session: str | None = None) -> tuple[str | None, str]:
+    """Return ``(session, merged collapsed stacks)`` for ``session`` or the latest one."""
+
+    directory = Path(directory)
+    session = session or read_control(directory).get("session")
+    # Session IDs are hex; anything else could smuggle glob or path syntax.
+    if not session or not session.isalnum():
+        return None, ""
+    return session, merge_profiles(sorted(directory.glob(f"profile-{session}-*.folded")))
+
+
+def slow_requests(
+    directory: str | Path, limit: int = 50, min_ms: float = 0.0
+) -> list[dict[str, Any]]:
+    """Slow requests published by every worker, newest first."""
+
+    entries: list[dict[str, Any]] = []
+    for path in Path(directory).glob("slow-*.json"):
+        try:
+            entries.extend(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    entries = [e for e in entries if e["timings_ms"].get("total", 0.0) >= min_ms]
+    entries.sort(key=lambda entry: entry["timestamp"], reverse=True)
+    return entries[:limit]
+
+
+def memory_reports(directory: str | Path) -> list[dict[str, Any]]:
+    """The latest memory report published by each worker, by pid."""
+
+    reports: list[dict[str, Any]] = []
+    for path in Path(directory).glob("memory-*.json"):
+        try:
+            reports.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    return sorted(reports, key=lambda report: report.get("pid", 0))
+
+
+class DiagnosticsAgent:
+    """Background thread in a gateway worker that obeys and reports to the control plane."""
+
+    def __init__(
+        self,
+        directory: str | Path,
+        slow_log: SlowRequestLog | None = None,
+        interval: float = 1.0,
+        memory: Callable[[], dict[str, Any]] | None = None,
+        memory_interval: float = 30.0,
+    ):
+        self.directory = Path(directory)
+        self.slow_log = slow_log
+        self.interval = interval
+        self.memory = memory
+        self.memory_interval = memory_interval
+        self._memory_due = 0.0
+        self.profiler: SamplingProfiler | None = None
+        self._session: str | None = None
+        self._published_slow = -1
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> DiagnosticsAgent:
+        if self._thread is None or not self._thread.is_alive():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="diagnostics", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.poll()
+        if self.profiler is not None:
+            self.profiler.stop()
+            self._publish_profile()
+
+    def _run(self) -> None:
+        while True:
+            self.poll()
+            if self._stop.wait(self.interval):
+                return
+
+    def poll(self) -> None:
+        """Apply the current control file and publish profiles, slow requests, and memory.
+
+        Each step is attempted even if an earlier one fails, and no failure escapes: a
+        broken report must not stop the agent thread.
+        """
+
+        for step in (self._profile, self._publish_slow_requests, self._publish_memory):
+            try:
+                step()
+            except Exception as exc:
+                logger.error(
+                    "Diagnostics publish failed",
+                    extra={"step": step.__name__, "error": str(exc), "path": str(self.directory)},
+                    exc_info=not isinstance(exc, OSError),
+                )
+
+    def _profile(self) -> None:
+        self._follow_control(read_control(self.directory))
+        if self.profiler is not None:
+            self._publish_profile()
+            if not self.profiler.running:
+                self.profiler = None
+
+    def _follow_control(self, control: dict[str, Any]) -> None:
+        session = control.get("session")
+        if control.get("command") == "start" and session != self._session:
+            if self.profiler is not None:
+                self.profiler.stop()
+                self._publish_profile()
+            self._session = session
+            self.profiler = SamplingProfiler(
+                float(control.get("hz", 100.0)), float(control.get("duration") or 0) or None
+            ).start()
+            logger.info("Profiler started", extra={"session": session, "hz": self.profiler.hz})
+        elif control.get("command") == "stop" and session == self._session:
+            if self.profiler is not None and self.profiler.running:
+                self.profiler.stop()
+                logger.info("Profiler stopped", extra={"session": session})
+
+    def _publish_profile(self) -> None:
+        assert self.profiler is not None
+        path = self.directory / f"profile-{self._session}-{os.getpid()}.folded"
+        _write_atomic(path, self.profiler.collapsed())
+
+    def _publish_slow_requests(self) -> None:
+        slow_log = self.slow_log
+        if slow_log is None or slow_log.recorded == self._published_slow:
+            return
+        recorded = slow_log.recorded
+        _write_atomic(self.directory / f"slow-{os.getpid()}.json", json.dumps(slow_log.entries()))
+        self._published_slow = recorded
+
+    def _publish_memory(self) -> None:
+        now = time.monotonic()
+        if self.memory is None or now < self._memory_due:
+            return
+        self._memory_due = now + self.memory_interval
+        report = self.memory()
+        _write_atomic(self.directory / f"memory-{os.getpid()}.json", json.dumps(report))
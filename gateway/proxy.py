@@ -4,27 +4,36 @@ from __future__ import annotations
 
 import json
 import logging
+import os
+import time
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Mapping
+from typing import TYPE_CHECKING, Any, Mapping
 from urllib.parse import urlparse
 
-from auth.device_trust import DeviceTrust
-from auth.ztna_token_validator import ZTNATokenValidator
-from casb.cloud_app_detector import CloudAppDetector
 from casb.forbidden_activity_rules import evaluate_activity
 from gateway.dlp_inspector import DLPInspectionResult, inspect_payload
-from gateway.dns_filter import DNSFilter, load_default_dns_filter
-from gateway.policy_engine import PolicyDecision, PolicyEngine
-from gateway.tls_metadata_inspector import TLSMetadataInspector
-from gateway.url_categorizer import URLCategorizer, load_default_categorizer
-from logging_config import configure_logging
-from siem.log_forwarder import LogForwarder
-
-configure_logging()
+
+if TYPE_CHECKING:
+    from auth.device_trust import DeviceTrust
+    from auth.ztna_token_validator import ZTNATokenValidator
+    from casb.cloud_app_detector import CloudAppDetector
+    from gateway.admission import AdmissionController, AdmissionTicket
+    from gateway.config_snapshot import ConfigSnapshot
+    from gateway.config_watcher import ConfigWatcher, GatewayConfig
+    from gateway.dns_filter import DNSFilter
+    from gateway.memory import MemoryAccountant, MemoryBudget
+    from gateway.policy_engine import PolicyDecision, PolicyEngine
+    from gateway.profiling import DiagnosticsAgent, SlowRequestLog
+    from gateway.tls_metadata_inspector import TLSMetadataInspector
+    from gateway.url_categorizer import URLCategorizer
+    from siem.log_forwarder import LogForwarder
+    from siem.log_policy import LogPolicy
+
 logger = logging.getLogger(__name__)
 
 SUPPORTED_METHODS: set[str] = {"GET", "POST", "PUT", "DELETE", "PATCH"}
+SNAPSHOT_ENV_VAR = "SWG_CONFIG_SNAPSHOT"
 
 
 @dataclass(frozen=True)
@@ -36,6 +45,7 @@ class ProxyRequest:
     token: str | None = None
     device: dict[str, Any] = field(default_factory=dict)
     body: str | bytes | None = ""
+    client_hello: bytes | str | None = None
 
     @classmethod
     def from_mapping(cls, request: Mapping[str, Any]) -> ProxyRequest:
@@ -47,6 +57,7 @@ class ProxyRequest:
             token=request.get("token"),
             device=request.get("device", {}) or {},
             body=request.get("body", ""),
+            client_hello=request.get("client_hello"),
         )
 
 
@@ -60,10 +71,25 @@ class ProxyResult:
     dlp_action: str
     tls_metadata: dict[str, Any]
     log_record: dict[str, Any] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)
+    # True when admission control refused the request as retryable (HTTP 503 semantics).
+    shed: bool = False
 
 
 class SecureWebGateway:
-    """Coordinates DNS, URL, CASB, DLP, Zero Trust, and policy enforcement."""
+    """Coordinates DNS, URL, CASB, DLP, Zero Trust, and policy enforcement.
+
+    Engines that are not injected are built lazily on first use, so constructing a
+    gateway is cheap and a worker only pays for the configuration it actually touches.
+    When ``snapshot_path`` (or the ``SWG_CONFIG_SNAPSHOT`` environment variable) names a
+    precompiled snapshot, every engine is built from that single file instead of parsing
+    the individual YAML, JSON, and blocklist sources.
+
+    Configuration-derived engines (categorizer, DNS filter, token validator, and policy
+    engine) live in an immutable, versioned ``GatewayConfig``. ``reload_config`` and the
+    watcher started by ``watch_config`` publish a new generation with a single reference
+    swap, so the request path never takes a lock.
+    """
 
     def __init__(
         self,
@@ -76,27 +102,372 @@ class SecureWebGateway:
         tls_inspector: TLSMetadataInspector | None = None,
         cloud_app_detector: CloudAppDetector | None = None,
         log_forwarder: LogForwarder | None = None,
+        log_policy: LogPolicy | None = None,
+        admission: AdmissionController | None = None,
+        slow_requests: SlowRequestLog | None = None,
+        memory_budget: MemoryBudget | None = None,
+        snapshot_path: str | Path | None = None,
+        config_dir: str | Path | None = None,
+        posture_feed: str | Path | None = None,
     ):
-        self.categorizer = categorizer or load_default_categorizer()
-        self.dns_filter = dns_filter or load_default_dns_filter()
-        self.token_validator = token_validator or ZTNATokenValidator()
-        self.device_trust = device_trust or DeviceTrust()
-        self.policy_engine = policy_engine or PolicyEngine(
-            policy_path=self._config_path("policies.yaml"),
-            token_validator=self.token_validator,
+        self._overrides = {
+            name: engine
+            for name, engine in (
+                ("categorizer", categorizer),
+                ("dns_filter", dns_filter),
+                ("token_validator", token_validator),
+                ("policy_engine", policy_engine),
+            )
+            if engine is not None
+        }
+        self._device_trust = device_trust
+        self._posture_feed = posture_feed
+        self._tls_inspector = tls_inspector
+        self._cloud_app_detector = cloud_app_detector
+        self._log_forwarder = log_forwarder
+        self._log_policy = log_policy
+        if log_policy is not None:
+            log_policy.start(self._emit_logs)
+        self.admission = admission
+        if slow_requests is None:
+            from gateway.profiling import SlowRequestLog
+
+            slow_requests = SlowRequestLog.from_env()
+        self.slow_requests = slow_requests
+        if memory_budget is None:
+            from gateway.memory import MemoryBudget
+
+            memory_budget = MemoryBudget.from_env()
+        self.memory_budget = memory_budget
+        self._memory: MemoryAccountant | None = None
+        self._diagnostics: DiagnosticsAgent | None = None
+        snapshot_path = snapshot_path or os.environ.get(SNAPSHOT_ENV_VAR)
+        self._snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self._config_dir = Path(config_dir) if config_dir else None
+        self._config: GatewayConfig | None = None
+        self._watcher: ConfigWatcher | None = None
+        if memory_budget is not None:
+            # With a budget, generation 1 is built and checked now: a "refuse" budget
+            # stops the gateway at startup rather than failing its first request.
+            self._config = self._first_config()
+
+    @property
+    def config(self) -> GatewayConfig:
+        """The configuration generation new requests are served from."""
+
+        config = self._config
+        if config is None:
+            config = self._config = self._first_config()
+        return config
+
+    def _first_config(self) -> GatewayConfig:
+        """Build generation 1, checked against ``memory_budget`` like any later one."""
+
+        from auth.signed_tokens import key_ring_stamp
+        from gateway.config_snapshot import CONFIG_DIR, content_hash
+        from gateway.config_watcher import GatewayConfig
+        from gateway.domain_db import domain_db_stamp
+
+        config_dir = self._config_dir or CONFIG_DIR
+        snapshot = None
+        if self._snapshot_path is not None:
+            snapshot = self._load_snapshot(self._snapshot_path, config_dir)
+        config = GatewayConfig(
+            version=1,
             device_trust=self.device_trust,
+            snapshot=snapshot,
+            config_dir=config_dir,
+            overrides=self._overrides,
+            source_hash=content_hash(config_dir) if snapshot is None else None,
+            domain_db_stamp=domain_db_stamp(),
+            key_ring_stamp=key_ring_stamp(),
+        )
+        if self.memory_budget is not None:
+            from gateway.memory import check_config
+
+            check_config(config.warm(), self.memory_budget)
+        return config
+
+    @staticmethod
+    def _load_snapshot(path: Path, config_dir: Path) -> ConfigSnapshot:
+        """Load ``path``, recompiling from ``config_dir`` if the sources have moved on.
+
+        A snapshot shipped without its sources (none of them exist) is trusted as is.
+        """
+
+        from gateway.config_snapshot import compile_snapshot, load_snapshot, source_paths
+
+        if not any(source.exists() for source in source_paths(config_dir)):
+            return load_snapshot(path)
+        try:
+            return load_snapshot(path, verify_sources=config_dir)
+        except ValueError as exc:
+            logger.warning(
+                "Config snapshot is stale; compiling sources instead",
+                extra={"error": str(exc), "path": str(path), "config_dir": str(config_dir)},
+            )
+            return compile_snapshot(config_dir)
+
+    def publish_config(self, snapshot: ConfigSnapshot) -> GatewayConfig:
+        """Build the next configuration generation from ``snapshot`` and swap it in.
+
+        Engines are built before the swap so no request pays for the rebuild; requests
+        already in flight keep the generation they started with. With a ``memory_budget``
+        the new generation is measured first, and a ``refuse`` budget raises
+        ``MemoryBudgetExceeded`` instead of publishing it.
+        """
+
+        from auth.signed_tokens import key_ring_stamp
+        from gateway.domain_db import domain_db_stamp
+
+        current = self.config
+        if (
+            snapshot.content_hash == current.content_hash
+            and domain_db_stamp() == current.domain_db_stamp
+            and key_ring_stamp() == current.key_ring_stamp
+        ):
+            return current
+        config = current.successor(snapshot).warm()
+        if self.memory_budget is not None:
+            from gateway.memory import check_config
+
+            check_config(config, self.memory_budget)
+        self._config = config
+        logger.info(
+            "Gateway configuration published",
+            extra={"config_version": config.version, "content_hash": snapshot.content_hash},
         )
-        self.tls_inspector = tls_inspector or TLSMetadataInspector()
-        self.cloud_app_detector = cloud_app_detector or CloudAppDetector()
-        self.log_forwarder = log_forwarder or LogForwarder()
+        return config
+
+    def reload_config(self) -> GatewayConfig:
+        """Recompile every configuration source and publish the result."""
+
+        from gateway.config_snapshot import compile_snapshot
+
+        return self.publish_config(compile_snapshot(self.config.config_dir))
+
+    def watch_config(self, interval: float = 2.0) -> ConfigWatcher:
+        """Start a background watcher that publishes configuration changes as they land."""
+
+        if self._watcher is None:
+            from gateway.config_watcher import ConfigWatcher
+
+            self._watcher = ConfigWatcher(
+                self.publish_config, config_dir=self.config.config_dir, interval=interval
+            )
+        return self._watcher.start()
+
+    def stop_watching(self) -> None:
+        if self._watcher is not None:
+            self._watcher.stop()
+
+    @property
+    def memory(self) -> MemoryAccountant:
+        if self._memory is None:
+            from gateway.memory import MemoryAccountant
+
+            self._memory = MemoryAccountant(self, self.memory_budget)
+        return self._memory
+
+    def memory_report(self) -> dict[str, Any]:
+        """Measure every component now, applying cache budgets; see ``gateway.memory``."""
+
+        return self.memory.report()
+
+    def serve_diagnostics(
+        self,
+        directory: str | Path | None = None,
+        interval: float = 1.0,
+        memory_interval: float = 30.0,
+    ) -> DiagnosticsAgent:
+        """Follow profiler commands from the control plane and publish diagnostics.
+
+        ``directory`` defaults to ``$SWG_DEBUG_DIR``. A slow-request log with the default
+        threshold is created if the gateway was built without one. The memory report is
+        refreshed every ``memory_interval`` seconds.
+        """
+
+        if self._diagnostics is None:
+            from gateway.profiling import DiagnosticsAgent, SlowRequestLog, debug_dir
 
-    def _config_path(self, name: str) -> Path:
-        return Path(__file__).resolve().parents[1] / "config" / name
+            if self.slow_requests is None:
+                self.slow_requests = SlowRequestLog()
+            self._diagnostics = DiagnosticsAgent(
+                directory or debug_dir(),
+                self.slow_requests,
+                interval=interval,
+                memory=self.memory_report,
+                memory_interval=memory_interval,
+            )
+        return self._diagnostics.start()
+
+    def stop_diagnostics(self) -> None:
+        if self._diagnostics is not None:
+            self._diagnostics.stop()
+
+    @property
+    def categorizer(self) -> URLCategorizer:
+        return self.config.categorizer
+
+    @property
+    def dns_filter(self) -> DNSFilter:
+        return self.config.dns_filter
+
+    @property
+    def token_validator(self) -> ZTNATokenValidator:
+        return self.config.token_validator
+
+    @property
+    def policy_engine(self) -> PolicyEngine:
+        return self.config.policy_engine
+
+    @property
+    def device_trust(self) -> DeviceTrust:
+        if self._device_trust is None:
+            from auth.device_trust import DeviceTrust, PostureRegistry
+
+            registry = None
+            if self._posture_feed is not None:
+                registry = PostureRegistry()
+                feed = str(self._posture_feed)
+                if feed.startswith(("http://", "https://")):
+                    registry.load_feed(feed)
+                else:
+                    registry.follow(Path(feed))
+            self._device_trust = DeviceTrust(registry=registry)
+        return self._device_trust
+
+    @property
+    def tls_inspector(self) -> TLSMetadataInspector:
+        if self._tls_inspector is None:
+            from gateway.tls_metadata_inspector import TLSMetadataInspector
+
+            self._tls_inspector = TLSMetadataInspector()
+        return self._tls_inspector
+
+    @property
+    def cloud_app_detector(self) -> CloudAppDetector:
+        if self._cloud_app_detector is None:
+            from casb.cloud_app_detector import CloudAppDetector
+
+            self._cloud_app_detector = CloudAppDetector()
+        return self._cloud_app_detector
+
+    @property
+    def log_forwarder(self) -> LogForwarder:
+        if self._log_forwarder is None:
+            from siem.log_forwarder import LogForwarder
+
+            self._log_forwarder = LogForwarder()
+        return self._log_forwarder
+
+    @property
+    def log_policy(self) -> LogPolicy:
+        """Which records are logged; ``$SWG_LOG_POLICY`` selects it (default ``full``)."""
+
+        if self._log_policy is None:
+            from siem.log_policy import LOG_POLICY_ENV_VAR, LogPolicy
+
+            spec = os.environ.get(LOG_POLICY_ENV_VAR) or "full"
+            self._log_policy = LogPolicy.from_spec(spec).start(self._emit_logs)
+        return self._log_policy
+
+    def flush_logs(self) -> None:
+        """Emit any aggregate summaries the log policy is still holding."""
+
+        if self._log_policy is not None:
+            self._emit_logs(self._log_policy.flush())
+
+    def _emit_logs(self, records: list[dict[str, Any]]) -> None:
+        for record in records:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(json.dumps(record))
+            self.log_forwarder.forward(record)
 
     def process_request(self, request: Mapping[str, Any]) -> ProxyResult:
-        """Process a proxy request through DNS, policy, CASB, and DLP checks."""
+        """Process a proxy request through DNS, policy, CASB, and DLP checks.
 
+        With an ``admission`` controller the request must be admitted first; refused
+        requests are logged and returned as blocked without running the pipeline.
+        Requests slower than the ``slow_requests`` threshold are recorded there.
+        """
+
+        started = time.perf_counter()
+        config = self.config
         proxy_request = ProxyRequest.from_mapping(request)
+        result = self._admit(proxy_request, config, started)
+        slow_requests = self.slow_requests
+        if slow_requests is not None:
+            slow_requests.observe(proxy_request, result)
+        return result
+
+    def _admit(
+        self, proxy_request: ProxyRequest, config: GatewayConfig, started: float
+    ) -> ProxyResult:
+        admission = self.admission
+        if admission is None:
+            return self._inspect(proxy_request, config, started)
+
+        user = config.token_validator.validate(proxy_request.token).user
+        body = proxy_request.body or b""
+        # The budget is in bytes; a str body is counted as the UTF-8 it arrived as.
+        ticket = admission.acquire(user, len(body.encode() if isinstance(body, str) else body))
+        if not ticket.admitted:
+            return self._refuse(proxy_request, config, user, ticket, started)
+        try:
+            result = self._inspect(proxy_request, config, started)
+        finally:
+            admission.release(ticket)
+        result.timings["queue"] = ticket.queue_delay
+        return result
+
+    def _refuse(
+        self,
+        proxy_request: ProxyRequest,
+        config: GatewayConfig,
+        user: str | None,
+        ticket: AdmissionTicket,
+        started: float,
+    ) -> ProxyResult:
+        from auth.device_trust import UNKNOWN_POSTURE_SCORE, DevicePosture
+        from gateway.policy_engine import PolicyDecision
+
+        verb = "shed" if ticket.action == "shed" else "blocked"
+        reasons = [f"{verb} by admission control: {ticket.reason}"]
+        device = DevicePosture(
+            device_id=str(proxy_request.device.get("device_id", "unknown")),
+            healthy=False,
+            posture_score=UNKNOWN_POSTURE_SCORE,
+        )
+        log_record = {
+            "user": user,
+            "domain": urlparse(proxy_request.url).hostname or "",
+            "url": proxy_request.url,
+            "method": proxy_request.method,
+            "timestamp": time.time(),
+            "categories": [],
+            "allowed": False,
+            "reasons": reasons,
+            "config_version": config.version,
+        }
+        self._emit_logs(self.log_policy.apply(log_record))
+        return ProxyResult(
+            allowed=False,
+            decision=PolicyDecision(
+                allowed=False, reasons=reasons, categories=set(), user=user, device=device
+            ),
+            casb_action="unknown",
+            dlp_action="unknown",
+            tls_metadata={},
+            log_record=log_record,
+            timings={"total": time.perf_counter() - started},
+            shed=ticket.action == "shed",
+        )
+
+    def _inspect(
+        self, proxy_request: ProxyRequest, config: GatewayConfig, started: float
+    ) -> ProxyResult:
+        clock = time.perf_counter
         parsed = urlparse(proxy_request.url)
         reasons: list[str] = []
 
@@ -109,34 +480,43 @@ class SecureWebGateway:
 
         domain = parsed.hostname or ""
         path = parsed.path or "/"
+        parsed_at = clock()
 
         dns_decision = (
-            self.dns_filter.decision(domain)
+            config.dns_filter.decision(domain)
             if domain
             else {"blocked": False, "reason": "no domain"}
         )
+        dns_at = clock()
         categories = (
-            self.categorizer.categorize(proxy_request.url)
+            config.categorizer.categorize(proxy_request.url)
             if proxy_request.url
             else {"Uncategorized"}
         )
-        tls_metadata = self.tls_inspector.inspect(server_name=domain).__dict__
+        categorized_at = clock()
+        tls_metadata = self.tls_inspector.inspect(
+            server_name=domain, client_hello=proxy_request.client_hello
+        ).__dict__
+        tls_at = clock()
 
         dlp_result: DLPInspectionResult = (
             inspect_payload(proxy_request.body or "")
             if proxy_request.method.upper() == "POST"
             else DLPInspectionResult([], "allow", False)
         )
+        dlp_at = clock()
         casb_detection = self.cloud_app_detector.detect(domain, path)
         casb_violations = evaluate_activity(proxy_request.url)
         casb_action = "block" if casb_violations else casb_detection.action
+        casb_at = clock()
 
-        decision = self.policy_engine.evaluate(
+        decision = config.policy_engine.evaluate(
             token=proxy_request.token,
             domain=domain,
             categories=categories,
             device_context=proxy_request.device,
         )
+        policy_at = clock()
 
         if dns_decision.get("blocked"):
             reason = dns_decision.get("reason", "blocked by DNS")
@@ -155,6 +535,7 @@ class SecureWebGateway:
             "domain": domain,
             "url": proxy_request.url,
             "method": proxy_request.method,
+            "timestamp": time.time(),
             "categories": list(categories),
             "allowed": allowed,
             "reasons": reasons,
@@ -166,9 +547,10 @@ class SecureWebGateway:
             },
             "device": decision.device.__dict__,
             "tls": tls_metadata,
+            "config_version": config.version,
         }
-        logger.info(json.dumps(log_record))
-        self.log_forwarder.forward(log_record)
+        self._emit_logs(self.log_policy.apply(log_record))
+        finished = clock()
 
         return ProxyResult(
             allowed=allowed,
@@ -177,10 +559,24 @@ class SecureWebGateway:
             dlp_action=dlp_result.action,
             tls_metadata=tls_metadata,
             log_record=log_record,
+            timings={
+                "parse": parsed_at - started,
+                "dns": dns_at - parsed_at,
+                "categorize": categorized_at - dns_at,
+                "tls": tls_at - categorized_at,
+                "dlp": dlp_at - tls_at,
+                "casb": casb_at - dlp_at,
+                "policy": policy_at - casb_at,
+                "log": finished - policy_at,
+                "total": finished - started,
+            },
         )
 
 
 if __name__ == "__main__":
+    from logging_config import configure_logging
+
+    configure_logging()
     gateway = SecureWebGateway()
     sample_request = {
         "url": "https://drive.google.com/upload/doc",
@@ -0,0 +1,285 @@
+"""Offline replay of recorded traffic through ``SecureWebGateway``.
+
+Replays either normalized ``gateway.log`` records or a request capture (JSON lines of
+``{"request": {...}, "allowed": ..., "reasons": [...]}``) across a process pool, then
+reports throughput, per-stage latency percentiles, and verdicts that differ from the
+recorded ones::
+
+    python -m gateway.replay streamlit_logs/gateway.log --workers 4
+    python -m gateway.replay capture.jsonl --speed 10 --json
+
+Input is streamed and only a bounded window of batches is in flight, so captures of any
+size replay in constant memory. Replayed events are forwarded to ``os.devnull``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from gateway.latency import LatencyHistogram
+
+STAGES: tuple[str, ...] = (
+    "parse",
+    "dns",
+    "categorize",
+    "tls",
+    "dlp",
+    "casb",
+    "policy",
+    "log",
+    "total",
+)
+MAX_MISMATCH_SAMPLES = 20
+
+
+@dataclass(frozen=True)
+class ReplayItem:
+    """A request to replay and the verdict recorded for it, if any."""
+
+    request: dict[str, Any]
+    expected_allowed: bool | None = None
+    expected_reasons: tuple[str, ...] | None = None
+    timestamp: float | None = None
+
+
+@dataclass
+class ReplayReport:
+    """Aggregated outcome of a replay run."""
+
+    requests: int = 0
+    elapsed: float = 0.0
+    mismatches: int = 0
+    mismatch_samples: list[dict[str, Any]] = field(default_factory=list)
+    latencies: dict[str, LatencyHistogram] = field(
+        default_factory=lambda: {stage: LatencyHistogram() for stage in STAGES}
+    )
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "elapsed_s": round(self.elapsed, 3),
+            "throughput_rps": round(self.throughput, 1),
+            "mismatches": self.mismatches,
+            "mismatch_samples": self.mismatch_samples,
+            "latency_ms": {
+                stage: {
+                    "p50": round(histogram.percentile(0.50) * 1000, 4),
+                    "p90": round(histogram.percentile(0.90) * 1000, 4),
+                    "p99": round(histogram.percentile(0.99) * 1000, 4),
+                    "max": round(histogram.maximum * 1000, 4),
+                }
+                for stage, histogram in self.latencies.items()
+            },
+        }
+
+
+def _item_from_record(record: dict[str, Any], tokens_by_user: dict[str, str]) -> ReplayItem:
+    if "request" in record:
+        reasons = record.get("reasons")
+        return ReplayItem(
+            request=record["request"],
+            expected_allowed=record.get("allowed"),
+            expected_reasons=tuple(reasons) if reasons is not None else None,
+            timestamp=record.get("timestamp"),
+        )
+    # Normalized gateway.log record: tokens and bodies are not logged, so the token is
+    # re-derived from the user and POST bodies replay empty.
+    request = {
+        "url": record.get("url") or "",
+        "method": record.get("method") or "GET",
+        "token": tokens_by_user.get(record.get("user") or ""),
+        "device": record.get("device") or {},
+    }
+    return ReplayItem(
+        request=request,
+        expected_allowed=record.get("allowed"),
+        expected_reasons=tuple(record.get("reasons") or ()),
+        timestamp=record.get("timestamp"),
+    )
+
+
+def iter_records(path: Path) -> Iterator[dict[str, Any]]:
+    """Stream records from a JSON-lines or binary-encoded log, skipping unparseable lines."""
+
+    from siem.codec import read_records
+
+    return read_records(path)
+
+
+def iter_items(
+    records: Iterable[dict[str, Any]], tokens_by_user: dict[str, str]
+) -> Iterator[ReplayItem]:
+    for record in records:
+        # Aggregate summaries (siem.log_policy) stand for many requests but carry no URL.
+        if "summary" in record:
+            continue
+        yield _item_from_record(record, tokens_by_user)
+
+
+_worker_gateway: Any = None
+
+
+def _init_worker(config_dir: str | None, snapshot_path: str | None) -> None:
+    global _worker_gateway
+    from gateway.proxy import SecureWebGateway
+    from siem.log_forwarder import LogForwarder
+
+    _worker_gateway = SecureWebGateway(
+        config_dir=config_dir,
+        snapshot_path=snapshot_path,
+        log_forwarder=LogForwarder(destination=Path(os.devnull)),
+    )
+
+
+def _replay_batch(items: list[ReplayItem]) -> list[tuple[dict[str, float], dict[str, Any] | None]]:
+    results: list[tuple[dict[str, float], dict[str, Any] | None]] = []
+    for item in items:
+        result = _worker_gateway.process_request(item.request)
+        mismatch = None
+        reasons = tuple(result.log_record["reasons"])
+        if (item.expected_allowed is not None and item.expected_allowed != result.allowed) or (
+            item.expected_reasons is not None and set(item.expected_reasons) != set(reasons)
+        ):
+            mismatch = {
+                "url": item.request.get("url"),
+                "expected": {"allowed": item.expected_allowed, "reasons": item.expected_reasons},
+                "actual": {"allowed": result.allowed, "reasons": reasons},
+            }
+        results.append((result.timings, mismatch))
+    return results
+
+
+def _batches(items: Iterable[ReplayItem], size: int) -> Iterator[list[ReplayItem]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def replay(
+    items: Iterable[ReplayItem],
+    *,
+    workers: int = os.cpu_count() or 1,
+    batch_size: int = 64,
+    rate: float | None = None,
+    speed: float | None = None,
+    config_dir: str | None = None,
+    snapshot_path: str | None = None,
+) -> ReplayReport:
+    """Replay ``items`` through gateways in a process pool.
+
+    Args:
+        items: Requests to replay; consumed lazily.
+        workers: Worker processes, each with its own gateway.
+        batch_size: Requests sent to a worker per task.
+        rate: Target requests per second overall; ``None`` replays as fast as possible.
+        speed: Time-scale factor for recorded timestamps (``2.0`` replays twice as fast
+            as recorded). Ignored for items without timestamps.
+        config_dir: Configuration directory the gateways load (defaults to ``config/``).
+        snapshot_path: Precompiled snapshot to load instead of ``config_dir``.
+    """
+
+    report = ReplayReport()
+    window = max(2, workers * 2)
+    pending: set[Future] = set()
+    dispatched = 0
+    first_recorded: float | None = None
+
+    def collect(done: Iterable[Future]) -> None:
+        for future in done:
+            for timings, mismatch in future.result():
+                report.requests += 1
+                for stage, seconds in timings.items():
+                    report.latencies.setdefault(stage, LatencyHistogram()).add(seconds)
+                if mismatch is not None:
+                    report.mismatches += 1
+                    if len(report.mismatch_samples) < MAX_MISMATCH_SAMPLES:
+                        report.mismatch_samples.append(mismatch)
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(config_dir, snapshot_path)
+    ) as pool:
+        for batch in _batches(items, batch_size):
+            due: float | None = None
+            if rate:
+                due = started + dispatched / rate
+            elif speed and batch[0].timestamp is not None:
+                first_recorded = (
+                    first_recorded if first_recorded is not None else batch[0].timestamp
+                )
+                due = started + (batch[0].timestamp - first_recorded) / speed
+            if due is not None and (delay := due - time.perf_counter()) > 0:
+                time.sleep(delay)
+
+            pending.add(pool.submit(_replay_batch, batch))
+            dispatched += len(batch)
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(wait(pending).done)
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Replay recorded traffic through the gateway.",
+    )
+    parser.add_argument("input", type=Path, help="gateway.log or a JSON-lines request capture")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    pacing = parser.add_mutually_exclusive_group()
+    pacing.add_argument("--rate", type=float, help="requests per second (default: max)")
+    pacing.add_argument("--speed", type=float, help="time-scale factor for recorded timestamps")
+    parser.add_argument("--config-dir")
+    parser.add_argument("--snapshot")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    from auth.ztna_token_validator import tokens_from_policy
+    from gateway.config_snapshot import CONFIG_DIR
+    from gateway.policy_engine import load_policy_document
+
+    config_dir = Path(args.config_dir) if args.config_dir else CONFIG_DIR
+    tokens_by_user = tokens_from_policy(load_policy_document(config_dir / "policies.yaml"))
+
+    report = replay(
+        iter_items(iter_records(args.input), tokens_by_user),
+        workers=args.workers,
+        batch_size=args.batch_size,
+        rate=args.rate,
+        speed=args.speed,
+        config_dir=args.config_dir,
+        snapshot_path=args.snapshot,
+    )
+    summary = report.as_dict()
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(
+        f"{summary['requests']} requests in {summary['elapsed_s']}s "
+        f"({summary['throughput_rps']} req/s), {summary['mismatches']} verdict mismatches"
+    )
+    for stage, latency in summary["latency_ms"].items():
+        print(
+            f"  {stage:>10}: p50={latency['p50']:.3f}ms p90={latency['p90']:.3f}ms "
+            f"p99={latency['p99']:.3f}ms max={latency['max']:.3f}ms"
+        )
+    for sample in summary["mismatch_samples"]:
+        print(f"  mismatch {sample['url']}: {sample['expected']} -> {sample['actual']}")
+
+
+if __name__ == "__main__":
+    main()
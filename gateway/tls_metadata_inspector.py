@@ -2,8 +2,51 @@
 
 from __future__ import annotations
 
+import hashlib
+import logging
+import struct
+from collections import OrderedDict
 from dataclasses import dataclass
 
+logger = logging.getLogger(__name__)
+
+RECORD_HANDSHAKE = 0x16
+HANDSHAKE_CLIENT_HELLO = 0x01
+
+EXT_SERVER_NAME = 0x0000
+EXT_SUPPORTED_GROUPS = 0x000A
+EXT_EC_POINT_FORMATS = 0x000B
+EXT_SIGNATURE_ALGORITHMS = 0x000D
+EXT_ALPN = 0x0010
+EXT_SUPPORTED_VERSIONS = 0x002B
+
+TLS_VERSION_NAMES = {
+    0x0300: "SSLv3",
+    0x0301: "TLSv1.0",
+    0x0302: "TLSv1.1",
+    0x0303: "TLSv1.2",
+    0x0304: "TLSv1.3",
+}
+JA4_VERSION_CODES = {0x0300: "s3", 0x0301: "10", 0x0302: "11", 0x0303: "12", 0x0304: "13"}
+CIPHER_SUITE_NAMES = {
+    0x1301: "TLS_AES_128_GCM_SHA256",
+    0x1302: "TLS_AES_256_GCM_SHA384",
+    0x1303: "TLS_CHACHA20_POLY1305_SHA256",
+    0xC02B: "TLS_ECDHE_ECDSA_WITH_AES_128_GCM_SHA256",
+    0xC02F: "TLS_ECDHE_RSA_WITH_AES_128_GCM_SHA256",
+    0xC02C: "TLS_ECDHE_ECDSA_WITH_AES_256_GCM_SHA384",
+    0xC030: "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384",
+    0xCCA9: "TLS_ECDHE_ECDSA_WITH_CHACHA20_POLY1305_SHA256",
+    0xCCA8: "TLS_ECDHE_RSA_WITH_CHACHA20_POLY1305_SHA256",
+}
+
+_U16 = struct.Struct("!H")
+_EXT_HEADER = struct.Struct("!HH")
+
+
+class ClientHelloError(ValueError):
+    """Raised when bytes are not a well-formed TLS ClientHello."""
+
 
 @dataclass(frozen=True)
 class TLSMetadata:
@@ -12,12 +55,302 @@ class TLSMetadata:
     server_name: str
     tls_version: str
     cipher_suite: str
+    alpn: tuple[str, ...] = ()
+    ja3: str | None = None
+    ja4: str | None = None
+    error: str | None = None
+
+
+@dataclass(frozen=True)
+class ClientHello:
+    """Fields extracted from a ClientHello, in the order the client offered them."""
+
+    legacy_version: int
+    server_name: str | None
+    supported_versions: tuple[int, ...]
+    cipher_suites: tuple[int, ...]
+    extensions: tuple[int, ...]
+    supported_groups: tuple[int, ...]
+    ec_point_formats: tuple[int, ...]
+    signature_algorithms: tuple[int, ...]
+    alpn: tuple[str, ...]
+
+    @property
+    def max_version(self) -> int:
+        offered = [v for v in self.supported_versions if not is_grease(v)]
+        return max(offered) if offered else self.legacy_version
+
+
+@dataclass(frozen=True)
+class TLSFingerprint:
+    """JA3 and JA4 fingerprints with the raw JA3 string they were derived from."""
+
+    ja3: str
+    ja3_string: str
+    ja4: str
+
+
+def is_grease(value: int) -> bool:
+    """Return True for RFC 8701 GREASE values, which fingerprints must ignore."""
+
+    return (value & 0x0F0F) == 0x0A0A and (value >> 8) == (value & 0xFF)
+
+
+def _u16_list(buf: memoryview, offset: int, length: int) -> tuple[int, ...]:
+    if length % 2:
+        raise ClientHelloError("odd-length 16-bit list")
+    return struct.unpack_from(f"!{length // 2}H", buf, offset)
+
+
+def _check(end: int, limit: int, what: str) -> None:
+    if end > limit:
+        raise ClientHelloError(f"truncated {what}")
+
+
+def parse_client_hello(data: bytes | bytearray | memoryview | str) -> ClientHello:
+    """Parse a ClientHello from a TLS record or a bare handshake message.
+
+    A ``str`` is read as hex, the form a ClientHello takes in a JSON request mapping.
+
+    Every length field is checked against its enclosing structure before it is read, so
+    truncated or hostile input raises ``ClientHelloError`` instead of reading past the
+    buffer. Fields are decoded directly from a ``memoryview``; only the decoded values
+    (integers and the SNI/ALPN strings) are materialised.
+
+    Raises:
+        ClientHelloError: If the data is not a complete, well-formed ClientHello.
+    """
+
+    if isinstance(data, str):
+        try:
+            data = bytes.fromhex(data)
+        except ValueError as exc:
+            raise ClientHelloError("ClientHello string is not hex") from exc
+    elif not isinstance(data, (bytes, bytearray, memoryview)):
+        raise ClientHelloError(f"ClientHello must be bytes, not {type(data).__name__}")
+    buf = memoryview(data)
+    limit = len(buf)
+    pos = 0
+    if limit >= 5 and buf[0] == RECORD_HANDSHAKE:
+        record_length = _U16.unpack_from(buf, 3)[0]
+        _check(5 + record_length, limit, "record")
+        pos, limit = 5, 5 + record_length
+
+    _check(pos + 4, limit, "handshake header")
+    if buf[pos] != HANDSHAKE_CLIENT_HELLO:
+        raise ClientHelloError(f"handshake type {buf[pos]} is not ClientHello")
+    body_length = (buf[pos + 1] << 16) | _U16.unpack_from(buf, pos + 2)[0]
+    pos += 4
+    _check(pos + body_length, limit, "ClientHello body")
+    limit = pos + body_length
+
+    _check(pos + 35, limit, "version and random")
+    legacy_version = _U16.unpack_from(buf, pos)[0]
+    pos += 34
+    session_length = buf[pos]
+    pos += 1 + session_length
+    _check(pos + 2, limit, "session id")
+
+    cipher_length = _U16.unpack_from(buf, pos)[0]
+    pos += 2
+    _check(pos + cipher_length, limit, "cipher suites")
+    cipher_suites = _u16_list(buf, pos, cipher_length)
+    pos += cipher_length
+
+    _check(pos + 1, limit, "compression methods")
+    pos += 1 + buf[pos]
+    _check(pos, limit, "compression methods")
+
+    server_name: str | None = None
+    extensions: list[int] = []
+    supported_versions: tuple[int, ...] = ()
+    supported_groups: tuple[int, ...] = ()
+    ec_point_formats: tuple[int, ...] = ()
+    signature_algorithms: tuple[int, ...] = ()
+    alpn: list[str] = []
+
+    if pos < limit:
+        _check(pos + 2, limit, "extensions length")
+        extensions_end = pos + 2 + _U16.unpack_from(buf, pos)[0]
+        _check(extensions_end, limit, "extensions")
+        pos += 2
+        while pos < extensions_end:
+            # Bounds checks are inlined in this loop: it runs once per extension.
+            if pos + 4 > extensions_end:
+                raise ClientHelloError("truncated extension header")
+            ext_type, ext_length = _EXT_HEADER.unpack_from(buf, pos)
+            pos += 4
+            ext_end = pos + ext_length
+            if ext_end > extensions_end:
+                raise ClientHelloError("truncated extension body")
+            extensions.append(ext_type)
+
+            if ext_type == EXT_SERVER_NAME and ext_length >= 5:
+                name_length = _U16.unpack_from(buf, pos + 3)[0]
+                _check(pos + 5 + name_length, ext_end, "server name")
+                if buf[pos + 2] == 0:
+                    server_name = str(buf[pos + 5 : pos + 5 + name_length], "ascii", "replace")
+            elif ext_type == EXT_SUPPORTED_VERSIONS and ext_length >= 1:
+                _check(pos + 1 + buf[pos], ext_end, "supported versions")
+                supported_versions = _u16_list(buf, pos + 1, buf[pos])
+            elif ext_type == EXT_SUPPORTED_GROUPS and ext_length >= 2:
+                list_length = _U16.unpack_from(buf, pos)[0]
+                _check(pos + 2 + list_length, ext_end, "supported groups")
+                supported_groups = _u16_list(buf, pos + 2, list_length)
+            elif ext_type == EXT_EC_POINT_FORMATS and ext_length >= 1:
+                _check(pos + 1 + buf[pos], ext_end, "point formats")
+                ec_point_formats = tuple(buf[pos + 1 : pos + 1 + buf[pos]])
+            elif ext_type == EXT_SIGNATURE_ALGORITHMS and ext_length >= 2:
+                list_length = _U16.unpack_from(buf, pos)[0]
+                _check(pos + 2 + list_length, ext_end, "signature algorithms")
+                signature_algorithms = _u16_list(buf, pos + 2, list_length)
+            elif ext_type == EXT_ALPN and ext_length >= 2:
+                cursor = pos + 2
+                alpn_end = cursor + _U16.unpack_from(buf, pos)[0]
+                _check(alpn_end, ext_end, "ALPN list")
+                while cursor < alpn_end:
+                    proto_end = cursor + 1 + buf[cursor]
+                    _check(proto_end, alpn_end, "ALPN protocol")
+                    alpn.append(str(buf[cursor + 1 : proto_end], "ascii", "replace"))
+                    cursor = proto_end
+            pos = ext_end
+
+    return ClientHello(
+        legacy_version=legacy_version,
+        server_name=server_name,
+        supported_versions=supported_versions,
+        cipher_suites=cipher_suites,
+        extensions=tuple(extensions),
+        supported_groups=supported_groups,
+        ec_point_formats=ec_point_formats,
+        signature_algorithms=signature_algorithms,
+        alpn=tuple(alpn),
+    )
+
+
+def _dash(values: tuple[int, ...]) -> str:
+    return "-".join(str(value) for value in values if not is_grease(value))
+
+
+def _truncated_sha256(text: str) -> str:
+    if not text:
+        return "000000000000"
+    return hashlib.sha256(text.encode("ascii")).hexdigest()[:12]
+
+
+def compute_fingerprint(hello: ClientHello) -> TLSFingerprint:
+    """Compute JA3 and JA4 (TLS over TCP) fingerprints for a parsed ClientHello."""
+
+    ja3_string = ",".join(
+        (
+            str(hello.legacy_version),
+            _dash(hello.cipher_suites),
+            _dash(hello.extensions),
+            _dash(hello.supported_groups),
+            "-".join(str(value) for value in hello.ec_point_formats),
+        )
+    )
+    ja3 = hashlib.md5(ja3_string.encode("ascii"), usedforsecurity=False).hexdigest()
+
+    ciphers = [value for value in hello.cipher_suites if not is_grease(value)]
+    extensions = [value for value in hello.extensions if not is_grease(value)]
+    first_alpn = hello.alpn[0] if hello.alpn else ""
+    ja4_a = "t{}{}{:02d}{:02d}{}".format(
+        JA4_VERSION_CODES.get(hello.max_version, "00"),
+        "d" if hello.server_name else "i",
+        min(len(ciphers), 99),
+        min(len(extensions), 99),
+        (first_alpn[0] + first_alpn[-1]) if first_alpn else "00",
+    )
+    ja4_b = _truncated_sha256(",".join(f"{value:04x}" for value in sorted(ciphers)))
+    hashed_extensions = ",".join(
+        f"{value:04x}" for value in sorted(extensions) if value not in (EXT_SERVER_NAME, EXT_ALPN)
+    )
+    signatures = ",".join(
+        f"{value:04x}" for value in hello.signature_algorithms if not is_grease(value)
+    )
+    ja4_c = _truncated_sha256(
+        f"{hashed_extensions}_{signatures}" if signatures else hashed_extensions
+    )
+    return TLSFingerprint(ja3=ja3, ja3_string=ja3_string, ja4=f"{ja4_a}_{ja4_b}_{ja4_c}")
 
 
 class TLSMetadataInspector:
-    """Simulates TLS ClientHello metadata inspection without decrypting payloads."""
+    """Extracts TLS ClientHello metadata and fingerprints without decrypting payloads.
+
+    Fingerprints are cached by the fingerprint-relevant fields of the hello, so the hashing
+    work is paid once per distinct client stack rather than once per connection.
+    """
+
+    def __init__(self, fingerprint_cache_size: int = 4096):
+        self.fingerprint_cache_size = fingerprint_cache_size
+        self._fingerprints: OrderedDict[tuple, TLSFingerprint] = OrderedDict()
+
+    def fingerprint(self, hello: ClientHello) -> TLSFingerprint:
+        key = (
+            hello.legacy_version,
+            hello.max_version,
+            hello.server_name is not None,
+            hello.cipher_suites,
+            hello.extensions,
+            hello.supported_groups,
+            hello.ec_point_formats,
+            hello.signature_algorithms,
+            hello.alpn[:1],
+        )
+        cached = self._fingerprints.get(key)
+        if cached is not None:
+            try:
+                self._fingerprints.move_to_end(key)
+            except KeyError:  # evicted by a concurrent request; the value is still valid
+                pass
+            return cached
+        fingerprint = compute_fingerprint(hello)
+        self._fingerprints[key] = fingerprint
+        while len(self._fingerprints) > self.fingerprint_cache_size:
+            try:
+                self._fingerprints.popitem(last=False)
+            except KeyError:
+                break
+        return fingerprint
+
+    def inspect(
+        self,
+        server_name: str = "",
+        tls_version: str | None = None,
+        client_hello: bytes | str | None = None,
+    ) -> TLSMetadata:
+        """Describe a connection from its raw ClientHello, or from the SNI alone."""
+
+        if not client_hello:
+            return TLSMetadata(
+                server_name=server_name,
+                tls_version=tls_version or "unknown",
+                cipher_suite="unknown",
+            )
+        try:
+            hello = parse_client_hello(client_hello)
+        except ClientHelloError as exc:
+            logger.warning("Malformed ClientHello", extra={"error": str(exc)})
+            return TLSMetadata(
+                server_name=server_name,
+                tls_version=tls_version or "unknown",
+                cipher_suite="unknown",
+                error=str(exc),
+            )
 
-    def inspect(self, server_name: str, tls_version: str | None = None) -> TLSMetadata:
-        version = tls_version or "TLSv1.3"
-        cipher_suite = "TLS_AES_256_GCM_SHA384"
-        return TLSMetadata(server_name=server_name, tls_version=version, cipher_suite=cipher_suite)
+        fingerprint = self.fingerprint(hello)
+        offered = [value for value in hello.cipher_suites if not is_grease(value)]
+        first_cipher = offered[0] if offered else None
+        return TLSMetadata(
+            server_name=hello.server_name or server_name,
+            tls_version=TLS_VERSION_NAMES.get(hello.max_version, f"0x{hello.max_version:04x}"),
+            cipher_suite=(
+                CIPHER_SUITE_NAMES.get(first_cipher, f"0x{first_cipher:04x}")
+                if first_cipher is not None
+                else "none"
+            ),
+            alpn=hello.alpn,
+            ja3=fingerprint.ja3,
+            ja4=fingerprint.ja4,
+        )
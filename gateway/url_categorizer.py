@@ -1,4 +1,4 @@
-"""Keyword and regex based URL categorization."""
+"""Domain database and keyword/regex based URL categorization."""
 
 from __future__ import annotations
 
@@ -6,35 +6,74 @@ import json
 import logging
 import re
 from pathlib import Path
-from typing import Iterable
+from typing import TYPE_CHECKING, Iterable, Mapping
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from gateway.domain_db import DomainCategoryDB
 
 logger = logging.getLogger(__name__)
 
 
+def _hostname(url: str) -> str | None:
+    try:
+        return urlsplit(url if "//" in url else f"//{url}").hostname
+    except ValueError:
+        return None
+
+
 class URLCategorizer:
-    """Keyword-based URL categorizer using configurable patterns."""
+    """URL categorizer backed by an optional exact-domain database and pattern rules.
 
-    def __init__(self, categories_path: Path | str):
-        path = Path(categories_path)
-        if not path.exists():
-            raise FileNotFoundError(f"Categories file not found at {path}")
-        with path.open("r", encoding="utf-8") as handle:
-            self.categories: dict[str, Iterable[str]] = json.load(handle)
+    With a ``domain_db`` the hostname and its parent domains are looked up first; the
+    keyword/regex patterns only apply when the database has no entry for any of them.
+    """
 
-    def categorize(self, url: str) -> set[str]:
-        url_lower = url.lower()
-        matches: set[str] = set()
-        for category, patterns in self.categories.items():
+    def __init__(
+        self,
+        categories_path: Path | str | None = None,
+        *,
+        categories: Mapping[str, Iterable[str]] | None = None,
+        domain_db: DomainCategoryDB | None = None,
+    ):
+        if categories is None:
+            if categories_path is None:
+                raise ValueError("Either categories_path or categories is required")
+            path = Path(categories_path)
+            if not path.exists():
+                raise FileNotFoundError(f"Categories file not found at {path}")
+            with path.open("r", encoding="utf-8") as handle:
+                categories = json.load(handle)
+        self.categories: dict[str, Iterable[str]] = dict(categories)
+        self._compiled = self._compile(self.categories)
+        self.domain_db = domain_db
+
+    @staticmethod
+    def _compile(categories: Mapping[str, Iterable[str]]) -> list[tuple[str, list[re.Pattern]]]:
+        compiled: list[tuple[str, list[re.Pattern]]] = []
+        for category, patterns in categories.items():
+            regexes: list[re.Pattern] = []
             for pattern in patterns:
                 try:
-                    if re.search(pattern.lower(), url_lower):
-                        matches.add(category)
-                        break
+                    regexes.append(re.compile(pattern.lower()))
                 except re.error as exc:  # defensive guard for malformed regexes
                     logger.warning(
                         "Invalid category pattern", extra={"pattern": pattern, "error": str(exc)}
                     )
-                    continue
+            compiled.append((category, regexes))
+        return compiled
+
+    def categorize(self, url: str) -> set[str]:
+        if self.domain_db is not None:
+            hostname = _hostname(url)
+            listed = self.domain_db.lookup(hostname) if hostname else None
+            if listed:
+                return set(listed)
+        url_lower = url.lower()
+        matches: set[str] = set()
+        for category, regexes in self._compiled:
+            if any(regex.search(url_lower) for regex in regexes):
+                matches.add(category)
         return matches or {"Uncategorized"}
 
     def category_for_domain(self, domain: str) -> set[str]:
@@ -44,5 +83,7 @@ class URLCategorizer:
 def load_default_categorizer() -> URLCategorizer:
     """Construct a categorizer using the bundled configuration."""
 
+    from gateway.domain_db import default_domain_db
+
     config_path = Path(__file__).resolve().parents[1] / "config" / "categories.json"
-    return URLCategorizer(config_path)
+    return URLCategorizer(config_path, domain_db=default_domain_db())
@@ -0,0 +1,212 @@
+"""Vectorized what-if evaluation of a candidate policy over historical gateway logs.
+
+Instead of calling ``PolicyEngine.evaluate`` per event, the log is loaded into columnar
+pandas frames and each policy rule becomes a join or set-membership test over the whole
+table. The result is compared with the recorded verdicts::
+
+    python -m gateway.what_if candidate.yaml --log streamlit_logs/gateway.log --top 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_POLICY_KEY = "\0default"
+# Reason prefixes produced by PolicyEngine; anything else came from DNS, CASB, DLP, etc.
+POLICY_REASON_PREFIXES: tuple[str, ...] = (
+    "token failed",
+    "domain blocked by policy",
+    "category blocked",
+    "destination not in allowlist",
+    "device not trusted",
+)
+
+
+def load_events(records: Iterable[dict[str, Any]], since: float | None = None) -> pd.DataFrame:
+    """Build a columnar event table from normalized log records.
+
+    Only the columns the policy rules need are kept. ``non_policy_block`` marks events
+    blocked for reasons a policy change cannot affect (DNS blocklists, CASB, DLP, ...).
+    ``weight`` is the number of requests each record stands for under log sampling.
+    """
+
+    import pandas as pd
+
+    from siem.log_policy import record_weight
+
+    users: list[str | None] = []
+    domains: list[str] = []
+    categories: list[list[str]] = []
+    allowed: list[bool] = []
+    healthy: list[bool] = []
+    non_policy: list[bool] = []
+    weights: list[float] = []
+    for record in records:
+        if since is not None and (record.get("timestamp") or 0) < since:
+            continue
+        users.append(record.get("user"))
+        domains.append(record.get("domain") or "")
+        categories.append(list(record.get("categories") or ["Uncategorized"]))
+        allowed.append(bool(record.get("allowed")))
+        weights.append(record_weight(record))
+        healthy.append(bool((record.get("device") or {}).get("healthy", False)))
+        non_policy.append(
+            any(
+                not reason.startswith(POLICY_REASON_PREFIXES)
+                for reason in record.get("reasons") or ()
+            )
+        )
+    return pd.DataFrame(
+        {
+            "user": pd.Series(users, dtype="object"),
+            "domain": pd.Series(domains, dtype="object"),
+            "categories": pd.Series(categories, dtype="object"),
+            "allowed": pd.Series(allowed, dtype="bool"),
+            "healthy": pd.Series(healthy, dtype="bool"),
+            "non_policy_block": pd.Series(non_policy, dtype="bool"),
+            "weight": pd.Series(weights, dtype="float64"),
+        }
+    )
+
+
+def _policy_tables(policy: dict[str, Any]) -> dict[str, pd.DataFrame]:
+    import pandas as pd
+
+    policies = dict(policy.get("users") or {})
+    policies[DEFAULT_POLICY_KEY] = policy.get("default_policy") or {}
+    flags = pd.DataFrame(
+        [
+            {
+                "policy_key": key,
+                "device_trust_required": bool(rules.get("device_trust_required", False)),
+                "has_allowlist": bool(rules.get("allowed_destinations")),
+            }
+            for key, rules in policies.items()
+        ]
+    )
+
+    def pairs(field: str, column: str, lower: bool = False) -> pd.DataFrame:
+        rows = [
+            (key, value.lower() if lower else value)
+            for key, rules in policies.items()
+            for value in rules.get(field) or ()
+        ]
+        return pd.DataFrame(rows, columns=["policy_key", column]).drop_duplicates()
+
+    return {
+        "flags": flags,
+        "blocked_domains": pairs("blocked_domains", "domain_lower", lower=True),
+        "blocked_categories": pairs("blocked_categories", "category"),
+        "allowed_destinations": pairs("allowed_destinations", "domain"),
+    }
+
+
+def evaluate_policy(events: pd.DataFrame, policy: dict[str, Any]) -> pd.Series:
+    """Return a boolean Series: True where ``policy`` adds a policy block reason."""
+
+    import pandas as pd
+
+    tables = _policy_tables(policy)
+    known_users = set(policy.get("users") or {})
+    frame = pd.DataFrame(
+        {
+            "row": range(len(events)),
+            "policy_key": events["user"].where(
+                events["user"].isin(known_users), DEFAULT_POLICY_KEY
+            ),
+            "domain": events["domain"],
+            "domain_lower": events["domain"].str.lower(),
+        }
+    )
+
+    def matched_rows(left: pd.DataFrame, right: pd.DataFrame, on: list[str]) -> pd.Series:
+        hits = left.merge(right, on=on, how="inner")["row"].unique()
+        return pd.Series(frame["row"].isin(hits).to_numpy(), index=events.index)
+
+    blocked = pd.Series(events["user"].isna().to_numpy(), index=events.index)
+    blocked |= matched_rows(frame, tables["blocked_domains"], ["policy_key", "domain_lower"])
+
+    exploded = (
+        frame[["row", "policy_key"]]
+        .assign(category=events["categories"].to_numpy())
+        .explode("category")
+    )
+    blocked |= matched_rows(exploded, tables["blocked_categories"], ["policy_key", "category"])
+
+    flags = frame.merge(tables["flags"], on="policy_key", how="left")
+    has_allowlist = pd.Series(flags["has_allowlist"].fillna(False).to_numpy(), index=events.index)
+    listed = matched_rows(frame, tables["allowed_destinations"], ["policy_key", "domain"])
+    blocked |= has_allowlist & ~listed
+
+    trust_required = pd.Series(
+        flags["device_trust_required"].fillna(False).to_numpy(), index=events.index
+    )
+    blocked |= trust_required & ~events["healthy"]
+    return blocked.astype(bool)
+
+
+def _top(counts: pd.Series, top: int) -> dict[str, int]:
+    return {str(key): round(value) for key, value in counts.nlargest(top).items() if value}
+
+
+def what_if(events: pd.DataFrame, candidate: dict[str, Any], top: int = 10) -> dict[str, Any]:
+    """Summarize how ``candidate`` would change the recorded verdicts.
+
+    Returns totals of newly blocked and newly allowed events plus the top users,
+    categories, and domains for each direction.
+    """
+
+    summary: dict[str, Any] = {"events": 0, "newly_blocked": 0, "newly_allowed": 0}
+    if events.empty:
+        return {**summary, "by_user": {}, "by_category": {}, "by_domain": {}}
+
+    would_allow = ~events["non_policy_block"] & ~evaluate_policy(events, candidate)
+    # Counts are weighted so sampled and aggregated logs extrapolate to real traffic.
+    weight = events["weight"]
+    changes = events.assign(
+        newly_blocked=(events["allowed"] & ~would_allow) * weight,
+        newly_allowed=(~events["allowed"] & would_allow) * weight,
+        user=events["user"].fillna("(unauthenticated)"),
+    )
+
+    summary["events"] = round(weight.sum())
+    summary["newly_blocked"] = round(changes["newly_blocked"].sum())
+    summary["newly_allowed"] = round(changes["newly_allowed"].sum())
+    exploded = changes.explode("categories")
+    for label, frame, column in (
+        ("by_user", changes, "user"),
+        ("by_category", exploded, "categories"),
+        ("by_domain", changes, "domain"),
+    ):
+        grouped = frame.groupby(column)[["newly_blocked", "newly_allowed"]].sum()
+        summary[label] = {
+            "newly_blocked": _top(grouped["newly_blocked"], top),
+            "newly_allowed": _top(grouped["newly_allowed"], top),
+        }
+    return summary
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Evaluate a candidate policy against logs.")
+    parser.add_argument("candidate", type=Path, help="candidate policies.yaml")
+    parser.add_argument("--log", type=Path, default=Path("streamlit_logs/gateway.log"))
+    parser.add_argument("--since", type=float, help="only events at or after this epoch time")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    from gateway.policy_engine import load_policy_document
+    from gateway.replay import iter_records
+
+    events = load_events(iter_records(args.log), since=args.since)
+    summary = what_if(events, load_policy_document(args.candidate), top=args.top)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
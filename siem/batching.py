@@ -0,0 +1,376 @@
+"""Batching dispatcher that fans normalized events out to SIEM sinks.
+
+Events are queued by the request path and drained by a background thread that groups
+them into batches (by size or age) and sends each batch to every sink in parallel.
+Batches a sink fails to deliver are spooled to disk and replayed with exponential
+backoff; batches a collector rejects outright are dropped and counted.
+"""
+
+from __future__ import annotations
+
+import gzip
+import itertools
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from siem.sinks import BatchRejected, LogSink, SinkError, encode_batch
+
+logger = logging.getLogger(__name__)
+
+
+def _retryable(exc: Exception) -> bool:
+    """Only ``SinkError`` means "try later"; anything else would fail the same way again."""
+
+    return isinstance(exc, SinkError) and not isinstance(exc, BatchRejected)
+
+
+class DiskSpool:
+    """Per-sink directory of gzip-compressed batches awaiting redelivery.
+
+    Each batch is its own file, written atomically, so a crash never leaves a partial
+    batch behind. Files are replayed oldest first. The spool's size is measured once on
+    start-up and then kept as a running total, so the full check on every ``put`` does
+    not rescan the directory.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._bytes = (
+            sum(path.stat().st_size for path in directory.glob("*/*.ndjson.gz"))
+            if directory.is_dir()
+            else 0
+        )
+
+    def _sink_dir(self, sink_name: str) -> Path:
+        return self.directory / sink_name
+
+    def put(self, sink_name: str, batch: list[dict[str, Any]]) -> Path | None:
+        """Spool ``batch`` for ``sink_name``; returns ``None`` if the spool is full."""
+
+        if self.size() >= self.max_bytes:
+            logger.error(
+                "SIEM spool full; dropping batch",
+                extra={"sink": sink_name, "events": len(batch), "spool": str(self.directory)},
+            )
+            return None
+        target_dir = self._sink_dir(sink_name)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{time.time_ns():020d}-{next(self._sequence):06d}.ndjson.gz"
+        data = gzip.compress(encode_batch(batch), compresslevel=1)
+        fd, tmp_name = tempfile.mkstemp(dir=target_dir, prefix=".spool.")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_name, target_dir / name)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self._bytes += len(data)
+        return target_dir / name
+
+    def pending(self, sink_name: str) -> list[Path]:
+        target_dir = self._sink_dir(sink_name)
+        if not target_dir.is_dir():
+            return []
+        return sorted(target_dir.glob("*.ndjson.gz"))
+
+    def read(self, path: Path) -> list[dict[str, Any]]:
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            return [json.loads(line) for line in handle if line.strip()]
+
+    def remove(self, path: Path) -> None:
+        """Delete a replayed (or rejected) batch from the spool."""
+
+        self._forget(path, path.unlink)
+
+    def set_aside(self, path: Path) -> None:
+        """Move an unreadable batch out of the replay queue, keeping it for inspection."""
+
+        self._forget(path, lambda: path.rename(path.with_suffix(".corrupt")))
+
+    def size(self) -> int:
+        with self._lock:
+            return self._bytes
+
+    def _forget(self, path: Path, action: Callable[[], object]) -> None:
+        try:
+            size = path.stat().st_size
+            action()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._bytes = max(self._bytes - size, 0)
+
+
+@dataclass
+class SinkState:
+    """Delivery counters and retry schedule for one sink."""
+
+    sent_events: int = 0
+    sent_batches: int = 0
+    failed_batches: int = 0
+    spooled_batches: int = 0
+    replayed_batches: int = 0
+    rejected_batches: int = 0
+    dropped_events: int = 0
+    # True while batches may be waiting in the spool (including from a previous run).
+    backlog: bool = False
+    backoff: float = 0.0
+    retry_at: float = 0.0
+
+
+class BatchDispatcher:
+    """Queues events and ships them to ``sinks`` in batches from a background thread.
+
+    Args:
+        sinks: Destinations; each batch is sent to all of them concurrently.
+        spool_dir: Where failed batches are kept for replay (``None`` drops them).
+        batch_size: Maximum events per batch.
+        flush_interval: Maximum seconds an event waits before its batch is sent.
+        max_queue: Queue bound; ``submit`` drops (and counts) events beyond it so the
+            request path never blocks on a slow collector.
+        backoff_initial, backoff_max: Retry delay bounds for a failing sink.
+    """
+
+    def __init__(
+        self,
+        sinks: Iterable[LogSink],
+        *,
+        spool_dir: Path | None = None,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_queue: int = 100_000,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 300.0,
+    ):
+        self.sinks = list(sinks)
+        if not self.sinks:
+            raise ValueError("BatchDispatcher needs at least one sink")
+        self.spool = DiskSpool(spool_dir) if spool_dir is not None else None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.state = {
+            sink.name: SinkState(backlog=bool(self.spool and self.spool.pending(sink.name)))
+            for sink in self.sinks
+        }
+        self.dropped_events = 0
+        self._queue: queue.Queue[dict[str, Any] | None] = queue.Queue(maxsize=max_queue)
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self.sinks), thread_name_prefix="siem-sink"
+        )
+        # Events submitted but not yet delivered, spooled or dropped; ``flush`` waits on it.
+        self._outstanding = 0
+        self._settled = threading.Condition()
+        self._started_at = time.monotonic()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="siem-dispatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, event: dict[str, Any]) -> bool:
+        """Queue ``event`` without blocking; returns False if it was dropped."""
+
+        if self._closed:
+            return False
+        with self._settled:
+            self._outstanding += 1
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self._settle(1)
+            self.dropped_events += 1
+            return False
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every queued event has been handed to the sinks (or spooled)."""
+
+        with self._settled:
+            return self._settled.wait_for(lambda: self._outstanding == 0, timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush outstanding events, stop the dispatcher thread, and close the sinks."""
+
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+        # Last delivery attempt regardless of backoff; whatever still fails stays spooled
+        # and is replayed by the next dispatcher started on the same spool directory.
+        for sink in self.sinks:
+            if self.state[sink.name].backlog:
+                self._drain(sink, self.state[sink.name])
+        self._executor.shutdown(wait=True)
+        for sink in self.sinks:
+            sink.close()
+
+    def metrics(self) -> dict[str, Any]:
+        """Throughput and backlog counters for ``/status``-style reporting."""
+
+        elapsed = max(time.monotonic() - self._started_at, 1e-9)
+        return {
+            "queue_depth": self._queue.qsize(),
+            "dropped_events": self.dropped_events,
+            "spool_bytes": self.spool.size() if self.spool else 0,
+            "sinks": {
+                name: {
+                    "sent_events": state.sent_events,
+                    "sent_batches": state.sent_batches,
+                    "failed_batches": state.failed_batches,
+                    "spooled_batches": state.spooled_batches,
+                    "replayed_batches": state.replayed_batches,
+                    "rejected_batches": state.rejected_batches,
+                    "dropped_events": state.dropped_events,
+                    "events_per_second": round(state.sent_events / elapsed, 1),
+                    "retry_in": round(max(state.retry_at - time.monotonic(), 0.0), 3),
+                }
+                for name, state in self.state.items()
+            },
+        }
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: list[dict[str, Any]] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    event = (
+                        self._queue.get(timeout=remaining)
+                        if remaining > 0
+                        else self._queue.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+            futures = {
+                self._executor.submit(self._deliver, sink, batch): sink for sink in self.sinks
+            }
+            for future in wait(futures).done:
+                exc = future.exception()
+                if exc is not None:
+                    sink = futures[future]
+                    self.state[sink.name].dropped_events += len(batch)
+                    logger.error(
+                        "SIEM delivery failed; dropping batch",
+                        extra={"sink": sink.name, "events": len(batch)},
+                        exc_info=exc,
+                    )
+            self._settle(len(batch))
+
+    def _settle(self, events: int) -> None:
+        with self._settled:
+            self._outstanding -= events
+            self._settled.notify_all()
+
+    def _deliver(self, sink: LogSink, batch: list[dict[str, Any]]) -> None:
+        state = self.state[sink.name]
+        if state.backlog and state.retry_at <= time.monotonic():
+            self._drain(sink, state)
+        if not batch:
+            return
+        # While a sink is backing off or has a backlog, spool behind it to keep ordering.
+        if state.backlog or state.retry_at > time.monotonic():
+            self._spool(sink, state, batch)
+            return
+        try:
+            sink.send(batch)
+        except Exception as exc:
+            if not _retryable(exc):
+                self._reject(sink, state, len(batch), exc)
+                return
+            state.failed_batches += 1
+            self._schedule_retry(state)
+            logger.warning(
+                "SIEM sink send failed; spooling batch",
+                extra={"sink": sink.name, "events": len(batch), "error": str(exc)},
+            )
+            self._spool(sink, state, batch)
+            return
+        state.sent_events += len(batch)
+        state.sent_batches += 1
+
+    def _spool(self, sink: LogSink, state: SinkState, batch: list[dict[str, Any]]) -> None:
+        try:
+            spooled = self.spool is not None and self.spool.put(sink.name, batch) is not None
+        except (OSError, ValueError, TypeError) as exc:
+            logger.error(
+                "Cannot spool SIEM batch; dropping it",
+                extra={"sink": sink.name, "events": len(batch), "error": str(exc)},
+            )
+            spooled = False
+        if spooled:
+            state.spooled_batches += 1
+            state.backlog = True
+        else:
+            state.dropped_events += len(batch)
+
+    def _reject(self, sink: LogSink, state: SinkState, events: int, exc: Exception) -> None:
+        """Drop a batch that retrying cannot deliver: rejected, or the sink itself failed."""
+
+        state.rejected_batches += 1
+        state.dropped_events += events
+        logger.error(
+            "SIEM batch rejected; dropping it",
+            extra={"sink": sink.name, "events": events, "error": str(exc)},
+            exc_info=None if isinstance(exc, BatchRejected) else exc,
+        )
+
+    def _schedule_retry(self, state: SinkState) -> None:
+        state.backoff = min(
+            self.backoff_max, state.backoff * 2 if state.backoff else self.backoff_initial
+        )
+        state.retry_at = time.monotonic() + state.backoff
+
+    def _drain(self, sink: LogSink, state: SinkState) -> None:
+        """Replay spooled batches oldest first until the spool is empty or a send fails."""
+
+        assert self.spool is not None
+        for path in self.spool.pending(sink.name):
+            try:
+                batch = self.spool.read(path)
+            except (OSError, ValueError) as exc:
+                logger.error(
+                    "Unreadable SIEM spool file; setting it aside",
+                    extra={"sink": sink.name, "path": str(path), "error": str(exc)},
+                )
+                self.spool.set_aside(path)
+                continue
+            try:
+                sink.send(batch)
+            except Exception as exc:
+                if _retryable(exc):
+                    state.failed_batches += 1
+                    self._schedule_retry(state)
+                    logger.warning(
+                        "SIEM spool replay failed",
+                        extra={"sink": sink.name, "retry_in": state.backoff, "error": str(exc)},
+                    )
+                    return
+                self._reject(sink, state, len(batch), exc)
+            else:
+                state.sent_events += len(batch)
+                state.sent_batches += 1
+                state.replayed_batches += 1
+            self.spool.remove(path)
+        state.backlog = False
+        state.backoff = 0.0
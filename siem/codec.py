@@ -0,0 +1,343 @@
+"""Compact binary encoding for normalized gateway events.
+
+A stream is a sequence of segments. Each segment starts with a header (``MAGIC`` plus a
+schema version byte) and owns a table of values. Frames are:
+
+* ``D`` + u32 length + JSON text: append one value to the segment's table.
+* ``R`` + u16 length + body: one event. The body is a little-endian float64 timestamp,
+  one u16 table index per schema field, and the URL path as raw UTF-8.
+
+Repeated values (users, domains, categories, reasons, CASB/device/TLS dicts) are written
+once per segment and referenced by index afterwards, so a typical event costs about 40
+bytes plus its URL path. The URL is split into an origin (``scheme://host``, a table
+value) and the path. When the origin host or ``tls.server_name`` equals the event's
+domain they are stored as a reference to it (``["https"]`` and ``[]`` respectively) so a
+new domain adds one definition rather than three.
+
+A segment ends when its table holds ``MAX_TABLE`` values; the next one starts with a
+fresh header, which is also what appending writers emit, so files can be concatenated.
+
+Decoded events share nested values (lists and dicts) with other events of the same
+segment; copy them before mutating.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import struct
+from collections import deque
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SWGB"
+SCHEMA_VERSION = 1
+# Field order of a schema-version-1 record; ``origin`` is the URL up to its path and
+# ``extra`` holds keys outside the schema (normally ``None``).
+SCHEMAS: dict[int, tuple[str, ...]] = {
+    1: (
+        "user",
+        "domain",
+        "origin",
+        "method",
+        "categories",
+        "allowed",
+        "reasons",
+        "dlp",
+        "casb",
+        "device",
+        "tls",
+        "config_version",
+        "extra",
+    ),
+}
+ENCODINGS = ("json", "binary")
+MAX_TABLE = 0xFFFF
+TAG_DEFINE = ord("D")
+TAG_RECORD = ord("R")
+TAG_SEGMENT = MAGIC[0]
+
+_HEADER = struct.Struct("<4sB")
+_DEFINE = struct.Struct("<BI")
+_RECORD = struct.Struct("<BH")
+_VALUE_JSON = json.JSONEncoder(separators=(",", ":")).encode
+_NORMALIZED_KEYS = frozenset(("timestamp", "url", *SCHEMAS[SCHEMA_VERSION])) - {
+    "origin",
+    "extra",
+}
+
+
+def _body_struct(version: int) -> struct.Struct:
+    return struct.Struct(f"<d{len(SCHEMAS[version])}H")
+
+
+_BODY = {version: _body_struct(version) for version in SCHEMAS}
+
+
+def _split_url(url: str) -> tuple[str, str]:
+    scheme_end = url.find("://")
+    if scheme_end < 0:
+        return "", url
+    path_start = url.find("/", scheme_end + 3)
+    if path_start < 0:
+        return url, ""
+    return url[:path_start], url[path_start:]
+
+
+class EventEncoder:
+    """Streams normalized events to a binary file object opened for writing."""
+
+    def __init__(self, stream: IO[bytes], version: int = SCHEMA_VERSION):
+        if version not in SCHEMAS:
+            raise ValueError(f"Unknown event schema version: {version}")
+        self.stream = stream
+        self.version = version
+        self._fields = SCHEMAS[version]
+        self._body = _BODY[version]
+        self._index: dict[Any, int] = {}
+
+    def _start_segment(self, out: list[bytes]) -> None:
+        self._index = {}
+        out.append(_HEADER.pack(MAGIC, self.version))
+
+    def _ref(self, value: Any, out: list[bytes]) -> int:
+        kind = type(value)
+        if kind is str:
+            key: Any = value
+        elif kind is dict or kind is list:
+            # repr keeps True, 1, and 1.0 apart; equal values built in a different key
+            # order only cost a duplicate definition.
+            key = (kind, repr(value))
+        else:
+            key = (kind, value)
+        index = self._index.get(key)
+        if index is None:
+            index = self._index[key] = len(self._index)
+            text = _VALUE_JSON(value).encode()
+            out.append(_DEFINE.pack(TAG_DEFINE, len(text)) + text)
+        return index
+
+    def encode(self, event: dict[str, Any]) -> bytes:
+        """Return the frames for ``event``, including any new table definitions."""
+
+        return self.encode_many((event,))
+
+    def encode_many(self, events: Iterable[dict[str, Any]]) -> bytes:
+        """Return the frames for ``events``; all or nothing.
+
+        If any event cannot be encoded the string table is rolled back, so definitions
+        that were never written cannot be referenced by later records.
+        """
+
+        saved, mark = self._index, len(self._index)
+        try:
+            return b"".join([self._encode(event) for event in events])
+        except Exception:
+            # Entries are numbered in insertion order, so popitem drops the newest.
+            while len(saved) > mark:
+                saved.popitem()
+            self._index = saved
+            raise
+
+    def _encode(self, event: dict[str, Any]) -> bytes:
+        out: list[bytes] = []
+        # Worst case every field adds a definition; roll over before the table overflows.
+        if not self._index or len(self._index) + len(self._fields) > MAX_TABLE:
+            self._start_segment(out)
+        url = event.get("url")
+        origin: Any
+        origin, path = _split_url(url) if isinstance(url, str) else (None, "")
+        domain = event.get("domain")
+        tls = event.get("tls")
+        if domain and isinstance(domain, str):
+            # Values that repeat the domain reference it instead (see the module docstring).
+            if origin and origin.endswith("://" + domain):
+                origin = [origin[: -len(domain) - 3]]
+            if type(tls) is dict and tls.get("server_name") == domain:
+                tls = {**tls, "server_name": []}
+        extra = {key: value for key, value in event.items() if key not in _NORMALIZED_KEYS}
+        values = {**event, "origin": origin, "tls": tls, "extra": extra or None}
+        refs = [self._ref(values.get(field), out) for field in self._fields]
+        timestamp = event.get("timestamp")
+        try:
+            body = self._body.pack(math.nan if timestamp is None else timestamp, *refs)
+        except struct.error as exc:
+            raise ValueError(f"Cannot encode event timestamp {timestamp!r}") from exc
+        body += path.encode()
+        if len(body) > 0xFFFF:
+            raise ValueError("Event too large for binary encoding")
+        out.append(_RECORD.pack(TAG_RECORD, len(body)) + body)
+        return b"".join(out)
+
+    def write(self, event: dict[str, Any]) -> None:
+        self.stream.write(self.encode(event))
+
+    def write_many(self, events: Iterable[dict[str, Any]]) -> None:
+        self.stream.write(self.encode_many(events))
+
+
+def _decoder_state() -> dict[str, Any]:
+    return {
+        "table": [],
+        "body": _BODY[SCHEMA_VERSION],
+        "fields": SCHEMAS[SCHEMA_VERSION],
+        "offset": 0,
+    }
+
+
+def _decode_frames(
+    data: bytes, state: dict[str, Any], final: bool
+) -> tuple[list[dict[str, Any]], int]:
+    """Decode complete frames from ``data``; returns events and bytes consumed."""
+
+    events: list[dict[str, Any]] = []
+    append = events.append
+    table: list[Any] = state["table"]
+    body: struct.Struct = state["body"]
+    fields: tuple[str, ...] = state["fields"]
+    fixed = body.size
+    pos = 0
+    end = len(data)
+    while pos < end:
+        tag = data[pos]
+        if tag == TAG_RECORD:
+            if pos + 3 > end:
+                break
+            length = _RECORD.unpack_from(data, pos)[1]
+            stop = pos + 3 + length
+            if stop > end:
+                break
+            if length < fixed:
+                raise ValueError(f"Corrupt event stream at byte {state['offset'] + pos}")
+            timestamp, *refs = body.unpack_from(data, pos + 3)
+            try:
+                values = [table[ref] for ref in refs]
+            except IndexError:
+                raise ValueError(
+                    f"Undefined string reference at byte {state['offset'] + pos}"
+                ) from None
+            record = dict(zip(fields, values, strict=True))
+            origin = record.pop("origin")
+            extra = record.pop("extra")
+            domain = record["domain"]
+            if type(origin) is list:
+                origin = origin[0] + "://" + domain
+            tls = record["tls"]
+            if type(tls) is dict and type(tls.get("server_name")) is list:
+                record["tls"] = {**tls, "server_name": domain}
+            path = data[pos + 3 + fixed : stop].decode()
+            event = {
+                "timestamp": None if timestamp != timestamp else timestamp,
+                "user": record["user"],
+                "domain": domain,
+                "url": None if origin is None else origin + path,
+            }
+            event.update(record)
+            if extra:
+                event.update(extra)
+            append(event)
+            pos = stop
+        elif tag == TAG_DEFINE:
+            if pos + 5 > end:
+                break
+            length = _DEFINE.unpack_from(data, pos)[1]
+            stop = pos + 5 + length
+            if stop > end:
+                break
+            table.append(json.loads(data[pos + 5 : stop]))
+            pos = stop
+        elif tag == TAG_SEGMENT:
+            if pos + _HEADER.size > end:
+                break
+            magic, version = _HEADER.unpack_from(data, pos)
+            if magic != MAGIC:
+                raise ValueError(f"Corrupt event stream at byte {state['offset'] + pos}")
+            if version not in SCHEMAS:
+                raise ValueError(f"Unsupported event schema version: {version}")
+            table = state["table"] = []
+            body = state["body"] = _BODY[version]
+            fields = state["fields"] = SCHEMAS[version]
+            fixed = body.size
+            pos += _HEADER.size
+        else:
+            raise ValueError(f"Corrupt event stream at byte {state['offset'] + pos}")
+    if final and pos < end:
+        logger.warning("Ignoring truncated event at end of stream", extra={"bytes": end - pos})
+    state["offset"] += pos
+    return events, pos
+
+
+def iter_decode(stream: IO[bytes], chunk_size: int = 1 << 20) -> Iterator[dict[str, Any]]:
+    """Stream events from a binary file object in ``chunk_size`` reads."""
+
+    state = _decoder_state()
+    buffer = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer = buffer + chunk if buffer else chunk
+        events, consumed = _decode_frames(buffer, state, final=not chunk)
+        yield from events
+        buffer = buffer[consumed:]
+        if not chunk:
+            return
+
+
+def decode(data: bytes) -> list[dict[str, Any]]:
+    """Decode a complete in-memory stream."""
+
+    return _decode_frames(data, _decoder_state(), final=True)[0]
+
+
+def is_binary(path: Path) -> bool:
+    """True if ``path`` starts with the binary segment header."""
+
+    try:
+        with path.open("rb") as handle:
+            return handle.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def check_log_format(path: Path, encoding: str) -> None:
+    """Refuse to append ``encoding`` records to a non-empty log in the other format."""
+
+    try:
+        if path.stat().st_size == 0 or not path.is_file():
+            return
+    except OSError:
+        return
+    if is_binary(path) != (encoding == "binary"):
+        raise ValueError(
+            f"{path} is not a {encoding} log; rotate it before switching log encodings"
+        )
+
+
+def read_records(path: Path) -> Iterator[dict[str, Any]]:
+    """Stream normalized events from a JSON-lines or binary log, detected by magic bytes.
+
+    Unparseable JSON lines are skipped, as is a truncated trailing binary record (for
+    example one still being written).
+    """
+
+    with path.open("rb") as handle:
+        if handle.read(len(MAGIC)) == MAGIC:
+            handle.seek(0)
+            yield from iter_decode(handle)
+            return
+        handle.seek(0)
+        for line in handle:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def tail_records(path: Path, limit: int) -> list[dict[str, Any]]:
+    """Return the last ``limit`` events of a log in either encoding."""
+
+    return list(deque(read_records(path), maxlen=limit))
@@ -4,25 +4,78 @@ from __future__ import annotations
 
 import json
 import logging
+import os
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, Iterable
 
+from siem.codec import check_log_format
 from siem.normalizer import normalize
 
+if TYPE_CHECKING:
+    from siem.batching import BatchDispatcher
+    from siem.sinks import FileSink, LogSink
+
 logger = logging.getLogger(__name__)
 
+LOG_ENCODING_ENV_VAR = "SWG_LOG_ENCODING"
+
 
 class LogForwarder:
-    """Simple file-based log forwarder that mimics sending to a SIEM."""
+    """Simple file-based log forwarder that mimics sending to a SIEM.
+
+    Without ``sinks`` each record is appended synchronously to ``destination``. With
+    ``sinks`` (see ``siem.sinks``) records are queued and shipped in batches by a
+    ``BatchDispatcher``; ``dispatcher_options`` (``spool_dir``, ``batch_size``,
+    ``flush_interval``, ...) are passed through to it.
 
-    def __init__(self, destination: Path | None = None):
+    ``encoding`` selects JSON lines (the default) or the compact ``"binary"`` format from
+    ``siem.codec`` for ``destination``; it defaults to ``$SWG_LOG_ENCODING``.
+    """
+
+    def __init__(
+        self,
+        destination: Path | None = None,
+        sinks: Iterable[LogSink] | None = None,
+        *,
+        encoding: str | None = None,
+        **dispatcher_options: Any,
+    ):
         self.destination = destination or Path("streamlit_logs/gateway.log")
+        self.encoding = encoding or os.environ.get(LOG_ENCODING_ENV_VAR) or "json"
+        self.dispatcher: BatchDispatcher | None = None
+        self._binary_sink: FileSink | None = None
+        if sinks is not None:
+            from siem.batching import BatchDispatcher
+
+            self.dispatcher = BatchDispatcher(sinks, **dispatcher_options)
+            return
+        if self.encoding != "json":
+            from siem.sinks import FileSink
+
+            self._binary_sink = FileSink(self.destination, encoding=self.encoding)
+            return
         self.destination.parent.mkdir(parents=True, exist_ok=True)
+        check_log_format(self.destination, "json")
 
     def forward(self, record: dict[str, Any]) -> None:
         """Persist normalized records to disk; errors are logged but not raised."""
 
         normalized = normalize(record)
+        if self.dispatcher is not None:
+            if not self.dispatcher.submit(normalized):
+                logger.debug("SIEM queue full; dropping log record")
+            return
+        if self._binary_sink is not None:
+            from siem.sinks import SinkError
+
+            try:
+                self._binary_sink.send([normalized])
+            except SinkError as exc:
+                logger.error(
+                    "Failed to forward log",
+                    extra={"error": str(exc), "destination": str(self.destination)},
+                )
+            return
         try:
             with self.destination.open("a", encoding="utf-8") as handle:
                 handle.write(json.dumps(normalized) + "\n")
@@ -32,3 +85,19 @@ class LogForwarder:
                 "Failed to forward log",
                 extra={"error": str(exc), "destination": str(self.destination)},
             )
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until queued records have been handed to every sink."""
+
+        return self.dispatcher.flush(timeout) if self.dispatcher is not None else True
+
+    def close(self) -> None:
+        if self.dispatcher is not None:
+            self.dispatcher.close()
+        if self._binary_sink is not None:
+            self._binary_sink.close()
+
+    def metrics(self) -> dict[str, Any]:
+        """Queue depth and per-sink throughput; empty for the synchronous file mode."""
+
+        return self.dispatcher.metrics() if self.dispatcher is not None else {}
@@ -0,0 +1,246 @@
+"""Log volume policies: full logging, adaptive sampling, or aggregation of allowed traffic.
+
+Blocked requests and any request with DLP findings or CASB activity are always logged
+in full. Routine allowed traffic is either
+
+* ``sample``: kept with probability ``p = min(1, target_rate / observed_rate)``, where
+  the observed rate is measured over the previous ``window`` seconds. Kept events carry
+  ``sample_weight = 1 / p`` so that summing weights estimates the true totals.
+* ``aggregate``: counted per ``(user, domain, categories)`` and emitted every ``window``
+  seconds as one summary record whose ``sample_weight`` is the count. A background
+  ticker (``LogPolicy.start``) emits a closed window even when no further traffic
+  arrives to roll it over.
+
+Policies are selected with a spec string (``full``, ``sample:<events/s>``,
+``aggregate:<seconds>``), for example through ``$SWG_LOG_POLICY``.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+MODES = ("full", "sample", "aggregate")
+LOG_POLICY_ENV_VAR = "SWG_LOG_POLICY"
+
+
+def always_logged(record: dict[str, Any]) -> bool:
+    """Blocks, DLP findings, and CASB activity are never sampled or aggregated."""
+
+    if not record.get("allowed"):
+        return True
+    if record.get("dlp_findings"):
+        return True
+    casb = record.get("casb") or {}
+    return bool(casb.get("app") or casb.get("violations") or casb.get("action") == "block")
+
+
+def record_weight(record: dict[str, Any]) -> float:
+    """Number of requests a logged record stands for (1 for records logged in full)."""
+
+    weight = record.get("sample_weight")
+    return 1.0 if weight is None else float(weight)
+
+
+class LogPolicy:
+    """Decides which log records to emit for each processed request.
+
+    Args:
+        mode: ``"full"``, ``"sample"``, or ``"aggregate"``.
+        target_rate: For ``sample``, allowed events per second to keep.
+        window: Seconds per rate measurement (``sample``) or summary period
+            (``aggregate``).
+        clock: Time source, injectable for tests.
+        rng: Random source for sampling decisions.
+    """
+
+    def __init__(
+        self,
+        mode: str = "full",
+        *,
+        target_rate: float = 100.0,
+        window: float = 10.0,
+        clock: Callable[[], float] = time.time,
+        rng: random.Random | None = None,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown log policy mode: {mode}")
+        if target_rate <= 0 or window <= 0:
+            raise ValueError("target_rate and window must be positive")
+        self.mode = mode
+        self.target_rate = target_rate
+        self.window = window
+        self.clock = clock
+        self._random = (rng or random.Random()).random
+        self._lock = threading.Lock()
+        self._window_start = clock()
+        self._allowed_in_window = 0
+        self._probability = 1.0
+        self._counts: dict[tuple[Any, ...], int] = {}
+        self._config_version: Any = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @classmethod
+    def from_spec(cls, spec: str) -> LogPolicy:
+        """Parse ``full``, ``sample:<events/s>``, or ``aggregate:<seconds>``."""
+
+        mode, _, value = spec.strip().partition(":")
+        try:
+            if mode == "sample":
+                return cls("sample", target_rate=float(value or 100.0))
+            if mode == "aggregate":
+                return cls("aggregate", window=float(value or 10.0))
+        except ValueError as exc:
+            raise ValueError(f"Invalid log policy spec: {spec!r}") from exc
+        return cls(mode)
+
+    @property
+    def sample_probability(self) -> float:
+        return self._probability
+
+    def apply(self, record: dict[str, Any]) -> list[dict[str, Any]]:
+        """Return the records to log for ``record`` (possibly none, possibly summaries)."""
+
+        if self.mode == "full" or always_logged(record):
+            return [record]
+        with self._lock:
+            emitted = self._roll_window(self.clock())
+            if self.mode == "sample":
+                self._allowed_in_window += 1
+                if self._probability >= 1.0:
+                    emitted.append(record)
+                elif self._random() < self._probability:
+                    emitted.append({**record, "sample_weight": 1.0 / self._probability})
+            else:
+                key = (
+                    record.get("user"),
+                    record.get("domain"),
+                    tuple(record.get("categories") or ()),
+                )
+                self._counts[key] = self._counts.get(key, 0) + 1
+                self._config_version = record.get("config_version")
+        return emitted
+
+    def flush(self) -> list[dict[str, Any]]:
+        """Emit pending aggregate summaries now (for shutdown or idle periods)."""
+
+        with self._lock:
+            return self._summaries(self.clock())
+
+    def due(self) -> list[dict[str, Any]]:
+        """Emit the aggregate summaries of a window that has closed, if any."""
+
+        if self.mode != "aggregate":
+            return []
+        with self._lock:
+            return self._roll_window(self.clock())
+
+    def start(
+        self, emit: Callable[[list[dict[str, Any]]], None], interval: float | None = None
+    ) -> LogPolicy:
+        """Pass due summaries to ``emit`` every ``interval`` seconds from a background thread.
+
+        ``interval`` defaults to the window length, capped at one second. Only the
+        ``aggregate`` mode holds records back, so other modes start no thread.
+        """
+
+        if self.mode == "aggregate" and (self._thread is None or not self._thread.is_alive()):
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(emit, min(self.window, 1.0) if interval is None else interval),
+                name="log-policy",
+                daemon=True,
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, emit: Callable[[list[dict[str, Any]]], None], interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                records = self.due()
+                if records:
+                    emit(records)
+            except Exception:  # a failing emit must not stop the ticker
+                logger.exception("Cannot emit log summaries")
+
+    def _roll_window(self, now: float) -> list[dict[str, Any]]:
+        if now - self._window_start < self.window:
+            return []
+        if self.mode == "aggregate":
+            return self._summaries(now)
+        observed = self._allowed_in_window / (now - self._window_start)
+        self._probability = min(1.0, self.target_rate / observed) if observed else 1.0
+        self._allowed_in_window = 0
+        self._window_start = now
+        return []
+
+    def _summaries(self, now: float) -> list[dict[str, Any]]:
+        window_start, self._window_start = self._window_start, now
+        counts, self._counts = self._counts, {}
+        return [
+            {
+                "timestamp": now,
+                "user": user,
+                "domain": domain,
+                "url": None,
+                "method": None,
+                "categories": list(categories),
+                "allowed": True,
+                "reasons": [],
+                "config_version": self._config_version,
+                "sample_weight": count,
+                "summary": {"window_start": window_start, "window_end": now, "count": count},
+            }
+            for (user, domain, categories), count in counts.items()
+        ]
+
+
+def weighted_stats(
+    records: Iterable[dict[str, Any]], since: float | None = None, top: int = 10
+) -> dict[str, Any]:
+    """Extrapolate request totals from logged records using their ``sample_weight``."""
+
+    logged = sampled = 0
+    totals = {"allowed": 0.0, "blocked": 0.0}
+    by_user: Counter[str] = Counter()
+    by_domain: Counter[str] = Counter()
+    by_category: Counter[str] = Counter()
+    for record in records:
+        if since is not None and (record.get("timestamp") or 0) < since:
+            continue
+        weight = record_weight(record)
+        logged += 1
+        sampled += weight != 1.0
+        totals["allowed" if record.get("allowed") else "blocked"] += weight
+        by_user[record.get("user") or "(unauthenticated)"] += weight
+        by_domain[record.get("domain") or ""] += weight
+        for category in record.get("categories") or ["Uncategorized"]:
+            by_category[category] += weight
+
+    def ranked(counter: Counter[str]) -> dict[str, int]:
+        return {key: round(value) for key, value in counter.most_common(top)}
+
+    return {
+        "records": logged,
+        "weighted_records": sampled,
+        "requests": round(totals["allowed"] + totals["blocked"]),
+        "allowed": round(totals["allowed"]),
+        "blocked": round(totals["blocked"]),
+        "top_users": ranked(by_user),
+        "top_domains": ranked(by_domain),
+        "top_categories": ranked(by_category),
+    }
@@ -9,9 +9,11 @@ def normalize(log_record: dict[str, Any]) -> dict[str, Any]:
     """Convert an enforcement log into a consistent, SIEM-friendly schema."""
 
     base = {
+        "timestamp": log_record.get("timestamp"),
         "user": log_record.get("user"),
         "domain": log_record.get("domain"),
         "url": log_record.get("url"),
+        "method": log_record.get("method"),
         "categories": log_record.get("categories", []),
         "allowed": log_record.get("allowed", False),
         "reasons": log_record.get("reasons", []),
@@ -20,4 +22,9 @@ def normalize(log_record: dict[str, Any]) -> dict[str, Any]:
     base["casb"] = log_record.get("casb")
     base["device"] = log_record.get("device")
     base["tls"] = log_record.get("tls")
+    base["config_version"] = log_record.get("config_version")
+    # Present only on sampled or aggregated records (see siem.log_policy).
+    for key in ("sample_weight", "summary"):
+        if key in log_record:
+            base[key] = log_record[key]
     return base
@@ -0,0 +1,327 @@
+"""Batch-oriented SIEM sinks: local file, syslog over TCP/TLS, and HTTP bulk ingest."""
+
+from __future__ import annotations
+
+import gzip
+import http.client
+import json
+import logging
+import queue
+import socket
+import ssl
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Callable, Generic, Iterator, TypeVar
+from urllib.parse import urlparse
+
+from siem.codec import ENCODINGS, EventEncoder, check_log_format
+
+logger = logging.getLogger(__name__)
+
+ConnectionT = TypeVar("ConnectionT")
+ResultT = TypeVar("ResultT")
+
+# HTTP statuses that say "try again later" rather than "this batch is wrong".
+RETRYABLE_STATUSES = frozenset({408, 425, 429})
+
+
+class SinkError(RuntimeError):
+    """Raised when a sink could not deliver a batch; the batch should be retried."""
+
+
+class BatchRejected(SinkError):
+    """Raised when a batch can never be delivered as is; it is dropped, not retried."""
+
+
+def compress(payload: bytes, codec: str | None) -> bytes:
+    """Compress a batch body with ``gzip`` or ``zstd`` (requires the zstandard package)."""
+
+    if codec is None:
+        return payload
+    if codec == "gzip":
+        return gzip.compress(payload, compresslevel=6)
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=3).compress(payload)
+    raise ValueError(f"Unsupported compression codec: {codec}")
+
+
+def encode_batch(batch: list[dict[str, Any]]) -> bytes:
+    """Serialize a batch as newline-delimited JSON."""
+
+    return "".join(json.dumps(event, separators=(",", ":")) + "\n" for event in batch).encode()
+
+
+class ConnectionPool(Generic[ConnectionT]):
+    """Small pool of persistent connections; broken connections are discarded, not reused."""
+
+    def __init__(
+        self,
+        factory: Callable[[], ConnectionT],
+        close: Callable[[ConnectionT], None],
+        size: int = 2,
+    ):
+        self._factory = factory
+        self._close = close
+        self._idle: queue.LifoQueue[ConnectionT] = queue.LifoQueue(maxsize=size)
+
+    def _acquire(self) -> tuple[ConnectionT, bool]:
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._factory(), False
+
+    def _release(self, conn: ConnectionT) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[ConnectionT]:
+        conn, _ = self._acquire()
+        try:
+            yield conn
+        except BaseException:
+            self._close(conn)
+            raise
+        self._release(conn)
+
+    def call(
+        self,
+        operation: Callable[[ConnectionT], ResultT],
+        stale: tuple[type[BaseException], ...] = (ConnectionError,),
+    ) -> ResultT:
+        """Run ``operation`` on a pooled connection.
+
+        A reused connection that fails with one of ``stale`` was most likely closed by
+        the peer while idle, so it is replaced by a fresh one and tried once more.
+        """
+
+        conn, reused = self._acquire()
+        while True:
+            try:
+                result = operation(conn)
+            except stale:
+                self._close(conn)
+                if not reused:
+                    raise
+                conn, reused = self._factory(), False
+                continue
+            except BaseException:
+                self._close(conn)
+                raise
+            self._release(conn)
+            return result
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+class LogSink(ABC):
+    """Destination that accepts whole batches of normalized events."""
+
+    name: str = "sink"
+
+    @abstractmethod
+    def send(self, batch: list[dict[str, Any]]) -> None:
+        """Deliver ``batch``, or raise ``SinkError`` to have it spooled and retried.
+
+        Raise ``BatchRejected`` instead when retrying cannot help.
+        """
+
+    def close(self) -> None:
+        """Release any connections held by the sink."""
+
+        return None
+
+
+class FileSink(LogSink):
+    """Appends events to a local file as JSON lines or the binary format in ``siem.codec``.
+
+    In binary mode the file stays open and the encoder's string table carries across
+    batches, so only one writer may append to a given file at a time.
+    """
+
+    def __init__(self, destination: Path, name: str = "file", encoding: str = "json"):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unsupported log encoding: {encoding}")
+        self.destination = destination
+        self.name = name
+        self.encoding = encoding
+        self.destination.parent.mkdir(parents=True, exist_ok=True)
+        check_log_format(destination, encoding)
+        self._lock = threading.Lock()
+        self._handle: IO[bytes] | None = None
+        self._encoder: EventEncoder | None = None
+
+    def send(self, batch: list[dict[str, Any]]) -> None:
+        try:
+            if self.encoding == "json":
+                with self.destination.open("ab") as handle:
+                    handle.write(encode_batch(batch))
+                return
+            with self._lock:
+                if self._handle is None:
+                    self._handle = self.destination.open("ab")
+                    self._encoder = EventEncoder(self._handle)
+                assert self._encoder is not None
+                frames = self._encoder.encode_many(batch)
+                try:
+                    self._handle.write(frames)
+                    self._handle.flush()
+                except OSError:
+                    # The file may end in a partial frame; the next batch reopens it and
+                    # starts a new segment rather than referencing unwritten definitions.
+                    self._handle.close()
+                    self._handle = self._encoder = None
+                    raise
+        except OSError as exc:
+            raise SinkError(str(exc)) from exc
+        except (ValueError, TypeError) as exc:
+            raise BatchRejected(f"Cannot encode batch: {exc}") from exc
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = self._encoder = None
+
+
+class SyslogTCPSink(LogSink):
+    """RFC 5424 syslog over TCP or TLS with RFC 6587 octet-counted framing.
+
+    A whole batch is written with one ``sendall`` on a pooled persistent connection.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 6514,
+        *,
+        tls: bool | ssl.SSLContext = False,
+        app_name: str = "sase-gateway",
+        pool_size: int = 2,
+        timeout: float = 5.0,
+        name: str = "syslog",
+    ):
+        self.host = host
+        self.port = port
+        self.app_name = app_name
+        self.timeout = timeout
+        self.name = name
+        self._ssl_context = (
+            tls
+            if isinstance(tls, ssl.SSLContext)
+            else ssl.create_default_context() if tls else None
+        )
+        self._hostname = socket.gethostname()
+        self._pool: ConnectionPool[socket.socket] = ConnectionPool(
+            self._connect, lambda sock: sock.close(), size=pool_size
+        )
+
+    def _connect(self) -> socket.socket:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        if self._ssl_context is not None:
+            return self._ssl_context.wrap_socket(sock, server_hostname=self.host)
+        return sock
+
+    def _frame(self, event: dict[str, Any]) -> bytes:
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(event.get("timestamp")))
+        severity = 6 if event.get("allowed") else 4
+        message = (
+            f"<{16 * 8 + severity}>1 {timestamp} {self._hostname} {self.app_name} - - - "
+            + json.dumps(event, separators=(",", ":"))
+        ).encode()
+        return str(len(message)).encode() + b" " + message
+
+    def send(self, batch: list[dict[str, Any]]) -> None:
+        try:
+            payload = b"".join(self._frame(event) for event in batch)
+        except (ValueError, TypeError) as exc:
+            raise BatchRejected(f"Cannot encode batch: {exc}") from exc
+        try:
+            self._pool.call(lambda sock: sock.sendall(payload))
+        except OSError as exc:
+            raise SinkError(f"syslog {self.host}:{self.port}: {exc}") from exc
+
+    def close(self) -> None:
+        self._pool.close()
+
+
+class HTTPBulkSink(LogSink):
+    """POSTs compressed newline-delimited JSON batches to an HTTP(S) ingest endpoint.
+
+    Works with bulk collectors such as Splunk HEC-style endpoints or a Kafka REST proxy.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        compression: str | None = "gzip",
+        headers: dict[str, str] | None = None,
+        pool_size: int = 2,
+        timeout: float = 10.0,
+        name: str = "http",
+    ):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError(f"Unsupported ingest URL: {url}")
+        compress(b"", compression)  # fail fast on unknown or unavailable codecs
+        self.url = url
+        self.compression = compression
+        self.timeout = timeout
+        self.name = name
+        self._parsed = parsed
+        self._path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+        self._headers = {"Content-Type": "application/x-ndjson", **(headers or {})}
+        if compression:
+            self._headers["Content-Encoding"] = compression
+        self._pool: ConnectionPool[http.client.HTTPConnection] = ConnectionPool(
+            self._connect, lambda conn: conn.close(), size=pool_size
+        )
+
+    def _connect(self) -> http.client.HTTPConnection:
+        connection_class = (
+            http.client.HTTPSConnection
+            if self._parsed.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        return connection_class(
+            self._parsed.hostname or "", self._parsed.port, timeout=self.timeout
+        )
+
+    def _post(self, conn: http.client.HTTPConnection, body: bytes) -> int:
+        conn.request("POST", self._path, body=body, headers=self._headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+
+    def send(self, batch: list[dict[str, Any]]) -> None:
+        try:
+            body = compress(encode_batch(batch), self.compression)
+        except (ValueError, TypeError) as exc:
+            raise BatchRejected(f"Cannot encode batch: {exc}") from exc
+        try:
+            status = self._pool.call(
+                lambda conn: self._post(conn, body),
+                stale=(ConnectionError, http.client.BadStatusLine),
+            )
+        except (OSError, http.client.HTTPException) as exc:
+            raise SinkError(f"{self.url}: {exc}") from exc
+        if 400 <= status < 500 and status not in RETRYABLE_STATUSES:
+            raise BatchRejected(f"{self.url} rejected the batch with HTTP {status}")
+        if status >= 300:
+            raise SinkError(f"{self.url} returned HTTP {status}")
+
+    def close(self) -> None:
+        self._pool.close()
@@ -0,0 +1,113 @@
+import io
+import json
+
+import pytest
+
+from siem import codec
+from siem.codec import EventEncoder, decode, iter_decode, read_records
+from siem.log_forwarder import LogForwarder
+from siem.normalizer import normalize
+
+
+def _raw(index):
+    return {
+        "timestamp": 1_700_000_000.0 + index,
+        "user": f"user{index % 3}",
+        "domain": f"site{index % 5}.example",
+        "url": f"https://site{index % 5}.example/path/{index}?q=é",
+        "method": "GET",
+        "categories": ["Business", "News"],
+        "allowed": index % 4 != 0,
+        "reasons": [] if index % 4 else ["category blocked: News"],
+        "dlp_findings": "",
+        "casb": {"app": None, "violations": [], "action": "allow"},
+        "device": {"device_id": "laptop", "healthy": True, "posture_score": 90},
+        "tls": {"server_name": f"site{index % 5}.example", "tls_version": "TLSv1.3"},
+        "config_version": 1,
+    }
+
+
+def _event(index):
+    return normalize(_raw(index))
+
+
+def test_round_trip_preserves_events_and_key_order():
+    events = [_event(index) for index in range(50)]
+    events.append({**_event(50), "timestamp": None, "url": None, "sample_weight": 4})
+    events.append({**_event(51), "url": "not-a-url", "allowed": 1, "config_version": 1.0})
+    buffer = io.BytesIO()
+    EventEncoder(buffer).write_many(events)
+
+    decoded = decode(buffer.getvalue())
+    assert decoded == events
+    assert [type(event["allowed"]) for event in decoded[-1:]] == [int]
+    assert list(decoded[0]) == list(events[0])
+
+
+def test_binary_is_under_a_third_of_json():
+    events = [_event(index) for index in range(1000)]
+    buffer = io.BytesIO()
+    EventEncoder(buffer).write_many(events)
+    json_size = sum(len(json.dumps(event)) + 1 for event in events)
+    assert len(buffer.getvalue()) * 3 < json_size
+
+
+def test_segments_roll_over_and_stream_in_small_chunks(monkeypatch):
+    monkeypatch.setattr(codec, "MAX_TABLE", 24)
+    events = [_event(index) for index in range(200)]
+    buffer = io.BytesIO()
+    EventEncoder(buffer).write_many(events)
+    data = buffer.getvalue()
+    assert data.count(codec.MAGIC) > 1
+
+    assert list(iter_decode(io.BytesIO(data), chunk_size=7)) == events
+    # A record cut short by a concurrent writer is ignored rather than failing the read.
+    assert list(iter_decode(io.BytesIO(data[:-3]))) == events[:-1]
+
+
+def test_readers_detect_either_format(tmp_path):
+    json_log, binary_log = tmp_path / "json.log", tmp_path / "binary.log"
+    for path, encoding in ((json_log, "json"), (binary_log, "binary")):
+        forwarder = LogForwarder(path, encoding=encoding)
+        for index in range(5):
+            forwarder.forward(_raw(index))
+        forwarder.close()
+    # Appending from a new writer starts a new segment with its own table.
+    forwarder = LogForwarder(binary_log, encoding="binary")
+    forwarder.forward(_raw(5))
+    forwarder.close()
+
+    assert [event["url"] for event in read_records(binary_log)] == [
+        _event(index)["url"] for index in range(6)
+    ]
+    assert list(read_records(json_log)) == [_event(index) for index in range(5)]
+    with pytest.raises(ValueError):
+        LogForwarder(json_log, encoding="binary")
+
+
+def test_failed_encode_leaves_the_stream_decodable(tmp_path):
+    from siem.sinks import FileSink, SinkError
+
+    sink = FileSink(tmp_path / "events.bin", encoding="binary")
+    sink.send([_event(0)])
+    oversized = {**_event(1), "user": "fresh-user", "url": "https://x.example/" + "a" * 70_000}
+    unserializable = {**_event(2), "user": "other-user", "extra_field": object()}
+    for bad in (oversized, unserializable):
+        with pytest.raises(SinkError):
+            sink.send([_event(3), bad])
+    sink.send([{**_event(4), "user": "fresh-user"}, {**_event(5), "user": "other-user"}])
+    sink.close()
+    events = list(read_records(tmp_path / "events.bin"))
+    assert [event["user"] for event in events] == ["user0", "fresh-user", "other-user"]
+
+
+def test_corrupt_references_raise_value_error():
+    encoder = EventEncoder(io.BytesIO())
+    prefix = encoder.encode(_event(0))
+    # A repeated event is a bare record: tag, length, timestamp, then the references.
+    record = encoder.encode(_event(0))
+    bad_ref = record[:11] + b"\xff\xff" + record[13:]
+    with pytest.raises(ValueError, match="Undefined string reference"):
+        decode(prefix + bad_ref)
+    with pytest.raises(ValueError, match="Corrupt event stream"):
+        decode(prefix + b"R\x02\x00\x00\x00")
@@ -0,0 +1,58 @@
+import pytest
+
+from gateway.config_snapshot import compile_snapshot, load_snapshot, write_snapshot
+from gateway.proxy import SecureWebGateway
+
+
+def test_snapshot_round_trip(tmp_path):
+    snapshot = compile_snapshot()
+    path = tmp_path / "snapshot.json"
+    write_snapshot(snapshot, path)
+
+    loaded = load_snapshot(path)
+    assert loaded == snapshot
+    assert "malware.test" in loaded.blocked_domains
+    assert loaded.policy["tokens"]["alice"] == "token-alice"
+
+
+def test_stale_snapshot_rejected(tmp_path):
+    config_dir = tmp_path / "config"
+    (config_dir / "blocklists").mkdir(parents=True)
+    (config_dir / "categories.json").write_text('{"Malware": ["malware"]}')
+    (config_dir / "blocklists" / "malware_domains.txt").write_text("malware.test\n")
+    path = tmp_path / "snapshot.json"
+    write_snapshot(compile_snapshot(config_dir), path)
+
+    (config_dir / "blocklists" / "malware_domains.txt").write_text("other.test\n")
+    with pytest.raises(ValueError, match="stale"):
+        load_snapshot(path, verify_sources=config_dir)
+
+
+def test_gateway_builds_engines_lazily_from_snapshot(tmp_path):
+    path = tmp_path / "snapshot.json"
+    write_snapshot(compile_snapshot(), path)
+
+    gateway = SecureWebGateway(snapshot_path=path)
+    assert gateway._config is None
+
+    assert gateway.dns_filter.is_blocked("malware.test") is True
+    assert "policy_engine" not in vars(gateway.config)
+    decision = gateway.policy_engine.evaluate(
+        token="token-alice", domain="example.com", categories={"Business"}, device_context={}
+    )
+    assert decision.user == "alice"
+
+
+def test_gateway_recompiles_a_stale_snapshot(tmp_path, caplog):
+    config_dir = tmp_path / "config"
+    (config_dir / "blocklists").mkdir(parents=True)
+    (config_dir / "categories.json").write_text('{"Malware": ["malware"]}')
+    (config_dir / "blocklists" / "malware_domains.txt").write_text("malware.test\n")
+    path = tmp_path / "snapshot.json"
+    write_snapshot(compile_snapshot(config_dir), path)
+    (config_dir / "blocklists" / "malware_domains.txt").write_text("other.test\n")
+
+    gateway = SecureWebGateway(snapshot_path=path, config_dir=config_dir)
+    assert gateway.dns_filter.is_blocked("other.test") is True
+    assert gateway.dns_filter.is_blocked("malware.test") is False
+    assert "Config snapshot is stale" in caplog.text
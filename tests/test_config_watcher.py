@@ -0,0 +1,79 @@
+import shutil
+from pathlib import Path
+
+from gateway.config_watcher import ConfigWatcher
+from gateway.proxy import SecureWebGateway
+from siem.log_forwarder import LogForwarder
+
+CONFIG_DIR = Path(__file__).resolve().parents[1] / "config"
+REQUEST = {
+    "url": "http://example.com/docs",
+    "token": "token-alice",
+    "device": {"device_id": "endpoint", "healthy": True, "posture_score": 90},
+}
+
+
+def _gateway(tmp_path):
+    config_dir = tmp_path / "config"
+    shutil.copytree(CONFIG_DIR, config_dir)
+    gateway = SecureWebGateway(
+        config_dir=config_dir, log_forwarder=LogForwarder(tmp_path / "gateway.log")
+    )
+    return gateway, config_dir
+
+
+def test_watcher_publishes_new_version(tmp_path):
+    gateway, config_dir = _gateway(tmp_path)
+    first = gateway.process_request(REQUEST)
+    assert first.allowed is True
+    assert first.log_record["config_version"] == 1
+    old_config = gateway.config
+
+    watcher = ConfigWatcher(gateway.publish_config, config_dir=config_dir)
+    assert watcher.poll() is False
+    with (config_dir / "blocklists" / "malware_domains.txt").open("a") as handle:
+        handle.write("example.com\n")
+    assert watcher.poll() is True
+
+    second = gateway.process_request(REQUEST)
+    assert second.allowed is False
+    assert second.log_record["config_version"] == 2
+    assert old_config.dns_filter.is_blocked("example.com") is False
+
+
+def test_invalid_config_keeps_previous_version(tmp_path):
+    gateway, config_dir = _gateway(tmp_path)
+    gateway.process_request(REQUEST)
+
+    watcher = ConfigWatcher(gateway.publish_config, config_dir=config_dir)
+    (config_dir / "categories.json").write_text("{not json")
+    assert watcher.poll() is False
+    assert gateway.config.version == 1
+    assert gateway.process_request(REQUEST).allowed is True
+
+
+def test_reload_without_changes_keeps_version(tmp_path):
+    gateway, _ = _gateway(tmp_path)
+    first = gateway.config
+    assert gateway.reload_config() is first
+    assert first.version == 1
+
+
+def test_failed_publish_is_retried_without_further_changes(tmp_path):
+    gateway, config_dir = _gateway(tmp_path)
+    attempts = []
+
+    def flaky_publish(snapshot):
+        attempts.append(snapshot)
+        if len(attempts) == 1:
+            raise RuntimeError("transient failure")
+        gateway.publish_config(snapshot)
+
+    assert gateway.config.version == 1
+    watcher = ConfigWatcher(flaky_publish, config_dir=config_dir)
+    with (config_dir / "blocklists" / "malware_domains.txt").open("a") as handle:
+        handle.write("example.com\n")
+    assert watcher.poll() is False
+    assert watcher.poll() is True
+    assert watcher.poll() is False
+    assert gateway.config.version == 2 and len(attempts) == 2
@@ -1,10 +1,20 @@
+import json
+
+import pytest
 from fastapi.testclient import TestClient
 
+from api import admin
 from api.control_plane import app
 
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def isolated_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(admin, "STORE_PATH", tmp_path / "policies.db")
+    monkeypatch.setattr(admin, "POSTURE_FEED_PATH", tmp_path / "device_posture.jsonl")
+
+
 def test_status_endpoint():
     response = client.get("/status")
     assert response.status_code == 200
@@ -18,8 +28,6 @@ def test_token_verify_failure():
 
 
 def test_register_user_updates_policy(tmp_path, monkeypatch):
-    from api import admin
-
     custom_policy = tmp_path / "policies.yaml"
     monkeypatch.setattr(admin, "CONFIG_PATH", custom_policy)
 
@@ -31,6 +39,113 @@ def test_register_user_updates_policy(tmp_path, monkeypatch):
     assert policies["tokens"]["carol"] == "token-carol"
 
 
+def test_registrations_are_exported_debounced_and_keep_hand_edits(tmp_path, monkeypatch):
+    custom_policy = tmp_path / "policies.yaml"
+    monkeypatch.setattr(admin, "CONFIG_PATH", custom_policy)
+    monkeypatch.setattr(admin, "EXPORT_INTERVAL", 60.0)
+
+    client.post("/user/register", json={"username": "carol", "token": "token-carol"})
+    document = admin.load_policies(custom_policy)
+    document["tokens"]["dave"] = "token-dave"
+    admin.save_policies(document, custom_policy)
+
+    client.post("/user/register", json={"username": "erin", "token": "token-erin"})
+    assert "erin" not in admin.load_policies(custom_policy)["tokens"]
+    admin.policy_exporter(admin.policy_store()).flush()
+
+    tokens = admin.load_policies(custom_policy)["tokens"]
+    assert {"carol", "dave", "erin"} <= tokens.keys()
+    assert admin.policy_store().tokens()["dave"] == "token-dave"
+
+
+def test_bulk_register_and_pull_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(admin, "CONFIG_PATH", tmp_path / "policies.yaml")
+    start = client.get("/policy/version").json()["version"]
+
+    users = [{"username": f"user{i}", "token": f"token-{i}"} for i in range(50)]
+    response = client.post("/user/register/bulk", json={"users": users})
+    assert response.status_code == 200
+    assert response.json()["count"] == 50
+
+    delta = client.get("/policy/changes", params={"since": start}).json()
+    assert len(delta["users"]) == 50
+    assert delta["tokens"]["user7"] == "token-7"
+    assert delta["version"] == client.get("/policy/version").json()["version"]
+
+    verify = client.post("/token/verify", json={"token": "token-7"})
+    assert verify.json()["user"] == "user7"
+
+
 def test_get_logs_validates_limit():
     response = client.get("/logs", params={"limit": 0})
     assert response.status_code == 400
+
+
+def test_bulk_device_posture_update():
+    devices = [
+        {"device_id": "laptop-1", "healthy": True, "posture_score": 90},
+        {"device_id": "laptop-2", "healthy": False, "posture_score": 30},
+    ]
+    response = client.post("/device/posture", json={"devices": devices})
+    assert response.status_code == 200
+    assert response.json()["applied"] == 2
+    assert admin.POSTURE_FEED_PATH.exists()
+
+    assert client.get("/device/posture/laptop-2").json()["healthy"] is False
+    assert client.get("/device/posture/missing").status_code == 404
+
+
+def test_policy_what_if_uses_recorded_logs(tmp_path, monkeypatch):
+    from api import control_plane
+
+    log_path = tmp_path / "gateway.log"
+    record = {
+        "user": "bob",
+        "domain": "news.example",
+        "categories": ["Uncategorized"],
+        "allowed": True,
+        "reasons": [],
+        "device": {"healthy": True},
+    }
+    log_path.write_text(json.dumps(record) + "\n")
+    monkeypatch.setattr(control_plane, "LOG_PATH", log_path)
+
+    candidate = {"users": {"bob": {"blocked_domains": ["news.example"]}}}
+    response = client.post("/policy/what-if", json={"policies": candidate})
+    assert response.status_code == 200
+    assert response.json()["newly_blocked"] == 1
+
+
+def test_get_logs_reads_binary_encoded_log(tmp_path, monkeypatch):
+    from api import control_plane
+    from siem.log_forwarder import LogForwarder
+
+    log_path = tmp_path / "gateway.log"
+    forwarder = LogForwarder(log_path, encoding="binary")
+    for domain in ("a.example", "b.example", "c.example"):
+        forwarder.forward({"user": "bob", "domain": domain, "url": f"https://{domain}/"})
+    forwarder.close()
+    monkeypatch.setattr(control_plane, "LOG_PATH", log_path)
+
+    response = client.get("/logs", params={"limit": 2})
+    assert response.status_code == 200
+    assert [entry["domain"] for entry in response.json()] == ["b.example", "c.example"]
+
+
+def test_stats_extrapolates_sampled_records(tmp_path, monkeypatch):
+    from api import control_plane
+
+    log_path = tmp_path / "gateway.log"
+    records = [
+        {"user": "bob", "domain": "news.example", "allowed": True, "sample_weight": 20.0},
+        {"user": "bob", "domain": "news.example", "allowed": True, "sample_weight": 20.0},
+        {"user": "eve", "domain": "malware.test", "allowed": False},
+    ]
+    log_path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    monkeypatch.setattr(control_plane, "LOG_PATH", log_path)
+
+    response = client.get("/stats", params={"top": 1})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["records"], body["requests"], body["blocked"]) == (3, 41, 1)
+    assert body["top_users"] == {"bob": 40}
@@ -0,0 +1,79 @@
+import json
+
+from auth.device_trust import DeviceTrust, PostureRegistry
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_registry_overrides_client_supplied_posture():
+    registry = PostureRegistry()
+    registry.update("laptop-1", healthy=False, posture_score=40)
+    trust = DeviceTrust(registry=registry)
+
+    spoofed = {"device_id": "laptop-1", "healthy": True, "posture_score": 100}
+    assert trust.evaluate(spoofed).healthy is False
+    assert trust.evaluate({"device_id": "unknown-device", "healthy": True}).healthy is False
+
+
+def test_registry_entries_expire_and_are_bounded():
+    clock = FakeClock()
+    registry = PostureRegistry(ttl=60, max_entries=2, clock=clock)
+    registry.bulk_update(
+        {"device_id": f"d{i}", "healthy": True, "posture_score": 90} for i in range(3)
+    )
+    assert len(registry) == 2
+    assert registry.get("d0") is None
+    assert registry.get("d2").healthy is True
+
+    clock.now += 61
+    assert registry.get("d2") is None
+    assert registry.purge_expired() == 2
+
+
+def test_feed_round_trip(tmp_path):
+    registry = PostureRegistry()
+    registry.bulk_update(
+        [
+            {"device_id": "laptop-1", "healthy": True, "posture_score": 85},
+            {"device_id": "broken"},
+        ]
+    )
+    feed = tmp_path / "posture.jsonl"
+    assert registry.dump(feed) == 1
+
+    array_feed = tmp_path / "posture.json"
+    array_feed.write_text(json.dumps(list(registry.records())))
+    for path in (feed, array_feed):
+        reloaded = PostureRegistry()
+        assert reloaded.load_feed(path) == 1
+        assert reloaded.get("laptop-1").posture_score == 85
+
+
+def test_low_score_from_feed_is_untrusted():
+    registry = PostureRegistry()
+    registry.update("laptop-2", healthy=True, posture_score=50)
+    assert (
+        DeviceTrust(minimum_score=70, registry=registry).evaluate({"device_id": "laptop-2"}).healthy
+        is False
+    )
+
+
+def test_string_health_flags_are_rejected_not_trusted(caplog):
+    registry = PostureRegistry()
+    applied = registry.bulk_update(
+        [
+            {"device_id": "laptop-3", "healthy": "false", "posture_score": 95},
+            {"device_id": "laptop-4", "healthy": 0, "posture_score": 95},
+            {"device_id": "laptop-5", "healthy": False, "posture_score": 95},
+        ]
+    )
+    assert applied == 1
+    assert registry.get("laptop-3") is None and registry.get("laptop-4") is None
+    assert registry.get("laptop-5").healthy is False
+    assert "Skipping malformed posture record" in caplog.text
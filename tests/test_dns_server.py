@@ -0,0 +1,231 @@
+import asyncio
+import socket
+import struct
+
+import pytest
+
+from gateway.dns_filter import DNSFilter
+from gateway.dns_server import (
+    FLAG_QR,
+    FLAG_TC,
+    RCODE_NXDOMAIN,
+    RCODE_SERVFAIL,
+    TYPE_A,
+    TYPE_AAAA,
+    DNSCache,
+    DNSFormatError,
+    DNSSinkholeServer,
+    build_query,
+    parse_query,
+    response_ttls,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubUpstream(asyncio.DatagramProtocol):
+    """Stand-in resolver: 192.0.2.1 for every name, NXDOMAIN for ``missing.example``."""
+
+    def __init__(self, delay=0.0, ttl=300):
+        self.delay = delay
+        self.ttl = ttl
+        self.queries = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        asyncio.get_running_loop().create_task(self._answer(data, addr))
+
+    async def _answer(self, data, addr):
+        question = parse_query(data)
+        self.queries.append(question.name)
+        await asyncio.sleep(self.delay)
+        head, body = data[:2], data[12 : question.question_end]
+        if question.name == "missing.example":
+            soa = b"\x00" * 2 + struct.pack("!5I", 1, 3600, 600, 86400, 30)
+            soa = b"\xc0\x0c" + struct.pack("!HHIH", 6, 1, 900, len(soa)) + soa
+            flags = FLAG_QR | 0x0180 | RCODE_NXDOMAIN
+            response = head + struct.pack("!5H", flags, 1, 0, 1, 0) + body + soa
+        else:
+            answer = (
+                b"\xc0\x0c" + struct.pack("!HHIH", TYPE_A, 1, self.ttl, 4) + bytes([192, 0, 2, 1])
+            )
+            count = 60 if question.name == "big.example" else 1
+            response = (
+                head + struct.pack("!5H", FLAG_QR | 0x0180, 1, count, 0, 0) + body + answer * count
+            )
+        self.transport.sendto(response, addr)
+
+
+async def start_stub(**options):
+    stub = StubUpstream(**options)
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: stub, local_addr=("127.0.0.1", 0)
+    )
+    return stub, transport, transport.get_extra_info("sockname")[:2]
+
+
+def header(response):
+    txid, flags, _, ancount, nscount, _ = struct.unpack_from("!6H", response)
+    return txid, flags & 0xF, ancount, flags
+
+
+def ttl_of_first_answer(response):
+    question_end = response.index(b"\x00", 12) + 5
+    # Answers point back at the question name (2 bytes), then type and class.
+    return struct.unpack_from("!I", response, question_end + 6)[0]
+
+
+def test_blocked_names_and_subdomains_are_sinkholed():
+    async def scenario():
+        stub, transport, address = await start_stub()
+        dns_filter = DNSFilter(domains=["malware.test"])
+        nxdomain = DNSSinkholeServer(dns_filter, address)
+        response = await nxdomain.handle(build_query("cdn.Malware.TEST", txid=7))
+        assert header(response)[:3] == (7, RCODE_NXDOMAIN, 0)
+
+        sinkhole = DNSSinkholeServer(dns_filter, address, sinkhole_ipv4="10.0.0.1")
+        response = await sinkhole.handle(build_query("malware.test", txid=8))
+        assert header(response)[:3] == (8, 0, 1)
+        assert response.endswith(bytes([10, 0, 0, 1]))
+        # No IPv6 sinkhole configured: NODATA, so clients fall back to the A record.
+        response = await sinkhole.handle(build_query("malware.test", TYPE_AAAA))
+        assert header(response)[1:3] == (0, 0)
+
+        assert stub.queries == []
+        assert sinkhole.metrics()["blocked"] == 2
+        transport.close()
+
+    asyncio.run(scenario())
+
+
+def test_forwarded_answers_are_cached_until_their_ttl_expires():
+    async def scenario():
+        clock = FakeClock()
+        stub, transport, address = await start_stub(ttl=300)
+        server = DNSSinkholeServer(DNSFilter(), address, cache=DNSCache(clock=clock))
+
+        first = await server.handle(build_query("example.com", txid=1))
+        assert header(first)[:3] == (1, 0, 1)
+        clock.now += 100
+        cached = await server.handle(build_query("EXAMPLE.com", txid=2))
+        assert header(cached)[:3] == (2, 0, 1)
+        assert b"EXAMPLE" in cached
+        assert ttl_of_first_answer(cached) == 200
+        assert stub.queries == ["example.com"]
+
+        # Negative answers are cached for the SOA minimum (30s), not the SOA TTL.
+        await server.handle(build_query("missing.example"))
+        clock.now += 29
+        assert header(await server.handle(build_query("missing.example")))[1] == RCODE_NXDOMAIN
+        clock.now += 201
+        await server.handle(build_query("missing.example"))
+        await server.handle(build_query("example.com"))
+        assert stub.queries == ["example.com", "missing.example", "missing.example", "example.com"]
+        assert server.metrics()["cache_hits"] == 2
+        transport.close()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_queries_are_coalesced_and_bounded_cache_evicts():
+    async def scenario():
+        stub, transport, address = await start_stub(delay=0.05)
+        server = DNSSinkholeServer(DNSFilter(), address, cache=DNSCache(max_bytes=700))
+        responses = await asyncio.gather(
+            *(server.handle(build_query("example.com", txid=n)) for n in range(20))
+        )
+        assert [header(response)[0] for response in responses] == list(range(20))
+        assert stub.queries == ["example.com"]
+        assert server.metrics()["coalesced"] == 19
+
+        for name in ("a.example", "b.example", "c.example"):
+            await server.handle(build_query(name))
+        assert server.cache.size <= 700
+        assert server.cache.evictions >= 1
+        transport.close()
+
+    asyncio.run(scenario())
+
+
+def test_udp_and_tcp_listeners_truncation_and_upstream_failure():
+    async def scenario():
+        stub, transport, address = await start_stub()
+        server = DNSSinkholeServer(DNSFilter(), address)
+        host, port = await server.start("127.0.0.1", 0)
+        loop = asyncio.get_running_loop()
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as client:
+            client.setblocking(False)
+            await loop.sock_connect(client, (host, port))
+            await loop.sock_sendall(client, build_query("big.example", txid=3))
+            response = await asyncio.wait_for(loop.sock_recv(client, 4096), 2)
+        assert header(response)[0] == 3 and header(response)[3] & FLAG_TC
+
+        reader, writer = await asyncio.open_connection(host, port)
+        query = build_query("big.example", txid=4)
+        writer.write(struct.pack("!H", len(query)) + query)
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+        response = await reader.readexactly(length)
+        assert header(response)[:3] == (4, 0, 60)
+        writer.close()
+        await server.close()
+
+        transport.close()
+        dead = DNSSinkholeServer(DNSFilter(), address)
+        dead.upstream.timeout = 0.05
+        response = await dead.handle(build_query("example.com", TYPE_A, txid=5))
+        assert header(response)[:2] == (5, RCODE_SERVFAIL)
+        assert dead.metrics()["upstream_errors"] == 1
+        dead.upstream.close()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_leader_answers_coalesced_followers_with_servfail():
+    async def scenario():
+        stub, transport, address = await start_stub(delay=0.2)
+        server = DNSSinkholeServer(DNSFilter(), address)
+        leader = asyncio.ensure_future(server.handle(build_query("example.com", txid=1)))
+        await asyncio.sleep(0.02)
+        follower = asyncio.ensure_future(server.handle(build_query("example.com", txid=2)))
+        await asyncio.sleep(0.02)
+        leader.cancel()
+        response = await follower
+        assert leader.cancelled()
+        assert header(response)[:2] == (2, RCODE_SERVFAIL)
+        assert server.metrics()["coalesced"] == 1
+        transport.close()
+
+    asyncio.run(scenario())
+
+
+def test_short_upstream_replies_are_format_errors_and_never_strand_followers():
+    for response in (b"\x00\x01\x02", build_query("example.com")[:14]):
+        with pytest.raises(DNSFormatError):
+            response_ttls(response)
+
+    async def scenario():
+        stub, transport, address = await start_stub(delay=0.05)
+        server = DNSSinkholeServer(DNSFilter(), address)
+
+        def broken_put(key, response):
+            raise struct.error("unpack requires a buffer of 12 bytes")
+
+        server.cache.put = broken_put
+        responses = await asyncio.wait_for(
+            asyncio.gather(*(server.handle(build_query("example.com", txid=n)) for n in range(3))),
+            timeout=2,
+        )
+        assert [header(response)[:2] for response in responses] == [(n, 0) for n in range(3)]
+        assert server.metrics()["coalesced"] == 2
+        transport.close()
+
+    asyncio.run(scenario())
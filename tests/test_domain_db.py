@@ -0,0 +1,84 @@
+from pathlib import Path
+
+from gateway.config_watcher import ConfigWatcher
+from gateway.domain_db import (
+    DOMAIN_DB_ENV_VAR,
+    DomainCategoryDB,
+    build_domain_db,
+    default_domain_db,
+    read_feed,
+)
+from gateway.proxy import SecureWebGateway
+from gateway.url_categorizer import URLCategorizer
+from siem.log_forwarder import LogForwarder
+
+CATEGORIES = Path(__file__).resolve().parents[1] / "config" / "categories.json"
+
+FEED = """\
+domain,categories
+# vendor feed 2026-10-19
+example.com,Business
+mail.example.com,Webmail|Business
+Cloud.Example.NET.,Cloud Storage,Productivity
+stale.test,Gambling
+stale.test,News
+"""
+
+
+def build(tmp_path, feed=FEED):
+    feed_path = tmp_path / "feed.csv"
+    feed_path.write_text(feed, encoding="utf-8")
+    db_path = tmp_path / "domains.db"
+    return build_domain_db(read_feed(feed_path), db_path), db_path
+
+
+def test_lookup_walks_parent_domains_and_prefers_the_most_specific(tmp_path):
+    count, db_path = build(tmp_path)
+    db = DomainCategoryDB(db_path, cache_size=2)
+
+    assert count == db.entries == 4
+    assert db.lookup("example.com") == {"Business"}
+    assert db.lookup("a.b.example.com") == {"Business"}
+    assert db.lookup("x.MAIL.example.com") == {"Webmail", "Business"}
+    assert db.lookup("cloud.example.net") == {"Cloud Storage", "Productivity"}
+    assert db.lookup("stale.test") == {"News"}
+    assert db.lookup("unlisted.org") is None
+    assert db.lookup("unlisted.org") is None
+    assert (db.hits, db.misses) == (1, 6)
+    assert db.metrics()["cached"] == 2
+
+
+def test_categorizer_uses_database_before_pattern_rules(tmp_path):
+    _, db_path = build(tmp_path)
+    categorizer = URLCategorizer(CATEGORIES, domain_db=DomainCategoryDB(db_path))
+
+    # "mail" contains the "ai" keyword, but the database entry wins.
+    assert categorizer.categorize("https://mail.example.com:8443/inbox?q=1") == {
+        "Webmail",
+        "Business",
+    }
+    assert categorizer.category_for_domain("example.com") == {"Business"}
+    assert categorizer.categorize("https://www.facebook.com/") == {"Social Media"}
+    assert categorizer.categorize("not a url") == {"Uncategorized"}
+
+
+def test_gateway_picks_up_database_from_env_and_rebuilds(tmp_path, monkeypatch):
+    _, db_path = build(tmp_path)
+    monkeypatch.setenv(DOMAIN_DB_ENV_VAR, str(db_path))
+    gateway = SecureWebGateway(log_forwarder=LogForwarder(tmp_path / "gateway.log"))
+    result = gateway.process_request({"url": "https://docs.example.com/", "token": "token-alice"})
+    assert result.decision.categories == {"Business"}
+
+    first = default_domain_db()
+    watcher = ConfigWatcher(gateway.publish_config)
+    assert watcher.poll() is False
+    build(tmp_path, "example.com,Malware\n")
+    assert default_domain_db() is not first
+    assert default_domain_db().lookup("docs.example.com") == {"Malware"}
+
+    # A running gateway republishes when the database is rebuilt, even with no config edits.
+    assert watcher.poll() is True
+    assert gateway.config.version == 2
+    result = gateway.process_request({"url": "https://docs.example.com/", "token": "token-alice"})
+    assert result.decision.categories == {"Malware"}
+    assert gateway.reload_config() is gateway.config
@@ -0,0 +1,110 @@
+import random
+import time
+
+from gateway.proxy import SecureWebGateway
+from siem.codec import read_records
+from siem.log_forwarder import LogForwarder
+from siem.log_policy import LogPolicy, weighted_stats
+
+DEVICE = {"device_id": "endpoint", "healthy": True, "posture_score": 90}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _allowed(domain="example.com", **extra):
+    return {
+        "user": "alice",
+        "domain": domain,
+        "categories": ["Productivity"],
+        "allowed": True,
+        "casb": {"app": None, "violations": [], "action": "allow"},
+        **extra,
+    }
+
+
+def test_sampling_adapts_to_throughput_and_keeps_weighted_totals():
+    clock = FakeClock()
+    policy = LogPolicy("sample", target_rate=100, window=1.0, clock=clock, rng=random.Random(3))
+    emitted = []
+    for second in range(5):
+        for index in range(2_000):
+            clock.now = 1_000.0 + second + index / 2_000
+            emitted += policy.apply(_allowed())
+        emitted += policy.apply({**_allowed(), "allowed": False, "reasons": ["blocked"]})
+        emitted += policy.apply(_allowed(dlp_findings="credit card"))
+
+    assert policy.sample_probability == 0.05
+    assert len(emitted) < 2_000 + 4 * 250
+    stats = weighted_stats(emitted)
+    assert stats["blocked"] == 5
+    assert abs(stats["allowed"] - 10_005) < 500
+    full = [record for record in emitted if "sample_weight" not in record]
+    assert sum(not record["allowed"] for record in full) == 5
+    assert sum(bool(record.get("dlp_findings")) for record in full) == 5
+
+
+def test_aggregation_emits_periodic_summaries():
+    clock = FakeClock()
+    policy = LogPolicy("aggregate", window=10.0, clock=clock)
+    for domain in ["a.example"] * 7 + ["b.example"] * 3:
+        assert policy.apply(_allowed(domain)) == []
+    assert policy.apply(_allowed(casb={"app": "Dropbox", "violations": [], "action": "allow"}))
+
+    clock.now += 10
+    summaries = policy.apply(_allowed("c.example"))
+    assert {(record["domain"], record["sample_weight"]) for record in summaries} == {
+        ("a.example", 7),
+        ("b.example", 3),
+    }
+    assert summaries[0]["summary"]["window_end"] == clock.now
+    assert [record["domain"] for record in policy.flush()] == ["c.example"]
+
+
+def test_closed_window_is_emitted_without_further_traffic(tmp_path):
+    clock = FakeClock()
+    policy = LogPolicy("aggregate", window=10.0, clock=clock)
+    for _ in range(3):
+        policy.apply(_allowed())
+    assert policy.due() == []
+    clock.now += 10
+    assert [(record["domain"], record["sample_weight"]) for record in policy.due()] == [
+        ("example.com", 3)
+    ]
+    assert policy.due() == [] and policy.flush() == []
+
+    log_path = tmp_path / "gateway.log"
+    gateway = SecureWebGateway(
+        log_forwarder=LogForwarder(log_path), log_policy=LogPolicy.from_spec("aggregate:0.2")
+    )
+    for _ in range(3):
+        gateway.process_request({"url": "http://example.com/docs", "token": "token-alice"})
+    deadline = time.monotonic() + 5
+    while not log_path.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    gateway.log_policy.stop()
+
+    [summary] = read_records(log_path)
+    assert (summary["domain"], summary["sample_weight"]) == ("example.com", 3)
+
+
+def test_gateway_applies_log_policy_to_forwarded_records(tmp_path):
+    log_path = tmp_path / "gateway.log"
+    gateway = SecureWebGateway(
+        log_forwarder=LogForwarder(log_path), log_policy=LogPolicy.from_spec("aggregate:60")
+    )
+    for _ in range(4):
+        gateway.process_request({"url": "http://example.com/docs", "token": "token-alice"})
+    gateway.process_request({"url": "http://malware.test/x", "token": "token-alice"})
+    gateway.flush_logs()
+
+    records = list(read_records(log_path))
+    assert len(records) == 2
+    stats = weighted_stats(records)
+    assert (stats["requests"], stats["allowed"], stats["blocked"]) == (5, 4, 1)
+    assert stats["top_domains"] == {"example.com": 4, "malware.test": 1}
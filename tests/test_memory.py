@@ -0,0 +1,110 @@
+import shutil
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.control_plane import app
+from auth.signed_tokens import KeyRing, TokenKey
+from auth.ztna_token_validator import ZTNATokenValidator
+from gateway.config_snapshot import CONFIG_DIR, compile_snapshot
+from gateway.domain_db import DOMAIN_DB_ENV_VAR, build_domain_db
+from gateway.memory import MemoryBudget, MemoryBudgetExceeded, deep_sizeof, parse_size
+from gateway.profiling import DEBUG_DIR_ENV_VAR
+from gateway.proxy import SecureWebGateway
+from siem.log_forwarder import LogForwarder
+
+
+def test_deep_sizeof_counts_shared_objects_once_and_samples_large_containers():
+    shared = "x" * 1000
+    assert deep_sizeof([shared, shared]) == sys.getsizeof([shared, shared]) + sys.getsizeof(shared)
+    seen: set[int] = set()
+    deep_sizeof(shared, seen=seen)
+    assert deep_sizeof([shared], seen=seen) == sys.getsizeof([shared])
+
+    domains = {f"host-{index}.example.com" for index in range(50_000)}
+    exact = deep_sizeof(domains, sample=len(domains))
+    assert abs(deep_sizeof(domains, sample=500) - exact) < exact * 0.02
+
+    budget = MemoryBudget.from_spec("config=1.5MiB, token_cache=64k, action=refuse")
+    assert budget.limits == {"config": 1_572_864, "token_cache": 65_536}
+    assert budget.action == "refuse"
+    assert parse_size("512") == 512
+    with pytest.raises(ValueError):
+        MemoryBudget.from_spec("blocklist=1MiB")
+    with pytest.raises(ValueError):
+        parse_size("12 parsecs")
+
+
+def test_cache_budget_lowers_the_entry_limit(tmp_path):
+    ring = KeyRing([TokenKey.generate("k1")])
+    gateway = SecureWebGateway(
+        token_validator=ZTNATokenValidator(known_tokens={"alice": "token-alice"}, key_ring=ring),
+        log_forwarder=LogForwarder(tmp_path / "gateway.log"),
+        memory_budget=MemoryBudget.from_spec("token_cache=8KiB"),
+    )
+    for index in range(60):
+        gateway.token_validator.validate(ring.issue(f"user-{index:03d}"))
+
+    cache = gateway.memory_report()["components"]["token_cache"]
+    assert cache["entries"] == 60 and cache["over_budget"]
+    limit = cache["limit"]
+    assert 0 < limit < 60 and ring.cache_size == limit
+
+    for index in range(5):
+        gateway.token_validator.validate(ring.issue(f"late-{index:03d}"))
+    cache = gateway.memory_report()["components"]["token_cache"]
+    assert cache["entries"] == limit and cache["limit"] <= limit
+
+
+def test_config_over_budget_is_refused_or_warned_and_reported(tmp_path, monkeypatch, caplog):
+    monkeypatch.setenv(DEBUG_DIR_ENV_VAR, str(tmp_path / "debug"))
+    config_dir = tmp_path / "config"
+    shutil.copytree(CONFIG_DIR, config_dir)
+    with (config_dir / "blocklists" / "malware_domains.txt").open("a") as handle:
+        handle.write("extra.test\n")
+    snapshot = compile_snapshot(config_dir)
+    refuse = MemoryBudget.from_spec("dns_blocklist=100,action=refuse")
+    with pytest.raises(MemoryBudgetExceeded, match="dns_blocklist"):
+        SecureWebGateway(log_forwarder=LogForwarder(tmp_path / "gateway.log"), memory_budget=refuse)
+    gateway = SecureWebGateway(log_forwarder=LogForwarder(tmp_path / "gateway.log"))
+    assert gateway.config.version == 1
+    gateway.memory_budget = refuse
+    with pytest.raises(MemoryBudgetExceeded, match="dns_blocklist"):
+        gateway.publish_config(snapshot)
+    assert gateway.config.version == 1
+
+    gateway.memory_budget = MemoryBudget.from_spec("config=100")
+    assert gateway.publish_config(snapshot).version == 2
+    assert "Configuration exceeds memory budget: config:" in caplog.text
+
+    gateway.serve_diagnostics(interval=3600)
+    gateway.stop_diagnostics()
+    body = TestClient(app).get("/debug/memory").json()
+    [worker] = body["workers"]
+    assert worker["config_version"] == 2
+    assert worker["components"]["dns_blocklist"]["entries"] == len(snapshot.blocked_domains)
+    assert body["totals"]["config"] == worker["totals"]["config"] > 0
+
+
+def test_cache_limits_follow_the_cache_owner_across_generations(tmp_path, monkeypatch):
+    db_path = tmp_path / "domains.db"
+    monkeypatch.setenv(DOMAIN_DB_ENV_VAR, str(db_path))
+    build_domain_db([("example.com", ["Business"])], db_path)
+    gateway = SecureWebGateway(
+        log_forwarder=LogForwarder(tmp_path / "gateway.log"),
+        memory_budget=MemoryBudget.from_spec("category_cache=4KiB"),
+    )
+    for index in range(200):
+        gateway.config.categorizer.categorize(f"https://host{index}.example.org/")
+    first = gateway.config.categorizer.domain_db
+    gateway.memory_report()
+    assert first.cache_size < 200
+
+    build_domain_db([("example.com", ["Malware"])], db_path)
+    gateway.reload_config()
+    second = gateway.config.categorizer.domain_db
+    assert second is not first
+    gateway.memory_report()
+    owner, configured = gateway.memory._configured["category_cache"]
+    assert owner is second and configured == 100_000
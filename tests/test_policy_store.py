@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from api.admin import load_policies
+from api.policy_store import PolicyStore, apply_changes
+
+CONFIG_PATH = Path(__file__).resolve().parents[1] / "config" / "policies.yaml"
+
+
+def test_yaml_round_trip(tmp_path):
+    store = PolicyStore(tmp_path / "policies.db")
+    store.import_yaml(CONFIG_PATH)
+
+    exported = tmp_path / "policies.yaml"
+    store.export_yaml(exported)
+    assert load_policies(exported) == load_policies(CONFIG_PATH)
+
+
+def test_replace_document_records_only_changed_entries(tmp_path):
+    store = PolicyStore(tmp_path / "policies.db")
+    document = load_policies(CONFIG_PATH)
+    store.replace_document(document)
+    before = store.version
+
+    document["users"]["bob"]["blocked_categories"].append("Gambling")
+    del document["users"]["alice"]
+    store.replace_document(document)
+
+    delta = store.changes_since(before)
+    assert set(delta["users"]) == {"alice", "bob"}
+    assert delta["users"]["alice"] is None
+    assert delta["tokens"] == {} and delta["sections"] == {}
+    assert store.version > before
+
+
+def test_apply_changes_reconstructs_document(tmp_path):
+    store = PolicyStore(tmp_path / "policies.db")
+    store.import_yaml(CONFIG_PATH)
+    pulled, version = store.document(), store.version
+
+    store.upsert_user("carol", {"blocked_categories": ["Adult"]}, token="token-carol")
+    store.delete_user("bob")
+
+    assert apply_changes(pulled, store.changes_since(version)) == store.document()
@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from api.control_plane import app
+from gateway.profiling import (
+    DEBUG_DIR_ENV_VAR,
+    DiagnosticsAgent,
+    SamplingProfiler,
+    SlowRequestLog,
+)
+from gateway.proxy import SecureWebGateway
+from siem.log_forwarder import LogForwarder
+
+
+def busy_loop(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(range(200))
+
+
+def test_sampling_profiler_emits_collapsed_stacks():
+    worker = threading.Thread(target=busy_loop, args=(0.3,), name="busy-worker")
+    profiler = SamplingProfiler(hz=200).start()
+    worker.start()
+    worker.join()
+    output = profiler.stop()
+
+    assert not profiler.running and profiler.samples > 10
+    busy = [line for line in output.splitlines() if line.startswith("busy-worker;")]
+    assert busy and all(line.rsplit(" ", 1)[1].isdigit() for line in busy)
+    assert any("busy_loop (test_profiling.py:" in line for line in busy)
+    assert "sampling-profiler" not in output
+
+
+def test_slow_request_log_keeps_metadata_but_not_bodies(tmp_path):
+    slow = SlowRequestLog(threshold=0.0, capacity=2)
+    gateway = SecureWebGateway(
+        log_forwarder=LogForwarder(tmp_path / "gateway.log"), slow_requests=slow
+    )
+    for path in ("a", "b", "c"):
+        gateway.process_request(
+            {
+                "url": f"https://example.com/{path}?session=secret",
+                "method": "POST",
+                "token": "token-alice",
+                "body": "customer salary spreadsheet",
+            }
+        )
+
+    entries = slow.entries()
+    assert [entry["url"] for entry in entries] == [
+        "https://example.com/c",
+        "https://example.com/b",
+    ]
+    assert entries[0]["user"] == "alice" and entries[0]["body_bytes"] == 27
+    assert {"dlp", "policy", "total"} <= set(entries[0]["timings_ms"])
+    assert "salary" not in str(entries) and "secret" not in str(entries)
+    assert SlowRequestLog(threshold=10.0).entries() == []
+
+
+def test_control_plane_drives_worker_profiler_and_slow_requests(tmp_path, monkeypatch):
+    monkeypatch.setenv(DEBUG_DIR_ENV_VAR, str(tmp_path / "debug"))
+    client = TestClient(app)
+    gateway = SecureWebGateway(
+        log_forwarder=LogForwarder(tmp_path / "gateway.log"),
+        slow_requests=SlowRequestLog(threshold=0.0),
+    )
+    agent = gateway.serve_diagnostics(interval=3600)
+    assert client.get("/debug/profiler/output").status_code == 404
+    assert client.post("/debug/profiler/start", params={"hz": 5000}).status_code == 400
+
+    session = client.post("/debug/profiler/start", params={"hz": 200}).json()["session"]
+    agent.poll()
+    assert agent.profiler is not None and agent.profiler.running
+    busy_loop(0.2)
+    gateway.process_request({"url": "http://example.com/docs", "token": "token-alice"})
+    assert client.post("/debug/profiler/stop").json() == {"status": "stopped", "session": session}
+    agent.poll()
+    gateway.stop_diagnostics()
+    assert agent.profiler is None
+
+    response = client.get("/debug/profiler/output")
+    assert response.status_code == 200
+    assert "busy_loop" in response.text
+    assert client.get("/debug/profiler/output", params={"session": "../x"}).status_code == 404
+
+    slow = client.get("/debug/slow-requests", params={"limit": 5}).json()
+    assert [entry["url"] for entry in slow] == ["http://example.com/docs"]
+    assert client.get("/debug/slow-requests", params={"min_ms": 1e9}).json() == []
+
+
+def test_diagnostics_agent_survives_failing_reports(tmp_path, caplog):
+    def broken_memory():
+        raise RuntimeError("accounting bug")
+
+    slow = SlowRequestLog(threshold=0.0)
+    gateway = SecureWebGateway(
+        log_forwarder=LogForwarder(tmp_path / "gateway.log"), slow_requests=slow
+    )
+    gateway.process_request({"url": "https://example.com/", "token": "token-alice"})
+    for memory in (broken_memory, lambda: {"unserializable": object()}):
+        agent = DiagnosticsAgent(tmp_path / "debug", slow_log=slow, memory=memory).start()
+        agent.stop()
+        assert (tmp_path / "debug" / f"slow-{os.getpid()}.json").exists()
+        assert not agent._thread.is_alive()
+    assert "accounting bug" in caplog.text
+    assert "not JSON serializable" in caplog.text
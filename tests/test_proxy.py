@@ -1,8 +1,9 @@
 from gateway.proxy import SecureWebGateway
+from siem.log_forwarder import LogForwarder
 
 
-def test_proxy_blocks_malware_domain():
-    gateway = SecureWebGateway()
+def test_proxy_blocks_malware_domain(tmp_path):
+    gateway = SecureWebGateway(log_forwarder=LogForwarder(tmp_path / "gateway.log"))
     request = {
         "url": "http://malware.test/payload",
         "method": "GET",
@@ -13,8 +14,8 @@ def test_proxy_blocks_malware_domain():
     assert result.allowed is False
 
 
-def test_proxy_allows_safe_domain():
-    gateway = SecureWebGateway()
+def test_proxy_allows_safe_domain(tmp_path):
+    gateway = SecureWebGateway(log_forwarder=LogForwarder(tmp_path / "gateway.log"))
     request = {
         "url": "http://example.com/docs",
         "method": "GET",
@@ -25,8 +26,8 @@ def test_proxy_allows_safe_domain():
     assert result.allowed is True
 
 
-def test_proxy_blocks_unsupported_method():
-    gateway = SecureWebGateway()
+def test_proxy_blocks_unsupported_method(tmp_path):
+    gateway = SecureWebGateway(log_forwarder=LogForwarder(tmp_path / "gateway.log"))
     request = {
         "url": "http://example.com/docs",
         "method": "TRACE",
@@ -36,3 +37,20 @@ def test_proxy_blocks_unsupported_method():
     result = gateway.process_request(request)
     assert result.allowed is False
     assert any("unsupported method" in reason for reason in result.log_record["reasons"])
+
+
+def test_proxy_uses_posture_feed_over_client_claims(tmp_path):
+    feed = tmp_path / "posture.jsonl"
+    feed.write_text('{"device_id": "endpoint", "healthy": false, "posture_score": 20}\n')
+    gateway = SecureWebGateway(
+        log_forwarder=LogForwarder(tmp_path / "gateway.log"), posture_feed=feed
+    )
+    request = {
+        "url": "http://example.com/docs",
+        "method": "GET",
+        "token": "token-alice",
+        "device": {"device_id": "endpoint", "healthy": True, "posture_score": 90},
+    }
+    result = gateway.process_request(request)
+    assert result.allowed is False
+    assert "device not trusted" in result.log_record["reasons"]
@@ -0,0 +1,37 @@
+import json
+
+from gateway.proxy import SecureWebGateway
+from gateway.replay import iter_items, iter_records, replay
+from siem.log_forwarder import LogForwarder
+
+DEVICE = {"device_id": "endpoint", "healthy": True, "posture_score": 90}
+
+
+def test_replay_of_gateway_log_matches_recorded_verdicts(tmp_path):
+    log_path = tmp_path / "gateway.log"
+    gateway = SecureWebGateway(log_forwarder=LogForwarder(log_path))
+    for url in ("http://example.com/docs", "http://malware.test/x", "http://news.example/"):
+        gateway.process_request({"url": url, "token": "token-alice", "device": DEVICE})
+    with log_path.open("a") as handle:
+        handle.write("not json\n")
+
+    items = iter_items(iter_records(log_path), {"alice": "token-alice"})
+    report = replay(items, workers=1, batch_size=2)
+
+    assert report.requests == 3
+    assert report.mismatches == 0
+    assert report.latencies["total"].total == 3
+    assert report.as_dict()["latency_ms"]["policy"]["p99"] >= 0
+
+
+def test_replay_reports_changed_verdicts(tmp_path):
+    capture = tmp_path / "capture.jsonl"
+    request = {"url": "http://malware.test/x", "token": "token-alice", "device": DEVICE}
+    capture.write_text(json.dumps({"request": request, "allowed": True, "reasons": []}) + "\n")
+
+    report = replay(iter_items(iter_records(capture), {}), workers=1, rate=1000)
+
+    assert report.mismatches == 1
+    sample = report.mismatch_samples[0]
+    assert sample["expected"]["allowed"] is True
+    assert sample["actual"]["allowed"] is False
@@ -0,0 +1,121 @@
+import base64
+
+import pytest
+
+from auth.signed_tokens import TOKEN_KEYS_ENV_VAR, KeyRing, TokenError, TokenKey, main
+from auth.ztna_token_validator import ZTNATokenValidator
+from gateway.config_watcher import ConfigWatcher
+from gateway.proxy import SecureWebGateway
+from siem.log_forwarder import LogForwarder
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_signed_tokens_carry_groups_and_preshared_tokens_still_work():
+    ring = KeyRing([TokenKey.generate("k1")])
+    validator = ZTNATokenValidator(known_tokens={"alice": "token-alice"}, key_ring=ring)
+
+    result = validator.validate(ring.issue("carol", groups=["eng", "admins"]))
+    assert (result.user, result.valid, result.groups) == ("carol", True, ("eng", "admins"))
+    assert validator.validate("token-alice").user == "alice"
+    assert validator.validate("token-mallory").reason == "invalid token"
+
+    forged = KeyRing([TokenKey("k1", "HS256", secret=b"guessed")]).issue("root")
+    assert validator.validate(forged).reason == "invalid token: bad signature"
+    header, _, signature = ring.issue("carol").split(".")
+    payload = forged.split(".")[1]
+    assert validator.validate(f"{header}.{payload}.{signature}").reason == (
+        "invalid token: bad signature"
+    )
+
+
+def test_rotation_keeps_old_tokens_valid_until_the_key_is_removed():
+    old, new = TokenKey.generate("2026-09"), TokenKey.generate("2026-10")
+    old_token = KeyRing([old]).issue("alice")
+    rotated = KeyRing([old, new], active="2026-10")
+    new_token = rotated.issue("bob")
+
+    assert rotated.verify(old_token).kid == "2026-09"
+    assert rotated.verify(new_token).kid == "2026-10"
+    with pytest.raises(TokenError, match="unknown signing key"):
+        KeyRing([new]).verify(old_token)
+    header = base64.urlsafe_b64encode(b'{"alg":"EdDSA","kid":"2026-10"}').rstrip(b"=").decode()
+    with pytest.raises(TokenError, match="algorithm mismatch"):
+        rotated.verify(header + new_token[new_token.index(".") :])
+
+
+def test_cache_skips_the_signature_check_but_not_expiry():
+    clock = FakeClock()
+    ring = KeyRing([TokenKey.generate("k1")], clock=clock, leeway=0, cache_size=2)
+    token = ring.issue("alice", ttl=60)
+
+    for _ in range(3):
+        assert ring.verify(token).user == "alice"
+    assert (ring.misses, ring.hits) == (1, 2)
+
+    clock.now += 61
+    with pytest.raises(TokenError, match="expired"):
+        ring.verify(token)
+    for user in ("bob", "carol", "dave"):
+        ring.verify(ring.issue(user))
+    assert len(ring._cache) == 2
+
+
+def test_key_ring_file_from_env_and_ed25519(tmp_path, monkeypatch):
+    path = tmp_path / "token_keys.json"
+    main(["--ring", str(path), "add-key", "k1"])
+    main(["--ring", str(path), "add-key", "k2"])
+    monkeypatch.setenv(TOKEN_KEYS_ENV_VAR, str(path))
+    ring = KeyRing.from_env()
+    assert ring is KeyRing.from_env()
+    assert (ring.active, sorted(ring.keys)) == ("k2", ["k1", "k2"])
+    assert ZTNATokenValidator(known_tokens={"a": "b"}).validate(ring.issue("erin")).user == "erin"
+    assert path.stat().st_mode & 0o077 == 0
+
+    pytest.importorskip("cryptography")
+    signer = KeyRing([TokenKey.generate("ed", "EdDSA")])
+    public = TokenKey("ed", "EdDSA", public_key=signer.keys["ed"].public_key)
+    assert KeyRing([public]).verify(signer.issue("frank", ["ops"])).groups == ("ops",)
+
+
+def test_non_ascii_tokens_and_missing_key_files_fail_cleanly(tmp_path, monkeypatch):
+    ring = KeyRing([TokenKey.generate("k1")])
+    header, payload, signature = ring.issue("alice").split(".")
+    tokens = (f"{header}.{payload}é.{signature}", "é.é.é", f"{header}.{payload}.{signature}\xa0")
+    for token in tokens:
+        with pytest.raises(TokenError, match="malformed token"):
+            ring.verify(token)
+
+    monkeypatch.setenv(TOKEN_KEYS_ENV_VAR, str(tmp_path / "missing.json"))
+    with pytest.raises(ValueError, match="SWG_TOKEN_KEYS names a key ring that cannot be read"):
+        KeyRing.from_env()
+
+
+def test_live_gateway_follows_key_rotation_and_removal(tmp_path, monkeypatch):
+    path = tmp_path / "token_keys.json"
+    main(["--ring", str(path), "add-key", "k1"])
+    monkeypatch.setenv(TOKEN_KEYS_ENV_VAR, str(path))
+    gateway = SecureWebGateway(log_forwarder=LogForwarder(tmp_path / "gateway.log"))
+    watcher = ConfigWatcher(gateway.publish_config)
+    old_token = KeyRing.from_file(path).issue("alice")
+    assert gateway.config.token_validator.validate(old_token).valid
+
+    main(["--ring", str(path), "add-key", "k2"])
+    new_token = KeyRing.from_file(path).issue("bob")
+    assert watcher.poll() is True
+    validator = gateway.config.token_validator
+    assert validator.validate(new_token).user == "bob"
+    assert validator.validate(old_token).user == "alice"
+
+    main(["--ring", str(path), "remove-key", "k1"])
+    assert watcher.poll() is True
+    result = gateway.config.token_validator.validate(old_token)
+    assert not result.valid and "unknown signing key" in result.reason
+    assert gateway.config.token_validator.validate(new_token).valid
+    assert watcher.poll() is False
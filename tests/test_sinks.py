@@ -0,0 +1,272 @@
+import gzip
+import json
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from siem.batching import BatchDispatcher, DiskSpool
+from siem.log_forwarder import LogForwarder
+from siem.sinks import BatchRejected, HTTPBulkSink, LogSink, SinkError, SyslogTCPSink
+
+
+class _HTTPCollector(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    received: list[dict] = []
+    connections: set[int] = set()
+    status = 200
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        type(self).received.extend(json.loads(line) for line in body.splitlines())
+        type(self).connections.add(self.client_address[1])
+        self.send_response(type(self).status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class _SyslogCollector(socketserver.StreamRequestHandler):
+    frames: list[bytes] = []
+
+    def handle(self):
+        while True:
+            length = b""
+            while (char := self.rfile.read(1)) not in (b" ", b""):
+                length += char
+            if not length:
+                return
+            type(self).frames.append(self.rfile.read(int(length)))
+
+
+@pytest.fixture
+def http_collector():
+    _HTTPCollector.received = []
+    _HTTPCollector.connections = set()
+    _HTTPCollector.status = 200
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _HTTPCollector)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _events(count):
+    return [{"user": "alice", "domain": f"d{i}.example", "allowed": True} for i in range(count)]
+
+
+def test_http_sink_batches_over_one_persistent_connection(http_collector):
+    sink = HTTPBulkSink(f"http://127.0.0.1:{http_collector.server_port}/ingest")
+    forwarder = LogForwarder(sinks=[sink], batch_size=10, flush_interval=0.05)
+    for event in _events(25):
+        forwarder.forward(event)
+    assert forwarder.flush(timeout=5)
+
+    assert [event["domain"] for event in _HTTPCollector.received] == [
+        f"d{i}.example" for i in range(25)
+    ]
+    assert len(_HTTPCollector.connections) == 1
+    metrics = forwarder.metrics()
+    assert metrics["queue_depth"] == 0
+    assert metrics["sinks"]["http"]["sent_events"] == 25
+    forwarder.close()
+
+
+def test_syslog_sink_uses_octet_counted_frames():
+    _SyslogCollector.frames = []
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SyslogCollector)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sink = SyslogTCPSink("127.0.0.1", server.server_address[1])
+    sink.send(_events(3))
+    sink.send(_events(2))
+    deadline = time.monotonic() + 5
+    while len(_SyslogCollector.frames) < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    sink.close()
+    server.shutdown()
+    server.server_close()
+
+    assert len(_SyslogCollector.frames) == 5
+    header, _, payload = _SyslogCollector.frames[0].partition(b" - - - ")
+    assert header.startswith(b"<134>1 ")
+    assert json.loads(payload)["domain"] == "d0.example"
+
+
+class _FlakySink(LogSink):
+    name = "flaky"
+
+    def __init__(self):
+        self.up = False
+        self.received: list[dict] = []
+
+    def send(self, batch):
+        if not self.up:
+            raise SinkError("collector down")
+        self.received.extend(batch)
+
+
+def test_failed_batches_are_spooled_and_replayed_in_order(tmp_path):
+    flaky = _FlakySink()
+    dispatcher = BatchDispatcher(
+        [flaky],
+        spool_dir=tmp_path / "spool",
+        batch_size=5,
+        flush_interval=0.5,
+        backoff_initial=0.05,
+    )
+    for event in _events(12):
+        dispatcher.submit(event)
+    assert dispatcher.flush(timeout=5)
+    assert dispatcher.metrics()["sinks"]["flaky"]["spooled_batches"] == 3
+    assert dispatcher.spool.pending("flaky")
+
+    flaky.up = True
+    for event in _events(14)[12:]:
+        dispatcher.submit(event)
+    dispatcher.close()
+
+    assert [event["domain"] for event in flaky.received] == [f"d{i}.example" for i in range(14)]
+    assert not dispatcher.spool.pending("flaky")
+
+
+class _GatedSink(LogSink):
+    name = "gated"
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.received: list[dict] = []
+
+    def send(self, batch):
+        self.gate.wait(5)
+        self.received.extend(batch)
+
+
+def test_flush_waits_for_events_still_being_delivered():
+    sink = _GatedSink()
+    dispatcher = BatchDispatcher([sink], batch_size=1, flush_interval=0.01)
+    for event in _events(3):
+        dispatcher.submit(event)
+    deadline = time.monotonic() + 5
+    while dispatcher.metrics()["queue_depth"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # The queue has drained into an in-flight batch, but nothing has been delivered.
+    assert not dispatcher.flush(timeout=0.1)
+
+    sink.gate.set()
+    assert dispatcher.flush(timeout=5)
+    assert len(sink.received) == 3
+    dispatcher.close()
+
+
+def test_flush_is_not_fooled_by_a_submit_racing_the_dispatcher(monkeypatch):
+    sink = _GatedSink()
+    sink.gate.set()
+    dispatcher = BatchDispatcher([sink], batch_size=1, flush_interval=0.01)
+    racing = _events(2)[1:]
+    queue_empty = dispatcher._queue.empty
+
+    def empty():
+        # Land a submit right after the dispatcher thread has looked at the queue.
+        result = queue_empty()
+        if result and racing and threading.current_thread() is dispatcher._thread:
+            sink.gate.clear()
+            dispatcher.submit(racing.pop())
+        return result
+
+    monkeypatch.setattr(dispatcher._queue, "empty", empty)
+    dispatcher.submit(_events(1)[0])
+    if dispatcher.flush(timeout=0.5):
+        assert len(sink.received) == 2 - len(racing)
+    sink.gate.set()
+    if racing:
+        dispatcher.submit(racing.pop())
+    assert dispatcher.flush(timeout=5)
+    assert len(sink.received) == 2
+    dispatcher.close()
+
+
+def test_spool_keeps_a_running_size_across_put_replay_and_restart(tmp_path, monkeypatch):
+    flaky = _FlakySink()
+    dispatcher = BatchDispatcher(
+        [flaky], spool_dir=tmp_path / "spool", batch_size=5, backoff_initial=60
+    )
+    spool = dispatcher.spool
+    with monkeypatch.context() as patch:
+        patch.setattr(Path, "glob", lambda *args: pytest.fail("spool rescanned on put"))
+        for event in _events(10):
+            dispatcher.submit(event)
+        assert dispatcher.flush(timeout=5)
+    on_disk = sum(path.stat().st_size for path in spool.pending("flaky"))
+    assert spool.size() == on_disk > 0
+    assert DiskSpool(tmp_path / "spool").size() == on_disk
+
+    corrupt = spool.pending("flaky")[0]
+    corrupt.write_bytes(b"x" * corrupt.stat().st_size)
+    flaky.up = True
+    dispatcher.close()
+    assert len(flaky.received) == 5
+    assert spool.size() == 0 and not spool.pending("flaky")
+
+
+def test_unreachable_syslog_collector_raises_sink_error():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    with pytest.raises(SinkError):
+        SyslogTCPSink("127.0.0.1", port, timeout=0.5).send(_events(1))
+
+
+class _RejectingSink(LogSink):
+    name = "rejecting"
+
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def send(self, batch):
+        self.calls += 1
+        raise self.error
+
+
+@pytest.mark.parametrize(
+    "error", [BatchRejected("HTTP 400"), KeyError("bug in sink")], ids=["rejected", "crash"]
+)
+def test_unretryable_batches_are_dropped_and_counted(tmp_path, error):
+    sink = _RejectingSink(error)
+    dispatcher = BatchDispatcher([sink], spool_dir=tmp_path / "spool", flush_interval=0.05)
+    for event in _events(3):
+        dispatcher.submit(event)
+    assert dispatcher.flush(timeout=5)
+    dispatcher.close()
+
+    metrics = dispatcher.metrics()["sinks"]["rejecting"]
+    assert (metrics["rejected_batches"], metrics["dropped_events"]) == (1, 3)
+    assert metrics["spooled_batches"] == 0 and metrics["retry_in"] == 0
+    assert sink.calls == 1 and not dispatcher.spool.pending("rejecting")
+
+
+def test_http_sink_rejects_client_errors_and_retries_stale_connections(http_collector):
+    sink = HTTPBulkSink(f"http://127.0.0.1:{http_collector.server_port}/ingest")
+    sink.send(_events(1))
+    # Break the idle keep-alive connection, as a collector timing it out would.
+    [conn] = list(sink._pool._idle.queue)
+    conn.sock.shutdown(socket.SHUT_RDWR)
+    sink.send(_events(2))
+    assert len(_HTTPCollector.received) == 3
+
+    _HTTPCollector.status = 400
+    with pytest.raises(BatchRejected):
+        sink.send(_events(1))
+    _HTTPCollector.status = 503
+    with pytest.raises(SinkError) as raised:
+        sink.send(_events(1))
+    assert not isinstance(raised.value, BatchRejected)
+    sink.close()
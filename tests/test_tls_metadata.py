@@ -0,0 +1,103 @@
+import struct
+
+import pytest
+
+from gateway.tls_metadata_inspector import (
+    ClientHelloError,
+    TLSMetadataInspector,
+    parse_client_hello,
+)
+
+GREASE = 0x0A0A
+CIPHERS = [
+    GREASE, 0x1301, 0x1302, 0x1303, 0xC02B, 0xC02F, 0xC02C, 0xC030,
+    0xCCA9, 0xCCA8, 0xC013, 0xC014, 0x009C, 0x009D, 0x002F, 0x0035,
+]  # fmt: skip
+SIGNATURES = [0x0403, 0x0804, 0x0401, 0x0503, 0x0805, 0x0501, 0x0806, 0x0601]
+PLAIN_EXTENSIONS = [0x0005, 0x0012, 0x0015, 0x0017, 0x001B, 0x0023, 0x002D, 0x0033, 0x4469, 0xFF01]
+
+
+def _ext(ext_type: int, body: bytes = b"") -> bytes:
+    return struct.pack("!HH", ext_type, len(body)) + body
+
+
+def _u16s(values: list[int]) -> bytes:
+    return struct.pack(f"!{len(values)}H", *values)
+
+
+def build_client_hello(server_name: str = "example.com") -> bytes:
+    sni = server_name.encode()
+    alpn = b"".join(bytes([len(p)]) + p for p in (b"h2", b"http/1.1"))
+    extensions = b"".join(
+        [
+            _ext(GREASE),
+            _ext(0x0000, struct.pack("!HBH", len(sni) + 3, 0, len(sni)) + sni),
+            _ext(0x000A, struct.pack("!H", 6) + _u16s([GREASE, 0x001D, 0x0017])),
+            _ext(0x000B, b"\x01\x00"),
+            _ext(0x000D, struct.pack("!H", 2 * len(SIGNATURES)) + _u16s(SIGNATURES)),
+            _ext(0x0010, struct.pack("!H", len(alpn)) + alpn),
+            _ext(0x002B, b"\x06" + _u16s([GREASE, 0x0304, 0x0303])),
+            *(_ext(ext_type) for ext_type in PLAIN_EXTENSIONS),
+        ]
+    )
+    body = (
+        struct.pack("!H", 0x0303)
+        + bytes(32)
+        + b"\x00"
+        + struct.pack("!H", 2 * len(CIPHERS))
+        + _u16s(CIPHERS)
+        + b"\x01\x00"
+        + struct.pack("!H", len(extensions))
+        + extensions
+    )
+    handshake = b"\x01" + len(body).to_bytes(3, "big") + body
+    return b"\x16\x03\x01" + struct.pack("!H", len(handshake)) + handshake
+
+
+def test_parse_extracts_handshake_fields():
+    hello = parse_client_hello(build_client_hello())
+    assert hello.server_name == "example.com"
+    assert hello.alpn == ("h2", "http/1.1")
+    assert hello.max_version == 0x0304
+    assert hello.cipher_suites[1:4] == (0x1301, 0x1302, 0x1303)
+    assert hello.signature_algorithms == tuple(SIGNATURES)
+
+
+def test_fingerprints_match_reference_values():
+    metadata = TLSMetadataInspector().inspect(client_hello=build_client_hello())
+    assert metadata.tls_version == "TLSv1.3"
+    assert metadata.cipher_suite == "TLS_AES_128_GCM_SHA256"
+    assert metadata.ja4 == "t13d1516h2_8daaf6152771_e5627efa2ab1"
+    assert metadata.ja3 is not None and len(metadata.ja3) == 32
+
+
+def test_fingerprint_cache_reuses_entries():
+    inspector = TLSMetadataInspector(fingerprint_cache_size=1)
+    first = inspector.inspect(client_hello=build_client_hello("a.example"))
+    second = inspector.inspect(client_hello=build_client_hello("b.example"))
+    assert first.ja4 == second.ja4
+    assert len(inspector._fingerprints) == 1
+
+
+@pytest.mark.parametrize("cut", [1, 5, 9, 44, 80, 200])
+def test_truncated_hello_is_rejected(cut):
+    data = build_client_hello()
+    with pytest.raises(ClientHelloError):
+        parse_client_hello(data[: len(data) - cut])
+
+
+def test_malformed_hello_degrades_to_sni_metadata():
+    metadata = TLSMetadataInspector().inspect(server_name="example.com", client_hello=b"\x16\x03")
+    assert metadata.server_name == "example.com"
+    assert metadata.error is not None
+
+
+def test_hex_hello_is_parsed_and_other_types_degrade():
+    inspector = TLSMetadataInspector()
+    metadata = inspector.inspect(client_hello=build_client_hello().hex())
+    assert metadata.server_name == "example.com" and metadata.error is None
+
+    for bad in ("not hex", 1234, ["\x16"]):
+        metadata = inspector.inspect(server_name="example.com", client_hello=bad)
+        assert metadata.server_name == "example.com"
+        assert metadata.error is not None
@@ -0,0 +1,50 @@
+import copy
+from pathlib import Path
+
+from gateway.policy_engine import load_policy_document
+from gateway.proxy import SecureWebGateway
+from gateway.replay import iter_records
+from gateway.what_if import load_events, what_if
+from siem.log_forwarder import LogForwarder
+
+POLICY_PATH = Path(__file__).resolve().parents[1] / "config" / "policies.yaml"
+HEALTHY = {"device_id": "endpoint", "healthy": True, "posture_score": 90}
+UNHEALTHY = {"device_id": "endpoint", "healthy": False, "posture_score": 10}
+
+
+def _record_traffic(tmp_path):
+    log_path = tmp_path / "gateway.log"
+    gateway = SecureWebGateway(log_forwarder=LogForwarder(log_path))
+    urls = [
+        "http://example.com/docs",
+        "http://news.example/",
+        "http://malware.test/x",
+        "http://casino.example/",
+        "http://docs.internal/wiki",
+    ]
+    for token in ("token-alice", "token-bob", None):
+        for device in (HEALTHY, UNHEALTHY):
+            for url in urls:
+                gateway.process_request({"url": url, "token": token, "device": device})
+    return load_events(iter_records(log_path))
+
+
+def test_current_policy_reproduces_recorded_verdicts(tmp_path):
+    events = _record_traffic(tmp_path)
+    summary = what_if(events, load_policy_document(POLICY_PATH))
+    assert summary["events"] == 30
+    assert summary["newly_blocked"] == 0
+    assert summary["newly_allowed"] == 0
+
+
+def test_candidate_policy_diff(tmp_path):
+    events = _record_traffic(tmp_path)
+    candidate = copy.deepcopy(load_policy_document(POLICY_PATH))
+    candidate["users"]["alice"]["blocked_domains"] = ["example.com"]
+    candidate["users"]["alice"]["device_trust_required"] = False
+
+    summary = what_if(events, candidate)
+    assert summary["newly_blocked"] == 1
+    assert summary["by_domain"]["newly_blocked"] == {"example.com": 1}
+    assert summary["newly_allowed"] == 1
+    assert summary["by_user"]["newly_allowed"] == {"alice": 1}